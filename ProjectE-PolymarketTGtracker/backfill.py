@@ -0,0 +1,133 @@
+"""Background drain of block ranges the live cursor skipped.
+
+The live loop records a gap instead of dropping blocks when it falls too
+far behind. Backfill splits gaps into sub-ranges, fetches up to `workers`
+of them in parallel and hands the logs to the owning loop through `ready`;
+that loop processes them between live windows and deletes the gap in the
+same transaction, so a crash only means the range is fetched again.
+
+Sub-range size comes from a RangeController of its own (not the live
+loop's), so catching up after downtime grows toward the RPC's limit the
+same way the live cursor does.
+
+The same module is kept in ProjectK-polycopyman/worker/backfill.py.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from block_range import RangeController
+
+Gap = tuple[int, int, int]
+
+
+class Backfill:
+    def __init__(
+        self,
+        fetch: Callable[[int, int], list],
+        list_gaps: Callable[[int], list[Gap]],
+        split_gap: Callable[[int, int], None],
+        fail_gap: Callable[[int, str], None],
+        workers: int,
+        ranges: RangeController,
+        idle_seconds: float = 10.0,
+        fetch_calls: Optional[Callable[[], int]] = None,
+    ) -> None:
+        self._fetch = fetch
+        # get_logs requests one fetch() makes, passed to ranges.observe().
+        self._fetch_calls = fetch_calls or (lambda: 1)
+        self._list_gaps = list_gaps
+        self._split_gap = split_gap
+        self._fail_gap = fail_gap
+        self._workers = max(1, workers)
+        self.ranges = ranges
+        self._idle_seconds = idle_seconds
+        self._wake = threading.Event()
+        self._stopped = False
+        self.ready: "queue.Queue[tuple[int, int, int, list]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="backfill", daemon=True)
+
+    def start(self) -> "Backfill":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._wake.set()
+
+    def wake(self) -> None:
+        """Pick up a newly recorded gap without waiting for the idle timeout."""
+        self._wake.set()
+
+    def drain(self, handle: Callable[[int, int, int, list], None], limit: int) -> int:
+        """Process up to limit fetched ranges on the caller's thread."""
+        handled = 0
+        while handled < limit:
+            try:
+                gap_id, from_block, to_block, logs = self.ready.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                handle(gap_id, from_block, to_block, logs)
+            except Exception:
+                logging.exception("backfill_handle_error gap=%s blocks=%s->%s", gap_id, from_block, to_block)
+            finally:
+                self.ready.task_done()
+            handled += 1
+        return handled
+
+    def _run(self) -> None:
+        with ThreadPoolExecutor(self._workers, thread_name_prefix="backfill") as pool:
+            while not self._stopped:
+                try:
+                    if not self._run_once(pool):
+                        self._wake.wait(self._idle_seconds)
+                        self._wake.clear()
+                except Exception:
+                    logging.exception("backfill_error")
+                    self._wake.wait(self._idle_seconds)
+                    self._wake.clear()
+
+    def _timed_fetch(self, from_block: int, to_block: int) -> tuple[list, int]:
+        started = time.monotonic()
+        logs = self._fetch(from_block, to_block)
+        return logs, int((time.monotonic() - started) * 1000)
+
+    def _run_once(self, pool: ThreadPoolExecutor) -> bool:
+        gaps = self._list_gaps(self._workers)
+        if not gaps:
+            return False
+        size = self.ranges.range
+        oversized = [gap for gap in gaps if gap[2] - gap[1] + 1 > size]
+        if oversized:
+            # Only the head is split off, so the remainder is cut with
+            # whatever the range has grown or shrunk to by then.
+            for gap_id, _, _ in oversized:
+                self._split_gap(gap_id, size)
+            return True
+
+        futures = {pool.submit(self._timed_fetch, gap[1], gap[2]): gap for gap in gaps}
+        retry_after = 0.0
+        for future in as_completed(futures):
+            gap_id, from_block, to_block = futures[future]
+            try:
+                logs, latency_ms = future.result()
+            except Exception as exc:
+                retryable = self.ranges.failed(exc)
+                retry_after = max(retry_after, self.ranges.backoff if retryable else self._idle_seconds)
+                self._fail_gap(gap_id, str(exc))
+                logging.warning("backfill_fetch_failed gap=%s blocks=%s->%s error=%s", gap_id, from_block, to_block, exc)
+                continue
+            self.ranges.observe(to_block - from_block + 1, len(logs), latency_ms, calls=self._fetch_calls())
+            self.ready.put((gap_id, from_block, to_block, logs))
+
+        # Gaps stay in the table until the owner deletes them, so wait for
+        # this round to be handled before listing again.
+        self.ready.join()
+        if retry_after:
+            self._wake.wait(retry_after)
+            self._wake.clear()
+        return True
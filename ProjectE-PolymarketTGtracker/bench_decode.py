@@ -0,0 +1,84 @@
+"""Micro-benchmark: eth_abi + checksum decoding vs orderfilled's raw-bytes path.
+
+    python3 bench_decode.py [--logs 50000] [--rounds 5]
+"""
+import argparse
+import random
+import time
+
+from eth_abi import decode
+from hexbytes import HexBytes
+from web3 import Web3
+
+from orderfilled import EVENT_SIG, decode_batch, decode_fill
+
+EVENT_TYPES = ["uint256", "uint256", "uint256", "uint256", "uint256"]
+
+
+def make_logs(count: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    topic0 = Web3.keccak(text=EVENT_SIG)
+    logs = []
+    for i in range(count):
+        words = [0, rng.getrandbits(252), rng.getrandbits(40), rng.getrandbits(40), 0]
+        if i % 2:
+            words[0], words[1] = words[1], words[0]
+        logs.append(
+            {
+                "topics": [
+                    topic0,
+                    HexBytes(rng.getrandbits(256).to_bytes(32, "big")),
+                    HexBytes(rng.getrandbits(160).to_bytes(32, "big")),
+                    HexBytes(rng.getrandbits(160).to_bytes(32, "big")),
+                ],
+                "data": HexBytes(b"".join(w.to_bytes(32, "big") for w in words)),
+                "blockNumber": 60_000_000 + i // 100,
+                "logIndex": i % 100,
+                "transactionHash": HexBytes(rng.getrandbits(256).to_bytes(32, "big")),
+            }
+        )
+    return logs
+
+
+def legacy(logs: list[dict]) -> list[tuple]:
+    out = []
+    for log in logs:
+        maker_asset_id, taker_asset_id, maker_amt, taker_amt, fee = decode(EVENT_TYPES, bytes(log["data"]))
+        maker = Web3.to_checksum_address("0x" + log["topics"][2].hex()[-40:]).lower()
+        taker = Web3.to_checksum_address("0x" + log["topics"][3].hex()[-40:]).lower()
+        out.append((maker, taker, maker_asset_id, taker_asset_id, maker_amt, taker_amt, fee))
+    return out
+
+
+def per_log(logs: list[dict]) -> list:
+    return [decode_fill(log) for log in logs]
+
+
+def batched(logs: list[dict]):
+    return decode_batch(logs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    logs = make_logs(args.logs)
+    expected = legacy(logs)
+    got = [(f.maker, f.taker, f.maker_asset_id, f.taker_asset_id, f.maker_amount, f.taker_amount, f.fee) for f in per_log(logs)]
+    assert got == expected, "raw-bytes decoder disagrees with eth_abi"
+
+    for name, fn in (("eth_abi+checksum", legacy), ("decode_fill", per_log), ("decode_batch", batched)):
+        best = min(_timed(fn, logs) for _ in range(args.rounds))
+        print(f"{name:18s} {best * 1000:8.1f} ms  {args.logs / best:12,.0f} logs/s")
+
+
+def _timed(fn, logs: list[dict]) -> float:
+    start = time.perf_counter()
+    fn(logs)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from typing import Optional
 
 import requests
 
-from config import BOT_TOKEN, CHANNEL_ID, OWNER_CHAT_ID, MAX_RETRIES
+from config import BOT_TOKEN, CHANNEL_ID, OWNER_CHAT_ID, MAX_RETRIES, BOT_LONG_POLL_SECONDS
 from db import (
     init_db,
     list_wallets,
@@ -26,12 +26,19 @@ from db import (
 
 API_BASE = f"https://api.telegram.org/bot{BOT_TOKEN}"
 
+# One keep-alive connection to Telegram for getUpdates and replies.
+_session = requests.Session()
+
+# chat_id -> pending wizard state (None = nothing pending), written through
+# to state["pending:<chat>"] so a restart resumes where the chat left off.
+_pending: dict[str, Optional[dict]] = {}
+
 
 def api_request(method: str, payload: dict) -> dict:
     url = f"{API_BASE}/{method}"
     for _ in range(MAX_RETRIES):
         try:
-            resp = requests.post(url, json=payload, timeout=15)
+            resp = _session.post(url, json=payload, timeout=15)
             if resp.status_code == 200:
                 return resp.json()
         except Exception:
@@ -63,15 +70,17 @@ def set_owner_chat_id(chat_id: str) -> None:
 
 
 def load_pending(chat_id: str) -> Optional[dict]:
-    val = get_state(f"pending:{chat_id}")
-    return json.loads(val) if val else None
+    if chat_id not in _pending:
+        val = get_state(f"pending:{chat_id}")
+        _pending[chat_id] = json.loads(val) if val else None
+    return _pending[chat_id]
 
 
 def save_pending(chat_id: str, data: Optional[dict]) -> None:
-    if data is None:
-        set_state(f"pending:{chat_id}", "")
+    if data is None and chat_id in _pending and _pending[chat_id] is None:
         return
-    set_state(f"pending:{chat_id}", json.dumps(data))
+    set_state(f"pending:{chat_id}", json.dumps(data) if data is not None else "")
+    _pending[chat_id] = data
 
 
 def is_owner(chat_id: str) -> bool:
@@ -221,16 +230,28 @@ def poll() -> None:
     offset = int(get_state("bot_offset") or "0")
 
     while True:
-        data = requests.get(
-            f"{API_BASE}/getUpdates",
-            params={"timeout": 30, "offset": offset + 1},
-            timeout=35,
-        ).json()
+        # Long poll: Telegram holds the request until an update arrives or
+        # the timeout passes, so no sleep is needed between calls.
+        try:
+            data = _session.post(
+                f"{API_BASE}/getUpdates",
+                json={
+                    "timeout": BOT_LONG_POLL_SECONDS,
+                    "offset": offset + 1,
+                    "allowed_updates": ["message", "channel_post", "callback_query"],
+                },
+                timeout=BOT_LONG_POLL_SECONDS + 10,
+            ).json()
+        except (requests.RequestException, ValueError):
+            time.sleep(2)
+            continue
 
         if not data.get("ok"):
             time.sleep(2)
             continue
 
+        last_offset = offset
+
         for update in data.get("result", []):
             offset = update.get("update_id", offset)
             callback = update.get("callback_query")
@@ -277,8 +298,8 @@ def poll() -> None:
                         "읽기 전용 채널입니다. 관리자만 명령어를 사용할 수 있습니다.",
                     )
 
-        set_state("bot_offset", str(offset))
-        time.sleep(1)
+        if offset != last_offset:
+            set_state("bot_offset", str(offset))
 
 
 if __name__ == "__main__":
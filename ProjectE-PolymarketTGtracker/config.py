@@ -22,12 +22,38 @@ DB_PATH = os.environ.get(
 BOT_TOKEN = os.environ.get("PROJECTE_BOT_TOKEN", "").strip()
 CHANNEL_ID = os.environ.get("PROJECTE_CHANNEL_ID", "").strip()
 OWNER_CHAT_ID = os.environ.get("PROJECTE_OWNER_CHAT_ID", "").strip()
+BOT_LONG_POLL_SECONDS = int(os.environ.get("PROJECTE_BOT_LONG_POLL_SECONDS", "50"))
 
+# One URL or a comma-separated list; several URLs are pooled with hedging.
 RPC_URL = os.environ.get("PROJECTE_RPC_URL", "").strip()
+# Optional eth_subscribe endpoint; empty keeps plain get_logs polling.
+WS_URL = os.environ.get("PROJECTE_WS_URL", "").strip()
 POLL_SECONDS = int(os.environ.get("PROJECTE_POLL_SECONDS", "10"))
 CONFIRMATIONS = int(os.environ.get("PROJECTE_CONFIRMATIONS", "2"))
 MAX_BLOCK_RANGE = int(os.environ.get("PROJECTE_MAX_BLOCK_RANGE", "200"))
+# get_logs range adapts between these bounds, starting at MAX_BLOCK_RANGE.
+BLOCK_RANGE_MIN = int(os.environ.get("PROJECTE_BLOCK_RANGE_MIN", "10"))
+BLOCK_RANGE_MAX = int(os.environ.get("PROJECTE_BLOCK_RANGE_MAX", "2000"))
+BLOCK_RANGE_SLOW_MS = int(os.environ.get("PROJECTE_BLOCK_RANGE_SLOW_MS", "3000"))
 MAX_LAG_BLOCKS = int(os.environ.get("PROJECTE_MAX_LAG_BLOCKS", "300"))
+# Parallel get_logs calls used to backfill skipped block ranges.
+BACKFILL_WORKERS = int(os.environ.get("PROJECTE_BACKFILL_WORKERS", "4"))
+# Max wallet addresses per topic OR-list in a get_logs filter.
+TOPIC_FILTER_CHUNK = int(os.environ.get("PROJECTE_TOPIC_FILTER_CHUNK", "100"))
+
+# "rpc" polls the chain directly; "log" reads fills written by ingest.py.
+FILL_SOURCE = os.environ.get("PROJECTE_FILL_SOURCE", "rpc").strip().lower()
+FILL_LOG_PATH = os.environ.get(
+    "PROJECTE_FILL_LOG_PATH",
+    os.path.join(BASE_DIR, "fills.db"),
+)
+FILL_LOG_RETENTION_SECONDS = int(
+    os.environ.get("PROJECTE_FILL_LOG_RETENTION_SECONDS", "86400")
+)
+INGEST_LOG_PATH = os.environ.get(
+    "PROJECTE_INGEST_LOG_PATH",
+    os.path.join(LOG_DIR, "ingest.log"),
+)
 
 CTF_EXCHANGE = os.environ.get(
     "PROJECTE_CTF_EXCHANGE",
@@ -46,9 +72,82 @@ GAMMA_API_BASE = os.environ.get(
 MARKET_CACHE_TTL_SECONDS = int(
     os.environ.get("PROJECTE_MARKET_CACHE_TTL_SECONDS", "3600")
 )
+MARKET_CACHE_FLUSH_SECONDS = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_FLUSH_SECONDS", "60")
+)
+MARKET_CACHE_FLUSH_BATCH = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_FLUSH_BATCH", "50")
+)
+MARKET_CACHE_FULL_SYNC_SECONDS = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_FULL_SYNC_SECONDS", "86400")
+)
+MARKET_CACHE_MAX_ENTRIES = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_MAX_ENTRIES", "20000")
+)
+MARKET_CACHE_LOOKUP_BATCH = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_LOOKUP_BATCH", "20")
+)
+MARKET_CACHE_LOOKUP_WORKERS = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_LOOKUP_WORKERS", "4")
+)
+MARKET_CACHE_LOG_PATH = os.environ.get(
+    "PROJECTE_MARKET_CACHE_LOG_PATH",
+    os.path.join(BASE_DIR, "market_cache.log"),
+)
+MARKET_CACHE_LOG_LEVEL = os.environ.get("PROJECTE_MARKET_CACHE_LOG_LEVEL", "INFO").upper()
+MARKET_CACHE_LOG_MAX_BYTES = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_LOG_MAX_BYTES", str(10 * 1024 * 1024))
+)
+MARKET_CACHE_LOG_BACKUPS = int(os.environ.get("PROJECTE_MARKET_CACHE_LOG_BACKUPS", "5"))
+# Write one cache_hit line per this many hits (0: none); hits are counted either way.
+MARKET_CACHE_HIT_LOG_SAMPLE = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_HIT_LOG_SAMPLE", "1000")
+)
+MARKET_CACHE_STATS_SECONDS = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_STATS_SECONDS", "300")
+)
+# Tokens Gamma failed to resolve are not looked up again for this long.
+MARKET_CACHE_MISS_TTL_SECONDS = int(
+    os.environ.get("PROJECTE_MARKET_CACHE_MISS_TTL_SECONDS", "60")
+)
+
+# market_state.py: per-slug quotes and closed flags shown in alerts.
+MARKET_STATE_REFRESH_SECONDS = int(
+    os.environ.get("PROJECTE_MARKET_STATE_REFRESH_SECONDS", "30")
+)
+MARKET_STATE_TTL_SECONDS = int(
+    os.environ.get("PROJECTE_MARKET_STATE_TTL_SECONDS", "3600")
+)
+MARKET_STATE_BATCH = int(os.environ.get("PROJECTE_MARKET_STATE_BATCH", "50"))
+# e.g. wss://ws-subscriptions-clob.polymarket.com/ws/market; empty disables streaming.
+MARKET_STATE_WS_URL = os.environ.get("PROJECTE_MARKET_STATE_WS_URL", "").strip()
+
+# directional_streaks rows kept in memory by streaks.py.
+STREAK_CACHE_MAX_ENTRIES = int(
+    os.environ.get("PROJECTE_STREAK_CACHE_MAX_ENTRIES", "50000")
+)
 
 MAX_RETRIES = int(os.environ.get("PROJECTE_MAX_RETRIES", "3"))
 
+# Telegram outbox pacing: groups/channels accept about 20 messages a minute,
+# bots about 30 a second overall.
+TELEGRAM_CHAT_INTERVAL_SECONDS = float(
+    os.environ.get("PROJECTE_TELEGRAM_CHAT_INTERVAL_SECONDS", "3")
+)
+TELEGRAM_MAX_PER_SECOND = float(os.environ.get("PROJECTE_TELEGRAM_MAX_PER_SECOND", "25"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("PROJECTE_OUTBOX_MAX_ATTEMPTS", "10"))
+
+# Prometheus text endpoint on 127.0.0.1; 0 disables it. A summary is also
+# stored in state.metrics_summary every minute.
+METRICS_PORT = int(os.environ.get("PROJECTE_METRICS_PORT", "0"))
+
+# PROJECTE_PIPELINE=1 runs the asyncio pipeline (pipeline.py) instead of the
+# sequential poll loop. The fetcher pauses while the outbox holds
+# OUTBOX_HIGH_WATER unsent messages.
+PIPELINE = os.environ.get("PROJECTE_PIPELINE", "0") == "1"
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PROJECTE_PIPELINE_QUEUE_SIZE", "4"))
+OUTBOX_HIGH_WATER = int(os.environ.get("PROJECTE_OUTBOX_HIGH_WATER", "500"))
+
 MIN_USDC_ALERT = float(os.environ.get("PROJECTE_MIN_USDC_ALERT", "50"))
 MIN_USDC_EXEMPT = os.environ.get(
     "PROJECTE_MIN_USDC_EXEMPT",
@@ -61,3 +160,17 @@ SENT_EVENTS_TTL_DAYS = int(
 SENT_EVENTS_CLEANUP_INTERVAL_SECONDS = int(
     os.environ.get("PROJECTE_SENT_EVENTS_CLEANUP_INTERVAL_SECONDS", "3600")
 )
+
+# maintenance.py: TTL pruning, incremental vacuum and WAL checkpoint of
+# tracker.db. A TTL of 0 keeps that table forever.
+MAINTENANCE_INTERVAL_SECONDS = int(
+    os.environ.get("PROJECTE_MAINTENANCE_INTERVAL_SECONDS", str(SENT_EVENTS_CLEANUP_INTERVAL_SECONDS))
+)
+TRACK_BUTTONS_TTL_DAYS = int(os.environ.get("PROJECTE_TRACK_BUTTONS_TTL_DAYS", "14"))
+TRADE_COUNTS_TTL_DAYS = int(os.environ.get("PROJECTE_TRADE_COUNTS_TTL_DAYS", "7"))
+MAINTENANCE_BATCH_SIZE = int(os.environ.get("PROJECTE_MAINTENANCE_BATCH_SIZE", "2000"))
+# Rows left over after this many batches wait for the next run.
+MAINTENANCE_MAX_BATCHES = int(os.environ.get("PROJECTE_MAINTENANCE_MAX_BATCHES", "50"))
+MAINTENANCE_VACUUM_PAGES = int(os.environ.get("PROJECTE_MAINTENANCE_VACUUM_PAGES", "2048"))
+# Entries in state.db_size_history (one per run: a week at the default interval).
+DB_SIZE_HISTORY_MAX = int(os.environ.get("PROJECTE_DB_SIZE_HISTORY_MAX", "168"))
@@ -1,20 +1,105 @@
+import json
 import os
 import sqlite3
+import threading
 import time
-from typing import Optional
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
 
 from config import DB_PATH
 
+_local = threading.local()
+
+# state rows bumped by every tracked_positions / wallets write; see
+# positions.py and wallet_registry.py.
+TRACKED_POSITIONS_VERSION_KEY = "tracked_positions_version"
+WALLETS_VERSION_KEY = "wallets_version"
+
+# (tx_hash, address) -> sent_at for recent sent_events, filled by
+# warm_sent_cache() in the tracker process. None means "not warmed":
+# lookups then go to SQLite.
+_sent_keys: Optional[dict[tuple[str, str], int]] = None
+_sent_lock = threading.Lock()
+
+# Append-only tables pruned by maintenance.py -> the column their TTL applies to.
+EXPIRING_TABLES = {
+    "sent_events": "sent_at",
+    "track_buttons": "created_at",
+    "trade_counts": "date",
+}
+
 
 def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA journal_mode=WAL")
+    """Return this thread's long-lived connection.
+
+    The connection runs in autocommit mode; writes go through transaction(),
+    and its statement cache lets repeated helper calls reuse prepared
+    statements.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, isolation_level=None, cached_statements=256)
+        # Must precede the first write to a new file; an existing file keeps
+        # its mode until `python3 maintenance.py --vacuum`.
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _local.conn = conn
+        _local.depth = 0
+        _local.rollback_hooks = []
     return conn
 
 
+def close_conn() -> None:
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """Unit of work on this thread's connection.
+
+    The outermost call opens BEGIN/COMMIT; nested calls become savepoints,
+    so helpers used inside a larger batch commit together with it.
+    """
+    conn = get_conn()
+    depth = _local.depth
+    savepoint = f"sp{depth}"
+    hooks_mark = len(_local.rollback_hooks)
+    conn.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT {savepoint}")
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth = depth
+        if depth == 0:
+            conn.execute("ROLLBACK")
+        else:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+        hooks = _local.rollback_hooks[hooks_mark:]
+        del _local.rollback_hooks[hooks_mark:]
+        for hook in reversed(hooks):
+            hook()
+        raise
+    _local.depth = depth
+    conn.execute("COMMIT" if depth == 0 else f"RELEASE {savepoint}")
+    if depth == 0:
+        _local.rollback_hooks.clear()
+
+
+def on_rollback(hook: Callable[[], None]) -> None:
+    """Undo in-memory state if the enclosing transaction rolls back."""
+    get_conn()
+    if _local.depth > 0:
+        _local.rollback_hooks.append(hook)
+
+
 def init_db() -> None:
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS wallets (
@@ -45,6 +130,11 @@ def init_db() -> None:
             )
             """
         )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sent_events_tx_address ON sent_events (tx_hash, address)"
+        )
+        # maintenance.py deletes expired rows by sent_at in small batches.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sent_events_sent_at ON sent_events (sent_at)")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS trade_counts (
@@ -112,11 +202,52 @@ def init_db() -> None:
             )
             """
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS token_meta (
+                token_id TEXT PRIMARY KEY,
+                question TEXT,
+                outcome TEXT,
+                slug TEXT,
+                updated_at INTEGER
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_next_attempt ON outbox(next_attempt_at)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tracked_positions_active "
+            "ON tracked_positions (address, market_slug, status, started_at)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS gaps (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_block INTEGER NOT NULL,
+                to_block INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at INTEGER NOT NULL
+            )
+            """
+        )
 
 
 def upsert_wallet(address: str, alias: Optional[str], note: Optional[str]) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             """
             INSERT INTO wallets(address, alias, note, created_at, updated_at)
@@ -128,121 +259,220 @@ def upsert_wallet(address: str, alias: Optional[str], note: Optional[str]) -> No
             """,
             (address, alias, note, now, now),
         )
+        _bump_version(conn, WALLETS_VERSION_KEY)
 
 
 def update_alias(address: str, alias: Optional[str]) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             "UPDATE wallets SET alias=?, updated_at=? WHERE address=?",
             (alias, now, address),
         )
+        _bump_version(conn, WALLETS_VERSION_KEY)
 
 
 def update_note(address: str, note: Optional[str]) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             "UPDATE wallets SET note=?, updated_at=? WHERE address=?",
             (note, now, address),
         )
+        _bump_version(conn, WALLETS_VERSION_KEY)
 
 
 def remove_wallet(address: str) -> None:
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute("DELETE FROM wallets WHERE address=?", (address,))
+        _bump_version(conn, WALLETS_VERSION_KEY)
 
 
 def list_wallets() -> list[tuple[str, Optional[str], Optional[str]]]:
-    with get_conn() as conn:
-        return conn.execute(
-            "SELECT address, alias, note FROM wallets ORDER BY created_at ASC"
-        ).fetchall()
+    conn = get_conn()
+    return conn.execute(
+        "SELECT address, alias, note FROM wallets ORDER BY created_at ASC"
+    ).fetchall()
 
 
 def get_wallet(address: str) -> Optional[tuple[str, Optional[str], Optional[str]]]:
-    with get_conn() as conn:
-        row = conn.execute(
-            "SELECT address, alias, note FROM wallets WHERE address=?",
-            (address,),
-        ).fetchone()
-        return row
+    conn = get_conn()
+    row = conn.execute(
+        "SELECT address, alias, note FROM wallets WHERE address=?",
+        (address,),
+    ).fetchone()
+    return row
 
 
 def get_state(key: str) -> Optional[str]:
-    with get_conn() as conn:
-        row = conn.execute("SELECT value FROM state WHERE key=?", (key,)).fetchone()
-        return row[0] if row else None
+    conn = get_conn()
+    row = conn.execute("SELECT value FROM state WHERE key=?", (key,)).fetchone()
+    return row[0] if row else None
 
 
 def set_state(key: str, value: str) -> None:
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             "INSERT INTO state(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
             (key, value),
         )
 
 
+def _bump_version(conn: sqlite3.Connection, key: str) -> None:
+    """Bump a change counter in state so other processes can reload cached tables."""
+    conn.execute(
+        "INSERT INTO state(key, value) VALUES(?, '1') "
+        "ON CONFLICT(key) DO UPDATE SET value=CAST(value AS INTEGER) + 1",
+        (key,),
+    )
+
+
 def is_sent(tx_hash: str, log_index: int, address: str) -> bool:
-    with get_conn() as conn:
-        row = conn.execute(
-            "SELECT 1 FROM sent_events WHERE tx_hash=? AND log_index=? AND address=?",
-            (tx_hash, log_index, address),
-        ).fetchone()
-        return row is not None
+    conn = get_conn()
+    row = conn.execute(
+        "SELECT 1 FROM sent_events WHERE tx_hash=? AND log_index=? AND address=?",
+        (tx_hash, log_index, address),
+    ).fetchone()
+    return row is not None
 
 
 def mark_sent(tx_hash: str, log_index: int, address: str) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             "INSERT OR IGNORE INTO sent_events(tx_hash, log_index, address, sent_at) VALUES(?, ?, ?, ?)",
             (tx_hash, log_index, address, now),
         )
 
 
+def warm_sent_cache(ttl_days: int) -> int:
+    """Load the last ttl_days of sent_events into the in-memory dedup map."""
+    global _sent_keys
+    cutoff = int(time.time()) - (ttl_days * 86400) if ttl_days > 0 else 0
+    conn = get_conn()
+    rows = conn.execute(
+        """
+        SELECT tx_hash, address, MAX(sent_at)
+        FROM sent_events
+        WHERE sent_at >= ?
+        GROUP BY tx_hash, address
+        """,
+        (cutoff,),
+    ).fetchall()
+    with _sent_lock:
+        _sent_keys = {(tx_hash, address): int(sent_at or 0) for tx_hash, address, sent_at in rows}
+        return len(_sent_keys)
+
+
 def is_sent_any(tx_hash: str, address: str) -> bool:
-    with get_conn() as conn:
-        row = conn.execute(
-            "SELECT 1 FROM sent_events WHERE tx_hash=? AND address=?",
-            (tx_hash, address),
-        ).fetchone()
-        return row is not None
+    if _sent_keys is not None:
+        return (tx_hash, address) in _sent_keys
+    conn = get_conn()
+    row = conn.execute(
+        "SELECT 1 FROM sent_events WHERE tx_hash=? AND address=?",
+        (tx_hash, address),
+    ).fetchone()
+    return row is not None
 
 
 def mark_sent_any(tx_hash: str, address: str) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             "INSERT OR IGNORE INTO sent_events(tx_hash, log_index, address, sent_at) VALUES(?, ?, ?, ?)",
             (tx_hash, -1, address, now),
         )
+        if _sent_keys is not None:
+            key = (tx_hash, address)
+            with _sent_lock:
+                added = key not in _sent_keys
+                _sent_keys.setdefault(key, now)
+            if added:
+                on_rollback(lambda: _sent_keys.pop(key, None))
+
+
+def delete_expired(table: str, cutoff, limit: int) -> int:
+    """Delete up to limit rows of an EXPIRING_TABLES table older than cutoff.
+
+    Each call is its own short transaction so the bot and the outbox thread
+    get the write lock between batches.
+    """
+    column = EXPIRING_TABLES[table]
+    with transaction() as conn:
+        cur = conn.execute(
+            f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {column} < ? LIMIT ?)",
+            (cutoff, limit),
+        )
+        deleted = int(cur.rowcount or 0)
+    return deleted
 
 
-def prune_old_sent_events(ttl_days: int) -> int:
-    if ttl_days <= 0:
+def forget_sent_before(cutoff: int) -> int:
+    """Drop dedup keys older than cutoff from the in-memory map.
+
+    Called once after sent_events has been pruned, not per delete batch.
+    """
+    if _sent_keys is None:
         return 0
-    cutoff = int(time.time()) - (ttl_days * 86400)
-    with get_conn() as conn:
-        cur = conn.execute(
-            "DELETE FROM sent_events WHERE sent_at < ?",
-            (cutoff,),
-        )
-        return int(cur.rowcount or 0)
+    with _sent_lock:
+        expired = [k for k, sent_at in _sent_keys.items() if sent_at < cutoff]
+        for key in expired:
+            del _sent_keys[key]
+    return len(expired)
+
+
+def db_file_stats() -> dict:
+    conn = get_conn()
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    try:
+        wal_bytes = os.path.getsize(f"{DB_PATH}-wal")
+    except OSError:
+        wal_bytes = 0
+    return {
+        "db_bytes": pages * page_size,
+        "free_bytes": free_pages * page_size,
+        "wal_bytes": wal_bytes,
+        "auto_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+    }
+
+
+def incremental_vacuum(pages: int) -> int:
+    """Return up to pages free pages to the filesystem; returns how many were freed."""
+    conn = get_conn()
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # execute() steps a row-less pragma once, freeing a single page;
+    # executescript() runs it to completion.
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def checkpoint_wal() -> tuple[int, int, int]:
+    """WAL checkpoint that truncates the -wal file; (busy, wal_frames, checkpointed_frames)."""
+    row = get_conn().execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    return int(row[0]), int(row[1]), int(row[2])
+
+
+def vacuum_full() -> None:
+    """Rebuild the file with incremental auto_vacuum; holds an exclusive lock throughout."""
+    conn = get_conn()
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
 
 
 def get_trade_count(address: str, market_key: str, date: str) -> int:
-    with get_conn() as conn:
-        row = conn.execute(
-            "SELECT count FROM trade_counts WHERE address=? AND market_key=? AND date=?",
-            (address, market_key, date),
-        ).fetchone()
-        return int(row[0]) if row else 0
+    conn = get_conn()
+    row = conn.execute(
+        "SELECT count FROM trade_counts WHERE address=? AND market_key=? AND date=?",
+        (address, market_key, date),
+    ).fetchone()
+    return int(row[0]) if row else 0
 
 
 def increment_trade_count(address: str, market_key: str, date: str) -> int:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         row = conn.execute(
             "SELECT count FROM trade_counts WHERE address=? AND market_key=? AND date=?",
             (address, market_key, date),
@@ -268,7 +498,7 @@ def update_directional_streak(
     side: str,
 ) -> tuple[int, bool]:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         row = conn.execute(
             """
             SELECT side, streak_count, last_milestone_alert
@@ -316,9 +546,45 @@ def update_directional_streak(
         return streak_count, is_milestone
 
 
+def get_directional_streak(address: str, market_key: str, outcome: str) -> Optional[tuple[str, int, int]]:
+    conn = get_conn()
+    row = conn.execute(
+        """
+        SELECT side, streak_count, last_milestone_alert
+        FROM directional_streaks
+        WHERE address=? AND market_key=? AND outcome=?
+        """,
+        (address, market_key, outcome),
+    ).fetchone()
+    return (row[0], int(row[1]), int(row[2] or 0)) if row else None
+
+
+def upsert_directional_streaks(rows: list[tuple[str, str, str, str, int, int]]) -> None:
+    """Write (address, market_key, outcome, side, streak_count, last_milestone_alert) rows."""
+    if not rows:
+        return
+    now = int(time.time())
+    with transaction() as conn:
+        conn.executemany(
+            """
+            INSERT INTO directional_streaks(
+                address, market_key, outcome, side, streak_count, last_milestone_alert, updated_at
+            )
+            VALUES(?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(address, market_key, outcome)
+            DO UPDATE SET
+                side=excluded.side,
+                streak_count=excluded.streak_count,
+                last_milestone_alert=excluded.last_milestone_alert,
+                updated_at=excluded.updated_at
+            """,
+            [row + (now,) for row in rows],
+        )
+
+
 def add_tracked_market(chat_id: str, market_slug: str, market_title: str) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             """
             INSERT INTO tracked_markets(chat_id, market_slug, market_title, created_at)
@@ -331,11 +597,11 @@ def add_tracked_market(chat_id: str, market_slug: str, market_title: str) -> Non
 
 
 def list_tracked_markets(chat_id: str) -> list[tuple[str, str]]:
-    with get_conn() as conn:
-        return conn.execute(
-            "SELECT market_title, market_slug FROM tracked_markets WHERE chat_id=? ORDER BY created_at DESC",
-            (chat_id,),
-        ).fetchall()
+    conn = get_conn()
+    return conn.execute(
+        "SELECT market_title, market_slug FROM tracked_markets WHERE chat_id=? ORDER BY created_at DESC",
+        (chat_id,),
+    ).fetchall()
 
 
 def add_tracked_position(
@@ -347,7 +613,7 @@ def add_tracked_position(
     side: str,
 ) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             """
             INSERT INTO tracked_positions(
@@ -357,39 +623,59 @@ def add_tracked_position(
             """,
             (chat_id, address, market_slug, market_title, outcome, side, now),
         )
+        _bump_version(conn, TRACKED_POSITIONS_VERSION_KEY)
 
 
 def list_tracked_positions(chat_id: str) -> list[tuple[str, str, str, str]]:
-    with get_conn() as conn:
-        return conn.execute(
-            """
-            SELECT market_title, market_slug, outcome, side
-            FROM tracked_positions
-            WHERE chat_id=? AND status='active'
-            ORDER BY started_at DESC
-            """,
-            (chat_id,),
-        ).fetchall()
+    conn = get_conn()
+    return conn.execute(
+        """
+        SELECT market_title, market_slug, outcome, side
+        FROM tracked_positions
+        WHERE chat_id=? AND status='active'
+        ORDER BY started_at DESC
+        """,
+        (chat_id,),
+    ).fetchall()
+
+
+def list_active_tracked_positions() -> list[tuple[str, str, str, str, str, str, int]]:
+    """(address, market_slug, chat_id, outcome, side, market_title, started_at), oldest first."""
+    conn = get_conn()
+    return conn.execute(
+        """
+        SELECT address, market_slug, chat_id, outcome, side, market_title, started_at
+        FROM tracked_positions
+        WHERE status='active'
+        ORDER BY started_at
+        """
+    ).fetchall()
+
+
+def list_active_tracked_slugs() -> list[str]:
+    conn = get_conn()
+    rows = conn.execute("SELECT DISTINCT market_slug FROM tracked_positions WHERE status='active'").fetchall()
+    return [row[0] for row in rows if row[0]]
 
 
 def get_active_tracked_position(address: str, market_slug: str) -> Optional[tuple[str, str, str, str, int]]:
-    with get_conn() as conn:
-        row = conn.execute(
-            """
-            SELECT chat_id, outcome, side, market_title, started_at
-            FROM tracked_positions
-            WHERE address=? AND market_slug=? AND status='active'
-            ORDER BY started_at DESC
-            LIMIT 1
-            """,
-            (address, market_slug),
-        ).fetchone()
-        return row
+    conn = get_conn()
+    row = conn.execute(
+        """
+        SELECT chat_id, outcome, side, market_title, started_at
+        FROM tracked_positions
+        WHERE address=? AND market_slug=? AND status='active'
+        ORDER BY started_at DESC
+        LIMIT 1
+        """,
+        (address, market_slug),
+    ).fetchone()
+    return row
 
 
 def mark_tracked_position_exited(chat_id: str, address: str, market_slug: str, started_at: int, tx_hash: str) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             """
             UPDATE tracked_positions
@@ -398,11 +684,12 @@ def mark_tracked_position_exited(chat_id: str, address: str, market_slug: str, s
             """,
             (now, tx_hash, chat_id, address, market_slug, started_at),
         )
+        _bump_version(conn, TRACKED_POSITIONS_VERSION_KEY)
 
 
 def add_track_button(token: str, address: str, market_slug: str, market_title: str, outcome: str, side: str) -> None:
     now = int(time.time())
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute(
             """
             INSERT OR REPLACE INTO track_buttons(token, address, market_slug, market_title, outcome, side, created_at)
@@ -413,18 +700,153 @@ def add_track_button(token: str, address: str, market_slug: str, market_title: s
 
 
 def get_track_button(token: str) -> Optional[tuple[str, str, str, str, str, str]]:
-    with get_conn() as conn:
-        row = conn.execute(
-            """
-            SELECT address, market_slug, market_title, outcome, side, token
-            FROM track_buttons
-            WHERE token=?
-            """,
-            (token,),
-        ).fetchone()
-        return row
+    conn = get_conn()
+    row = conn.execute(
+        """
+        SELECT address, market_slug, market_title, outcome, side, token
+        FROM track_buttons
+        WHERE token=?
+        """,
+        (token,),
+    ).fetchone()
+    return row
 
 
 def delete_track_button(token: str) -> None:
-    with get_conn() as conn:
+    with transaction() as conn:
         conn.execute("DELETE FROM track_buttons WHERE token=?", (token,))
+
+
+def get_token_meta(token_id: str) -> Optional[tuple[str, str, str]]:
+    conn = get_conn()
+    row = conn.execute(
+        "SELECT question, outcome, slug FROM token_meta WHERE token_id=?",
+        (token_id,),
+    ).fetchone()
+    return row
+
+
+def upsert_token_meta(rows: list[tuple[str, str, str, str]]) -> None:
+    if not rows:
+        return
+    now = int(time.time())
+    with transaction() as conn:
+        conn.executemany(
+            """
+            INSERT INTO token_meta(token_id, question, outcome, slug, updated_at)
+            VALUES(?, ?, ?, ?, ?)
+            ON CONFLICT(token_id) DO UPDATE SET
+                question=excluded.question,
+                outcome=excluded.outcome,
+                slug=excluded.slug,
+                updated_at=excluded.updated_at
+            """,
+            [(token_id, question, outcome, slug, now) for token_id, question, outcome, slug in rows],
+        )
+
+
+def count_token_meta() -> int:
+    conn = get_conn()
+    row = conn.execute("SELECT COUNT(*) FROM token_meta").fetchone()
+    return int(row[0]) if row else 0
+
+
+def add_gap(from_block: int, to_block: int) -> None:
+    if to_block < from_block:
+        return
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO gaps(from_block, to_block, created_at) VALUES(?, ?, ?)",
+            (from_block, to_block, int(time.time())),
+        )
+
+
+def list_gaps(limit: int) -> list[tuple[int, int, int]]:
+    conn = get_conn()
+    rows = conn.execute(
+        "SELECT id, from_block, to_block FROM gaps ORDER BY from_block LIMIT ?",
+        (limit,),
+    ).fetchall()
+    return [(int(r[0]), int(r[1]), int(r[2])) for r in rows]
+
+
+def split_gap(gap_id: int, size: int) -> None:
+    """Split the first size blocks off a gap; the rest stays one gap.
+
+    Backfill splits again with its current range, so later pieces follow
+    the range as it adapts.
+    """
+    with transaction() as conn:
+        row = conn.execute("SELECT from_block, to_block FROM gaps WHERE id=?", (gap_id,)).fetchone()
+        if not row or int(row[1]) - int(row[0]) + 1 <= size:
+            return
+        now = int(time.time())
+        conn.execute("DELETE FROM gaps WHERE id=?", (gap_id,))
+        head_end = int(row[0]) + size - 1
+        conn.executemany(
+            "INSERT INTO gaps(from_block, to_block, created_at) VALUES(?, ?, ?)",
+            [(int(row[0]), head_end, now), (head_end + 1, int(row[1]), now)],
+        )
+
+
+def fail_gap(gap_id: int, error: str) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE gaps SET attempts=attempts+1, last_error=? WHERE id=?",
+            (error[:500], gap_id),
+        )
+
+
+def delete_gap(gap_id: int) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM gaps WHERE id=?", (gap_id,))
+
+
+def enqueue_outbox(chat_id: str, payload: dict) -> int:
+    """Queue a sendMessage payload; call inside the transaction that produced it."""
+    now = time.time()
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO outbox(chat_id, payload, next_attempt_at, created_at) VALUES(?, ?, ?, ?)",
+            (chat_id, json.dumps(payload, ensure_ascii=False), now, int(now)),
+        )
+        return int(cur.lastrowid)
+
+
+def list_outbox_due(now: float, limit: int) -> list[tuple[int, str, dict, int]]:
+    conn = get_conn()
+    rows = conn.execute(
+        """
+        SELECT id, chat_id, payload, attempts FROM outbox
+        WHERE next_attempt_at <= ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        (now, limit),
+    ).fetchall()
+    return [(int(r[0]), r[1], json.loads(r[2]), int(r[3])) for r in rows]
+
+
+def next_outbox_attempt_at() -> Optional[float]:
+    conn = get_conn()
+    row = conn.execute("SELECT MIN(next_attempt_at) FROM outbox").fetchone()
+    return float(row[0]) if row and row[0] is not None else None
+
+
+def defer_outbox(outbox_id: int, next_attempt_at: float, error: str, count_attempt: bool = True) -> None:
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE outbox SET attempts=attempts+?, next_attempt_at=?, last_error=? WHERE id=?",
+            (1 if count_attempt else 0, next_attempt_at, error[:500], outbox_id),
+        )
+
+
+def delete_outbox(outbox_id: int) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM outbox WHERE id=?", (outbox_id,))
+
+
+def count_outbox() -> int:
+    conn = get_conn()
+    row = conn.execute("SELECT COUNT(*) FROM outbox").fetchone()
+    return int(row[0]) if row else 0
@@ -0,0 +1,79 @@
+"""Compact columnar archive of decoded OrderFilled fills.
+
+One file holds a FillBatch column by column: block numbers and log indexes
+as packed uint64 arrays, tx hashes, makers and takers as fixed-width raw
+bytes, and the uint256 asset ids, amounts and fees as 32-byte big-endian
+words. Each column is zlib-compressed. A JSON header carries the column
+sizes plus free-form metadata (watched wallets, token -> market map,
+block range) so replay.py can run without the DB or Gamma it was recorded
+against.
+"""
+import json
+import struct
+import zlib
+from array import array
+from typing import Any, Callable
+
+from orderfilled import FillBatch
+
+MAGIC = b"PEFILLS1"
+_U32 = struct.Struct(">I")
+
+# name -> (width in bytes, encode one value, decode one value)
+_BYTES_COLUMNS: dict[str, tuple[int, Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "tx_hash": (32, lambda v: bytes.fromhex(v[2:] if v.startswith("0x") else v), lambda b: "0x" + b.hex()),
+    "maker": (20, lambda v: bytes.fromhex(v[2:]), lambda b: "0x" + b.hex()),
+    "taker": (20, lambda v: bytes.fromhex(v[2:]), lambda b: "0x" + b.hex()),
+    "maker_asset_id": (32, lambda v: v.to_bytes(32, "big"), lambda b: int.from_bytes(b, "big")),
+    "taker_asset_id": (32, lambda v: v.to_bytes(32, "big"), lambda b: int.from_bytes(b, "big")),
+    "maker_amount": (32, lambda v: v.to_bytes(32, "big"), lambda b: int.from_bytes(b, "big")),
+    "taker_amount": (32, lambda v: v.to_bytes(32, "big"), lambda b: int.from_bytes(b, "big")),
+    "fee": (32, lambda v: v.to_bytes(32, "big"), lambda b: int.from_bytes(b, "big")),
+}
+_ARRAY_COLUMNS = ("block_number", "log_index")
+
+
+def save(path: str, batch: FillBatch, meta: dict) -> int:
+    """Write batch and meta to path; returns the file size in bytes."""
+    blobs: list[bytes] = []
+    columns: list[list] = []
+    for name in _ARRAY_COLUMNS:
+        values = getattr(batch, name)
+        if not isinstance(values, array):
+            values = array("Q", values)
+        blob = zlib.compress(values.tobytes())
+        blobs.append(blob)
+        columns.append([name, len(blob)])
+    for name, (_, encode, _) in _BYTES_COLUMNS.items():
+        blob = zlib.compress(b"".join(encode(v) for v in getattr(batch, name)))
+        blobs.append(blob)
+        columns.append([name, len(blob)])
+
+    header = json.dumps({"count": len(batch), "columns": columns, "meta": meta}, separators=(",", ":")).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_U32.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    return len(MAGIC) + _U32.size + len(header) + sum(len(b) for b in blobs)
+
+
+def load(path: str) -> tuple[FillBatch, dict]:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not a fill archive: {path}")
+        (header_len,) = _U32.unpack(f.read(_U32.size))
+        header = json.loads(f.read(header_len))
+        count = int(header["count"])
+        batch = FillBatch()
+        for name, size in header["columns"]:
+            raw = zlib.decompress(f.read(size))
+            if name in _ARRAY_COLUMNS:
+                values = array("Q")
+                values.frombytes(raw)
+                setattr(batch, name, values)
+                continue
+            width, _, decode = _BYTES_COLUMNS[name]
+            setattr(batch, name, [decode(raw[i : i + width]) for i in range(0, count * width, width)])
+    return batch, header.get("meta") or {}
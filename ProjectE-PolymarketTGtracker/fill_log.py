@@ -0,0 +1,286 @@
+"""Append-only SQLite log of decoded OrderFilled fills.
+
+ingest.py is the only writer of fills: it fetches each block range once and
+appends the decoded fills together with the new ingest cursor. Consumers
+(ProjectE tracker, ProjectK source watcher) register the wallets they care
+about, read fills past their own seq cursor and ack what they processed.
+The ingester fetches the union of registered wallets.
+
+The same module is kept in ProjectK-polycopyman/worker/fill_log.py.
+"""
+import json
+import os
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+from orderfilled import Fill
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS fills (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        block_number INTEGER NOT NULL,
+        log_index INTEGER NOT NULL,
+        tx_hash TEXT NOT NULL,
+        maker TEXT NOT NULL,
+        taker TEXT NOT NULL,
+        maker_asset_id TEXT NOT NULL,
+        taker_asset_id TEXT NOT NULL,
+        maker_amount TEXT NOT NULL,
+        taker_amount TEXT NOT NULL,
+        fee TEXT NOT NULL,
+        ingested_at INTEGER NOT NULL,
+        UNIQUE (tx_hash, log_index)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ingest_state (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS gaps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        from_block INTEGER NOT NULL,
+        to_block INTEGER NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        created_at INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS consumers (
+        name TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL,
+        wallets_json TEXT,
+        updated_at INTEGER NOT NULL
+    )
+    """,
+)
+
+
+class FillLog:
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Callers may open a FillLog on one thread and hand it to a worker
+        # thread; a single instance is never used by two threads at once.
+        self._conn = sqlite3.connect(path, isolation_level=None, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM ingest_state WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _max_seq(self) -> int:
+        row = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM fills").fetchone()
+        return int(row[0])
+
+    # Producer side
+
+    def ingested_through(self) -> int:
+        return int(self._get("ingested_through") or "0")
+
+    def _set_through(self, through_block: int) -> None:
+        self._conn.execute(
+            "INSERT INTO ingest_state(key, value) VALUES('ingested_through', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (str(through_block),),
+        )
+
+    def append(self, fills: Iterable[Fill], through_block: int, gap_id: Optional[int] = None) -> int:
+        """Append one window's fills and advance the ingest cursor atomically.
+
+        For a backfilled range (gap_id) the gap row is deleted instead.
+        """
+        now = int(time.time())
+        rows = [
+            (
+                f.block_number,
+                f.log_index,
+                f.tx_hash,
+                f.maker,
+                f.taker,
+                str(f.maker_asset_id),
+                str(f.taker_asset_id),
+                str(f.maker_amount),
+                str(f.taker_amount),
+                str(f.fee),
+                now,
+            )
+            for f in fills
+        ]
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO fills(
+                    block_number, log_index, tx_hash, maker, taker,
+                    maker_asset_id, taker_asset_id, maker_amount, taker_amount, fee, ingested_at
+                )
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            inserted = conn.total_changes - before
+            if gap_id is None:
+                self._set_through(through_block)
+            else:
+                conn.execute("DELETE FROM gaps WHERE id=?", (gap_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return inserted
+
+    def skip_to(self, through_block: int) -> None:
+        """Move the cursor forward, recording the skipped blocks as a gap."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            start = self.ingested_through() + 1
+            if through_block >= start:
+                conn.execute(
+                    "INSERT INTO gaps(from_block, to_block, created_at) VALUES(?, ?, ?)",
+                    (start, through_block, int(time.time())),
+                )
+            self._set_through(through_block)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def list_gaps(self, limit: int) -> list[tuple[int, int, int]]:
+        rows = self._conn.execute(
+            "SELECT id, from_block, to_block FROM gaps ORDER BY from_block LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [(int(r[0]), int(r[1]), int(r[2])) for r in rows]
+
+    def split_gap(self, gap_id: int, size: int) -> None:
+        """Split the first size blocks off a gap; the rest stays one gap."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT from_block, to_block FROM gaps WHERE id=?", (gap_id,)).fetchone()
+            if row and int(row[1]) - int(row[0]) + 1 > size:
+                now = int(time.time())
+                conn.execute("DELETE FROM gaps WHERE id=?", (gap_id,))
+                head_end = int(row[0]) + size - 1
+                conn.executemany(
+                    "INSERT INTO gaps(from_block, to_block, created_at) VALUES(?, ?, ?)",
+                    [(int(row[0]), head_end, now), (head_end + 1, int(row[1]), now)],
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def fail_gap(self, gap_id: int, error: str) -> None:
+        self._conn.execute(
+            "UPDATE gaps SET attempts=attempts+1, last_error=? WHERE id=?",
+            (error[:500], gap_id),
+        )
+
+    def watched_wallets(self) -> Optional[set[str]]:
+        """Union of consumer wallets; None when some consumer wants every fill."""
+        wallets: set[str] = set()
+        for (wallets_json,) in self._conn.execute("SELECT wallets_json FROM consumers"):
+            if wallets_json is None:
+                return None
+            wallets.update(json.loads(wallets_json))
+        return wallets
+
+    def prune(self, retention_seconds: int) -> int:
+        """Drop fills every consumer has acked and that are past retention."""
+        row = self._conn.execute("SELECT MIN(last_seq) FROM consumers").fetchone()
+        if row is None or row[0] is None:
+            return 0
+        cutoff = int(time.time()) - retention_seconds
+        cur = self._conn.execute(
+            "DELETE FROM fills WHERE seq <= ? AND ingested_at < ?",
+            (int(row[0]), cutoff),
+        )
+        return int(cur.rowcount or 0)
+
+    # Consumer side
+
+    def register(self, consumer: str, wallets: Optional[Iterable[str]]) -> None:
+        """Publish the consumer's wallet set; new consumers start at the current tail."""
+        now = int(time.time())
+        wallets_json = None if wallets is None else json.dumps(sorted({w.lower() for w in wallets}))
+        self._conn.execute(
+            """
+            INSERT INTO consumers(name, last_seq, wallets_json, updated_at)
+            VALUES(?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                wallets_json=excluded.wallets_json,
+                updated_at=excluded.updated_at
+            """,
+            (consumer, self._max_seq(), wallets_json, now),
+        )
+
+    def read(self, consumer: str, limit: int = 5000) -> tuple[list[Fill], int, int]:
+        """Return (fills, last_seq, through_block) past the consumer's cursor.
+
+        through_block is the block up to which the consumer has seen every
+        fill once these are processed.
+        """
+        conn = self._conn
+        # One read transaction so the cursor and the rows come from the same snapshot.
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT last_seq FROM consumers WHERE name=?", (consumer,)).fetchone()
+            if row is None:
+                raise KeyError(f"consumer not registered: {consumer}")
+            through_block = self.ingested_through()
+            rows = conn.execute(
+                """
+                SELECT seq, block_number, log_index, tx_hash, maker, taker,
+                       maker_asset_id, taker_asset_id, maker_amount, taker_amount, fee
+                FROM fills
+                WHERE seq > ?
+                ORDER BY seq
+                LIMIT ?
+                """,
+                (int(row[0]), limit),
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        last_seq = int(row[0])
+        fills = []
+        for r in rows:
+            last_seq = int(r[0])
+            fills.append(
+                Fill(
+                    int(r[1]),
+                    int(r[2]),
+                    r[3],
+                    r[4],
+                    r[5],
+                    int(r[6]),
+                    int(r[7]),
+                    int(r[8]),
+                    int(r[9]),
+                    int(r[10]),
+                )
+            )
+        if len(rows) == limit:
+            through_block = min(through_block, fills[-1].block_number - 1)
+        return fills, last_seq, through_block
+
+    def ack(self, consumer: str, last_seq: int) -> None:
+        self._conn.execute(
+            "UPDATE consumers SET last_seq=MAX(last_seq, ?), updated_at=? WHERE name=?",
+            (last_seq, int(time.time()), consumer),
+        )
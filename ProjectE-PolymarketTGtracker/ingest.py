@@ -0,0 +1,182 @@
+"""Single OrderFilled ingester for every local consumer.
+
+Fetches each confirmed block range once, decodes it and appends the fills
+to the shared fill log (fill_log.py). Only the wallets registered by
+consumers are requested from the RPC, unless a consumer asked for all fills.
+"""
+import logging
+import os
+import time
+
+from web3 import Web3
+
+from config import (
+    RPC_URL,
+    POLL_SECONDS,
+    CONFIRMATIONS,
+    MAX_BLOCK_RANGE,
+    BLOCK_RANGE_MIN,
+    BLOCK_RANGE_MAX,
+    BLOCK_RANGE_SLOW_MS,
+    MAX_LAG_BLOCKS,
+    CTF_EXCHANGE,
+    FILL_LOG_PATH,
+    FILL_LOG_RETENTION_SECONDS,
+    BACKFILL_WORKERS,
+    LOG_DIR,
+    INGEST_LOG_PATH,
+)
+from backfill import Backfill
+from block_range import RangeController
+from fill_log import FillLog
+from log_fetch import fetch_wallet_logs, get_logs_calls, topic_chunks
+from orderfilled import EVENT_SIG, decode_batch
+from rpc_pool import PoolProvider, RpcPool, parse_urls
+
+PRUNE_INTERVAL_SECONDS = 600
+
+
+def setup_logging() -> None:
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=INGEST_LOG_PATH,
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+
+def run() -> None:
+    setup_logging()
+    logging.info("ingest_start path=%s", FILL_LOG_PATH)
+    if not RPC_URL:
+        raise SystemExit("PROJECTE_RPC_URL is not set")
+
+    log = FillLog(FILL_LOG_PATH)
+    rpc = RpcPool(parse_urls(RPC_URL), timeout=20)
+    w3 = Web3(PoolProvider(rpc))
+    topic0 = w3.keccak(text=EVENT_SIG).hex()
+    exchanges = [
+        Web3.to_checksum_address(addr.strip())
+        for addr in CTF_EXCHANGE.split(",")
+        if addr.strip()
+    ]
+
+    def fetch(wallets, from_block: int, to_block: int) -> list:
+        if wallets is None:
+            return w3.eth.get_logs(
+                {
+                    "fromBlock": from_block,
+                    "toBlock": to_block,
+                    "address": exchanges,
+                    "topics": [topic0],
+                }
+            )
+        if wallets:
+            return fetch_wallet_logs(w3, exchanges, topic0, list(wallets), from_block, to_block)
+        return []
+
+    def fetch_calls(wallets) -> int:
+        # get_logs requests fetch() makes for these wallets.
+        return get_logs_calls(topic_chunks(wallets)) if wallets else 1
+
+    def append(logs: list, to_block: int, gap_id=None) -> int:
+        batch = decode_batch(logs)
+        if batch.skipped:
+            logging.warning("log_parse_skipped count=%s", batch.skipped)
+        return log.append(batch.rows(), to_block, gap_id=gap_id)
+
+    def handle_gap(gap_id: int, from_block: int, to_block: int, logs: list) -> None:
+        inserted = append(logs, to_block, gap_id=gap_id)
+        logging.info("backfill blocks=%s->%s logs=%s inserted=%s gap=%s", from_block, to_block, len(logs), inserted, gap_id)
+
+    # The backfill thread gets its own connection for gap bookkeeping. Its
+    # fetch workers run on a thread pool and must not share that connection,
+    # so they use the wallets the main loop last read from its own.
+    gap_log = FillLog(FILL_LOG_PATH)
+    watched = {"wallets": log.watched_wallets()}
+    backfill = Backfill(
+        lambda from_block, to_block: fetch(watched["wallets"], from_block, to_block),
+        gap_log.list_gaps,
+        gap_log.split_gap,
+        gap_log.fail_gap,
+        workers=BACKFILL_WORKERS,
+        ranges=RangeController(MAX_BLOCK_RANGE, BLOCK_RANGE_MIN, BLOCK_RANGE_MAX, slow_ms=BLOCK_RANGE_SLOW_MS),
+        idle_seconds=POLL_SECONDS,
+        fetch_calls=lambda: fetch_calls(watched["wallets"]),
+    ).start()
+
+    ranges = RangeController(
+        MAX_BLOCK_RANGE,
+        BLOCK_RANGE_MIN,
+        BLOCK_RANGE_MAX,
+        slow_ms=BLOCK_RANGE_SLOW_MS,
+    )
+    last_block = log.ingested_through()
+    last_prune_at = 0
+
+    while True:
+        try:
+            now = int(time.time())
+            if now - last_prune_at >= PRUNE_INTERVAL_SECONDS:
+                pruned = log.prune(FILL_LOG_RETENTION_SECONDS)
+                last_prune_at = now
+                if pruned:
+                    logging.info("fills_pruned deleted=%s", pruned)
+                for endpoint in rpc.stats()["rpc_endpoints"]:
+                    logging.info("rpc_endpoint %s", " ".join(f"{k}={v}" for k, v in endpoint.items()))
+
+            backfill.drain(handle_gap, BACKFILL_WORKERS)
+
+            target = max(w3.eth.block_number - CONFIRMATIONS, 0)
+            if last_block == 0:
+                last_block = max(target - MAX_BLOCK_RANGE, 0)
+                log.append([], last_block)
+            elif target - last_block > MAX_LAG_BLOCKS:
+                logging.warning("ingest_lag_jump target=%s lag_blocks=%s", target, target - last_block)
+                last_block = max(target - MAX_BLOCK_RANGE, 0)
+                log.skip_to(last_block)
+                backfill.wake()
+
+            if target <= last_block:
+                time.sleep(POLL_SECONDS)
+                continue
+
+            from_block = last_block + 1
+            to_block = min(target, last_block + ranges.range)
+            wallets = log.watched_wallets()
+            watched["wallets"] = wallets
+            started = time.monotonic()
+            try:
+                logs = fetch(wallets, from_block, to_block)
+            except Exception as exc:
+                if ranges.failed(exc):
+                    logging.warning("get_logs limit; range=%s retry_in=%.1fs error=%s", ranges.range, ranges.backoff, exc)
+                    time.sleep(ranges.backoff)
+                    continue
+                raise
+            latency_ms = int((time.monotonic() - started) * 1000)
+            ranges.observe(to_block - from_block + 1, len(logs), latency_ms, calls=fetch_calls(wallets))
+            inserted = append(logs, to_block)
+            last_block = to_block
+            logging.info(
+                "ingest blocks=%s->%s logs=%s inserted=%s wallets=%s range=%s latency_ms=%s",
+                from_block,
+                to_block,
+                len(logs),
+                inserted,
+                "all" if wallets is None else len(wallets),
+                ranges.range,
+                latency_ms,
+            )
+            if to_block < target:
+                continue
+        except Exception:
+            logging.exception("ingest_error")
+            time.sleep(2)
+            continue
+
+        time.sleep(POLL_SECONDS)
+
+
+if __name__ == "__main__":
+    run()
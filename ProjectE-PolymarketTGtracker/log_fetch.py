@@ -0,0 +1,61 @@
+from typing import Iterable
+
+from web3 import Web3
+
+from config import TOPIC_FILTER_CHUNK
+
+
+def wallet_topic(address: str) -> str:
+    return "0x" + address.lower().replace("0x", "").rjust(64, "0")
+
+
+def topic_chunks(wallets: Iterable[str]) -> list[list[str]]:
+    """Wallet topics in TOPIC_FILTER_CHUNK-sized OR-lists, to stay under the RPC's topic limit."""
+    topics = [wallet_topic(addr) for addr in sorted(wallets)]
+    chunk_size = max(1, TOPIC_FILTER_CHUNK)
+    return [topics[i : i + chunk_size] for i in range(0, len(topics), chunk_size)]
+
+
+def get_logs_calls(chunks: list[list[str]]) -> int:
+    """Requests fetch_topic_logs makes for `chunks`: one per topic position per chunk."""
+    return 2 * len(chunks)
+
+
+def fetch_wallet_logs(
+    w3: Web3,
+    exchanges: list[str],
+    topic0: str,
+    wallets: list[str],
+    from_block: int,
+    to_block: int,
+) -> list:
+    """Fetch only fills where a watched wallet is maker (topic 2) or taker (topic 3)."""
+    return fetch_topic_logs(w3, exchanges, topic0, topic_chunks(wallets), from_block, to_block)
+
+
+def fetch_topic_logs(
+    w3: Web3,
+    exchanges: list[str],
+    topic0: str,
+    chunks: list[list[str]],
+    from_block: int,
+    to_block: int,
+) -> list:
+    """fetch_wallet_logs with the topic OR-lists already built (see topic_chunks).
+
+    A log matching both positions comes back twice and is de-duplicated by
+    (tx hash, log index).
+    """
+    seen: dict[tuple[bytes, int], object] = {}
+    for chunk in chunks:
+        for position_filter in ([topic0, None, chunk], [topic0, None, None, chunk]):
+            for log in w3.eth.get_logs(
+                {
+                    "fromBlock": from_block,
+                    "toBlock": to_block,
+                    "address": exchanges,
+                    "topics": position_filter,
+                }
+            ):
+                seen.setdefault((bytes(log["transactionHash"]), log["logIndex"]), log)
+    return sorted(seen.values(), key=lambda log: (log["blockNumber"], log["logIndex"]))
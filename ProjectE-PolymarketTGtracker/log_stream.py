@@ -0,0 +1,176 @@
+import json
+import logging
+import threading
+import time
+from typing import Optional
+
+from hexbytes import HexBytes
+
+# newHeads timestamps kept for block_timestamp(), in blocks behind the head.
+HEAD_TIMES_KEPT = 1024
+
+
+def _normalize_log(raw: dict) -> dict:
+    # Match the shape web3's get_logs returns so process_logs can take either.
+    return {
+        "address": raw.get("address"),
+        "topics": [HexBytes(t) for t in raw.get("topics", [])],
+        "data": HexBytes(raw.get("data") or "0x"),
+        "blockNumber": int(raw["blockNumber"], 16),
+        "transactionHash": HexBytes(raw["transactionHash"]),
+        "logIndex": int(raw["logIndex"], 16),
+        "removed": bool(raw.get("removed")),
+    }
+
+
+class LogStream:
+    """eth_subscribe("logs") feed with a reorg-aware confirmation buffer.
+
+    A background thread keeps a WebSocket subscription to newHeads and to
+    the OrderFilled logs of the exchanges. Logs are buffered per block until
+    the tracker has committed them and calls discard(); take() only reads,
+    so a window that fails and is retried sees the same logs again.
+    Notifications with removed=true drop the log again. After every (re)connect the stream only vouches for blocks after
+    the first head it saw, so the tracker catches up with get_logs below
+    covered_from().
+    """
+
+    def __init__(self, ws_url: str, addresses: list[str], topics: list, stale_seconds: int = 60) -> None:
+        self._ws_url = ws_url
+        self._filter = {"address": addresses, "topics": topics}
+        self._stale_seconds = stale_seconds
+        self._cond = threading.Condition()
+        self._buffer: dict[int, dict[tuple[bytes, int], dict]] = {}
+        self._head = 0
+        # block number -> timestamp from newHeads, for alert latency
+        self._head_times: dict[int, int] = {}
+        self._covered_from: Optional[int] = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="log-stream", daemon=True)
+
+    def start(self) -> "LogStream":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def head(self) -> Optional[int]:
+        with self._cond:
+            if self._covered_from is None:
+                return None
+            return self._head
+
+    def block_timestamp(self, number: int) -> Optional[int]:
+        with self._cond:
+            return self._head_times.get(number)
+
+    def covered_from(self) -> Optional[int]:
+        with self._cond:
+            return self._covered_from
+
+    def wait_for_head(self, timeout: float) -> None:
+        with self._cond:
+            head = self._head
+            self._cond.wait_for(lambda: self._head != head or self._stopped, timeout=timeout)
+
+    def take(self, from_block: int, to_block: int) -> Optional[list[dict]]:
+        """Return buffered logs for the range, or None if it is not fully covered.
+
+        The logs stay buffered until discard() so a retried window gets them again.
+        """
+        with self._cond:
+            if self._covered_from is None or from_block < self._covered_from:
+                return None
+            logs = []
+            for block in sorted(b for b in self._buffer if from_block <= b <= to_block):
+                logs.extend(sorted(self._buffer[block].values(), key=lambda log: log["logIndex"]))
+            return logs
+
+    def discard(self, to_block: int) -> None:
+        """Drop buffered blocks up to to_block once the caller has committed them."""
+        with self._cond:
+            for block in [b for b in self._buffer if b <= to_block]:
+                del self._buffer[block]
+
+    def _on_head(self, number: int, subscribed: bool, timestamp: Optional[int] = None) -> None:
+        with self._cond:
+            if timestamp is not None:
+                self._head_times[number] = timestamp
+                if len(self._head_times) > HEAD_TIMES_KEPT:
+                    for old in [n for n in self._head_times if n <= number - HEAD_TIMES_KEPT]:
+                        del self._head_times[old]
+            if self._covered_from is None and subscribed:
+                self._covered_from = number + 1
+                logging.info("log_stream_covered from=%s", self._covered_from)
+            if number < self._head:
+                logging.warning("log_stream_reorg head=%s previous=%s", number, self._head)
+            self._head = number
+            self._cond.notify_all()
+
+    def _on_log(self, raw: dict) -> None:
+        log = _normalize_log(raw)
+        key = (bytes(log["transactionHash"]), log["logIndex"])
+        with self._cond:
+            bucket = self._buffer.setdefault(log["blockNumber"], {})
+            if log["removed"]:
+                bucket.pop(key, None)
+            else:
+                bucket[key] = log
+
+    def _reset(self) -> None:
+        with self._cond:
+            self._covered_from = None
+            self._buffer.clear()
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        import websocket
+
+        backoff = 1.0
+        while not self._stopped:
+            ws = None
+            try:
+                ws = websocket.create_connection(self._ws_url, timeout=self._stale_seconds)
+                ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}))
+                ws.send(
+                    json.dumps(
+                        {"jsonrpc": "2.0", "id": 2, "method": "eth_subscribe", "params": ["logs", self._filter]}
+                    )
+                )
+                subs: dict[str, str] = {}
+                pending = {1: "heads", 2: "logs"}
+                logging.info("log_stream_connected url=%s", self._ws_url)
+                while not self._stopped:
+                    msg = json.loads(ws.recv())
+                    if "id" in msg and msg["id"] in pending:
+                        if msg.get("error"):
+                            raise RuntimeError(f"eth_subscribe failed: {msg['error']}")
+                        subs[msg["result"]] = pending.pop(msg["id"])
+                        if not pending:
+                            backoff = 1.0
+                        continue
+                    params = msg.get("params") or {}
+                    kind = subs.get(params.get("subscription"))
+                    result = params.get("result")
+                    if kind == "heads" and result:
+                        self._on_head(
+                            int(result["number"], 16),
+                            subscribed=not pending,
+                            timestamp=int(result["timestamp"], 16) if result.get("timestamp") else None,
+                        )
+                    elif kind == "logs" and result and not pending:
+                        self._on_log(result)
+            except Exception as exc:
+                if not self._stopped:
+                    logging.warning("log_stream_disconnected error=%s retry_in=%.0fs", exc, backoff)
+            finally:
+                self._reset()
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+            if not self._stopped:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
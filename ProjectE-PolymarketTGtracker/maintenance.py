@@ -0,0 +1,144 @@
+"""tracker.db upkeep: TTL pruning, incremental vacuum and WAL checkpoint.
+
+The tracker calls maybe_run() from its loop (the pipeline from its DB
+thread) every PROJECTE_MAINTENANCE_INTERVAL_SECONDS. One run
+
+- deletes expired sent_events, track_buttons and trade_counts rows in
+  batches of PROJECTE_MAINTENANCE_BATCH_SIZE, one short transaction each,
+- returns up to PROJECTE_MAINTENANCE_VACUUM_PAGES free pages to the
+  filesystem (auto_vacuum=INCREMENTAL),
+- checkpoints and truncates the WAL,
+- appends file sizes to state.db_size_history and logs the 24h growth.
+
+    python3 maintenance.py           # one run now
+    python3 maintenance.py --vacuum  # one-off full VACUUM; converts a DB
+                                     # created before auto_vacuum was set
+"""
+import json
+import logging
+import sys
+import time
+
+import metrics
+from config import (
+    DB_SIZE_HISTORY_MAX,
+    MAINTENANCE_BATCH_SIZE,
+    MAINTENANCE_INTERVAL_SECONDS,
+    MAINTENANCE_MAX_BATCHES,
+    MAINTENANCE_VACUUM_PAGES,
+    SENT_EVENTS_TTL_DAYS,
+    TRACK_BUTTONS_TTL_DAYS,
+    TRADE_COUNTS_TTL_DAYS,
+)
+from db import (
+    checkpoint_wal,
+    db_file_stats,
+    delete_expired,
+    forget_sent_before,
+    get_state,
+    incremental_vacuum,
+    init_db,
+    set_state,
+    vacuum_full,
+)
+
+HISTORY_KEY = "db_size_history"
+# Lets the bot process take the write lock between delete batches.
+BATCH_PAUSE_SECONDS = 0.02
+
+_warned_auto_vacuum = False
+
+
+def _cutoffs(now: int) -> dict:
+    cutoffs = {}
+    if SENT_EVENTS_TTL_DAYS > 0:
+        cutoffs["sent_events"] = now - SENT_EVENTS_TTL_DAYS * 86400
+    if TRACK_BUTTONS_TTL_DAYS > 0:
+        cutoffs["track_buttons"] = now - TRACK_BUTTONS_TTL_DAYS * 86400
+    if TRADE_COUNTS_TTL_DAYS > 0:
+        # trade_counts.date is a YYYY-MM-DD string.
+        cutoffs["trade_counts"] = time.strftime("%Y-%m-%d", time.gmtime(now - TRADE_COUNTS_TTL_DAYS * 86400))
+    return cutoffs
+
+
+def _prune(table: str, cutoff) -> int:
+    deleted = 0
+    for _ in range(MAINTENANCE_MAX_BATCHES):
+        n = delete_expired(table, cutoff, MAINTENANCE_BATCH_SIZE)
+        deleted += n
+        if n < MAINTENANCE_BATCH_SIZE:
+            break
+        time.sleep(BATCH_PAUSE_SECONDS)
+    return deleted
+
+
+def _record_size(now: int, stats: dict) -> float:
+    """Append to the size history; returns DB growth in bytes over the last ~24h."""
+    try:
+        history = json.loads(get_state(HISTORY_KEY) or "[]")
+    except ValueError:
+        history = []
+    history.append([now, stats["db_bytes"], stats["free_bytes"], stats["wal_bytes"]])
+    history = history[-DB_SIZE_HISTORY_MAX:]
+    set_state(HISTORY_KEY, json.dumps(history, separators=(",", ":")))
+    older = [entry for entry in history if entry[0] <= now - 86400]
+    base = older[-1] if older else history[0]
+    return stats["db_bytes"] - base[1]
+
+
+def run_once() -> dict:
+    global _warned_auto_vacuum
+    now = int(time.time())
+    report: dict = {}
+    with metrics.timer("maintenance"):
+        for table, cutoff in _cutoffs(now).items():
+            report[f"pruned_{table}"] = _prune(table, cutoff)
+            if table == "sent_events":
+                forget_sent_before(cutoff)
+        stats = db_file_stats()
+        if stats["auto_vacuum"] == 2:
+            report["vacuumed_pages"] = incremental_vacuum(MAINTENANCE_VACUUM_PAGES)
+        elif not _warned_auto_vacuum:
+            _warned_auto_vacuum = True
+            logging.warning("db_auto_vacuum_off run `python3 maintenance.py --vacuum` once to reclaim free pages")
+        busy, wal_frames, checkpointed = checkpoint_wal()
+        report["wal_checkpoint_busy"] = busy
+        stats = db_file_stats()
+        growth = _record_size(now, stats)
+    metrics.inc("pruned_rows", sum(v for k, v in report.items() if k.startswith("pruned_")))
+    report.update(
+        db_mb=round(stats["db_bytes"] / 1e6, 1),
+        free_mb=round(stats["free_bytes"] / 1e6, 1),
+        wal_mb=round(stats["wal_bytes"] / 1e6, 1),
+        growth_24h_mb=round(growth / 1e6, 1),
+    )
+    logging.info("db_maintenance %s", " ".join(f"{k}={v}" for k, v in report.items()))
+    return report
+
+
+def maybe_run(last_run_at: int) -> int:
+    """run_once() if the interval has passed; returns the new last_run_at."""
+    now = int(time.time())
+    if now - last_run_at < MAINTENANCE_INTERVAL_SECONDS:
+        return last_run_at
+    try:
+        run_once()
+    except Exception:
+        logging.exception("db_maintenance_error")
+    return now
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    init_db()
+    if "--vacuum" in sys.argv[1:]:
+        before = db_file_stats()["db_bytes"]
+        started = time.time()
+        vacuum_full()
+        print(f"vacuum bytes={before}->{db_file_stats()['db_bytes']} elapsed={time.time() - started:.1f}s")
+        return
+    print(json.dumps(run_once()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,92 @@
+import atexit
 import json
+import logging
 import os
+import threading
 import time
-from typing import Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import MemoryHandler, RotatingFileHandler
+from typing import Callable, Dict, Iterable, Optional
 
 import requests
 
-from config import GAMMA_API_BASE, MARKET_CACHE_TTL_SECONDS
+import metrics
+from config import (
+    GAMMA_API_BASE,
+    MARKET_CACHE_TTL_SECONDS,
+    MARKET_CACHE_FLUSH_SECONDS,
+    MARKET_CACHE_FLUSH_BATCH,
+    MARKET_CACHE_MAX_ENTRIES,
+    MARKET_CACHE_FULL_SYNC_SECONDS,
+    MARKET_CACHE_LOOKUP_BATCH,
+    MARKET_CACHE_LOOKUP_WORKERS,
+    MARKET_CACHE_LOG_PATH,
+    MARKET_CACHE_LOG_LEVEL,
+    MARKET_CACHE_LOG_MAX_BYTES,
+    MARKET_CACHE_LOG_BACKUPS,
+    MARKET_CACHE_HIT_LOG_SAMPLE,
+    MARKET_CACHE_STATS_SECONDS,
+    MARKET_CACHE_MISS_TTL_SECONDS,
+)
+from db import count_token_meta, get_state, get_token_meta, set_state, upsert_token_meta
 
 CACHE_PATH = os.path.join(os.path.dirname(__file__), "market_cache.json")
-LOG_PATH = os.path.join(os.path.dirname(__file__), "market_cache.log")
+# Lines held in memory before a write; WARNING and above are written at once.
+LOG_BUFFER_LINES = 200
+STORE_TS_KEY = "token_meta_synced_at"
+STORE_FULL_TS_KEY = "token_meta_full_synced_at"
+STORE_HWM_KEY = "token_meta_market_hwm"
 
 
-def _log(message: str) -> None:
-    ts = time.strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(f"{ts} {message}\n")
+def _setup_logger() -> logging.Logger:
+    logger = logging.getLogger("market_cache")
+    logger.setLevel(getattr(logging, MARKET_CACHE_LOG_LEVEL, logging.INFO))
+    # Keep cache chatter out of the tracker/bot logs.
+    logger.propagate = False
+    if not logger.handlers:
+        directory = os.path.dirname(MARKET_CACHE_LOG_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        target = RotatingFileHandler(
+            MARKET_CACHE_LOG_PATH,
+            maxBytes=MARKET_CACHE_LOG_MAX_BYTES,
+            backupCount=MARKET_CACHE_LOG_BACKUPS,
+            encoding="utf-8",
+            delay=True,
+        )
+        target.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s", "%Y-%m-%d %H:%M:%S"))
+        logger.addHandler(MemoryHandler(LOG_BUFFER_LINES, flushLevel=logging.WARNING, target=target))
+    return logger
+
+
+_logger = _setup_logger()
+_counters_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_stats_logged_at = time.monotonic()
+# Token id -> monotonic time of the last failed lookup; not refetched inline
+# until MARKET_CACHE_MISS_TTL_SECONDS have passed.
+_missed_lock = threading.Lock()
+_missed_at: Dict[str, float] = {}
+
+
+def _log(message: str, level: int = logging.INFO) -> None:
+    _logger.log(level, message)
 
 
-def _load_cache() -> Optional[dict]:
+def _count(name: str, value: int = 1) -> int:
+    with _counters_lock:
+        total = _counters.get(name, 0) + value
+        _counters[name] = total
+    return total
+
+
+def _flush_log() -> None:
+    for handler in _logger.handlers:
+        handler.flush()
+
+
+def _load_legacy_cache() -> Optional[dict]:
     if not os.path.exists(CACHE_PATH):
         return None
     try:
@@ -27,82 +96,278 @@ def _load_cache() -> Optional[dict]:
         return None
 
 
-def _save_cache(data: dict) -> None:
-    with open(CACHE_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f)
+def _market_id(m: dict) -> int:
+    try:
+        return int(m.get("id") or 0)
+    except (TypeError, ValueError):
+        return 0
 
 
-def _fetch_markets() -> list[dict]:
-    markets = []
+def _fetch_markets(on_batch: Callable[[list[dict]], None], since_id: int = 0) -> bool:
+    """Page through /markets ordered by id and hand each page to on_batch.
+
+    With since_id set, pages are read newest-first and paging stops at the
+    first market at or below the high-water mark. Returns False when a page
+    request failed, so callers do not advance the high-water mark past
+    markets that were never seen.
+    """
     offset = 0
     limit = 200
     while True:
-        resp = _request_gamma(
-            params={"limit": limit, "offset": offset},
-            timeout=20,
-        )
+        params = {"limit": limit, "offset": offset, "order": "id"}
+        params["ascending"] = "false" if since_id else "true"
+        resp = _request_gamma(params=params, timeout=20)
         if resp is None:
-            _log(f"fetch_markets_failed offset={offset}")
-            break
+            _log(f"fetch_markets_failed offset={offset} since_id={since_id}", logging.WARNING)
+            return False
         batch = resp
         if not batch:
-            break
-        markets.extend(batch)
+            return True
+        if since_id:
+            fresh = [m for m in batch if _market_id(m) > since_id]
+            if fresh:
+                on_batch(fresh)
+            if len(fresh) < len(batch):
+                return True
+        else:
+            on_batch(batch)
         if len(batch) < limit:
-            break
+            return True
         offset += limit
-    return markets
 
 
-def build_token_map() -> Dict[str, dict]:
-    cache = _load_cache()
-    now = int(time.time())
-    if cache and now - cache.get("ts", 0) < MARKET_CACHE_TTL_SECONDS:
-        return cache.get("token_map", {})
+def _market_token_rows(m: dict) -> list[tuple[str, str, str, str]]:
+    outcomes = m.get("outcomes") or []
+    clob_ids = m.get("clobTokenIds") or []
+    if isinstance(outcomes, str):
+        try:
+            outcomes = json.loads(outcomes)
+        except Exception:
+            outcomes = []
+    if isinstance(clob_ids, str):
+        try:
+            clob_ids = json.loads(clob_ids)
+        except Exception:
+            clob_ids = []
+    if len(outcomes) != len(clob_ids):
+        return []
+    question = m.get("question") or m.get("title") or ""
+    slug = m.get("slug") or ""
+    return [(str(token_id), question, outcome, slug) for outcome, token_id in zip(outcomes, clob_ids)]
+
+
+class TokenIndex:
+    """Bounded in-memory working set over the token_meta table.
 
-    markets = _fetch_markets()
-    token_map: Dict[str, dict] = {}
+    Lookups hit an LRU dict first and fall back to an indexed SQLite read,
+    so resident memory follows the tokens the tracker actually sees rather
+    than the whole Gamma catalogue. Expired catalogues are re-synced into
+    token_meta on a background thread, page by page, and single-token
+    misses are written in batches.
+    """
 
-    for m in markets:
-        outcomes = m.get("outcomes") or []
-        clob_ids = m.get("clobTokenIds") or []
-        if isinstance(outcomes, str):
-            try:
-                outcomes = json.loads(outcomes)
-            except Exception:
-                outcomes = []
-        if isinstance(clob_ids, str):
+    def __init__(self, max_entries: int = MARKET_CACHE_MAX_ENTRIES) -> None:
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._pending: Dict[str, dict] = {}
+        self._ts = 0
+        self._loaded = False
+        self._refreshing = False
+        self._last_flush = time.monotonic()
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._ts = int(get_state(STORE_TS_KEY) or "0")
+            if self._ts == 0 and count_token_meta() == 0:
+                self._import_legacy_cache()
+            self._loaded = True
+            _log(f"index_loaded ts={self._ts}")
+
+    def _import_legacy_cache(self) -> None:
+        cache = _load_legacy_cache()
+        if not cache:
+            return
+        token_map = cache.get("token_map", {})
+        upsert_token_meta(
+            [
+                (str(token_id), m.get("question") or "", m.get("outcome") or "", m.get("slug") or "")
+                for token_id, m in token_map.items()
+            ]
+        )
+        self._ts = int(cache.get("ts", 0))
+        set_state(STORE_TS_KEY, str(self._ts))
+        _log(f"legacy_cache_imported tokens={len(token_map)}")
+
+    def _remember(self, token_id: str, market: dict) -> None:
+        self._entries[token_id] = market
+        self._entries.move_to_end(token_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def is_fresh(self) -> bool:
+        self._ensure_loaded()
+        return int(time.time()) - self._ts < MARKET_CACHE_TTL_SECONDS
+
+    def get(self, token_id: str) -> Optional[dict]:
+        self._ensure_loaded()
+        if not self.is_fresh():
+            self.refresh_async()
+        token_id = str(token_id)
+        with self._lock:
+            market = self._entries.get(token_id)
+            if market is not None:
+                self._entries.move_to_end(token_id)
+                return market
+        row = get_token_meta(token_id)
+        if not row:
+            return None
+        market = {"question": row[0] or "", "outcome": row[1] or "", "slug": row[2] or ""}
+        with self._lock:
+            self._remember(token_id, market)
+        return market
+
+    def put(self, token_id: str, market: dict) -> None:
+        self.put_many({str(token_id): market})
+
+    def put_many(self, markets: Dict[str, dict]) -> None:
+        self._ensure_loaded()
+        with self._lock:
+            for token_id, market in markets.items():
+                self._remember(str(token_id), market)
+                self._pending[str(token_id)] = market
+        self.maybe_flush()
+
+    def refresh(self, full: bool = False) -> int:
+        self._ensure_loaded()
+        now = int(time.time())
+        hwm = int(get_state(STORE_HWM_KEY) or "0")
+        full_synced_at = int(get_state(STORE_FULL_TS_KEY) or "0")
+        incremental = (
+            not full
+            and hwm > 0
+            and now - full_synced_at < MARKET_CACHE_FULL_SYNC_SECONDS
+        )
+        stats = {"markets": 0, "tokens": 0, "max_id": hwm}
+
+        def _merge(batch: list[dict]) -> None:
+            rows = []
+            for m in batch:
+                rows.extend(_market_token_rows(m))
+                stats["max_id"] = max(stats["max_id"], _market_id(m))
+            upsert_token_meta(rows)
+            with self._lock:
+                for token_id, question, outcome, slug in rows:
+                    if token_id in self._entries:
+                        self._entries[token_id] = {"question": question, "outcome": outcome, "slug": slug}
+            stats["markets"] += len(batch)
+            stats["tokens"] += len(rows)
+
+        complete = _fetch_markets(_merge, since_id=hwm if incremental else 0)
+        if complete:
+            set_state(STORE_HWM_KEY, str(stats["max_id"]))
+            if not incremental:
+                set_state(STORE_FULL_TS_KEY, str(now))
+        with self._lock:
+            self._ts = now
+        set_state(STORE_TS_KEY, str(now))
+        _log(
+            f"token_sync mode={'incremental' if incremental else 'full'} complete={complete} "
+            f"markets={stats['markets']} tokens={stats['tokens']} hwm={stats['max_id']}"
+        )
+        return stats["tokens"]
+
+    def refresh_async(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run() -> None:
             try:
-                clob_ids = json.loads(clob_ids)
-            except Exception:
-                clob_ids = []
-        if len(outcomes) != len(clob_ids):
-            continue
-        for outcome, token_id in zip(outcomes, clob_ids):
-            token_map[str(token_id)] = {
-                "question": m.get("question") or m.get("title") or "",
-                "outcome": outcome,
-                "slug": m.get("slug") or "",
-            }
+                count = self.refresh()
+                _log(f"index_refreshed tokens={count}")
+            except Exception as exc:
+                _log(f"index_refresh_failed error={exc}", logging.WARNING)
+            finally:
+                with self._lock:
+                    self._refreshing = False
 
-    _save_cache({"ts": now, "token_map": token_map})
-    return token_map
+        threading.Thread(target=_run, name="market-cache-refresh", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "pending": len(self._pending), "synced_at": self._ts}
+
+    def maybe_flush(self) -> None:
+        if not self._pending:
+            return
+        elapsed = time.monotonic() - self._last_flush
+        if len(self._pending) >= MARKET_CACHE_FLUSH_BATCH or elapsed >= MARKET_CACHE_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            pending = self._pending
+            self._pending = {}
+            self._last_flush = time.monotonic()
+        try:
+            upsert_token_meta(
+                [
+                    (token_id, m.get("question") or "", m.get("outcome") or "", m.get("slug") or "")
+                    for token_id, m in pending.items()
+                ]
+            )
+            _log(f"cache_flush tokens={len(pending)}")
+        except Exception as exc:
+            with self._lock:
+                for token_id, market in pending.items():
+                    self._pending.setdefault(token_id, market)
+            _log(f"cache_flush_failed error={exc}", logging.WARNING)
 
 
-def get_market_for_token(token_id: str) -> Optional[dict]:
-    token_map = build_token_map()
-    return token_map.get(str(token_id))
+_index = TokenIndex()
+atexit.register(_index.flush)
+
+
+def refresh_token_store(full: bool = False) -> int:
+    return _index.refresh(full=full)
+
+
+def flush_cache() -> None:
+    _index.maybe_flush()
+    _maybe_log_stats()
+
+
+def cache_stats() -> dict:
+    with _counters_lock:
+        stats = dict(_counters)
+    hits = stats.get("hits", 0)
+    lookups = hits + stats.get("misses", 0)
+    stats["hit_rate"] = round(hits / lookups, 4) if lookups else None
+    stats.update(_index.stats())
+    return stats
+
+
+def _maybe_log_stats() -> None:
+    """Write a cache_stats line every MARKET_CACHE_STATS_SECONDS and push the log buffer out."""
+    global _stats_logged_at
+    now = time.monotonic()
+    if now - _stats_logged_at < MARKET_CACHE_STATS_SECONDS:
+        return
+    _stats_logged_at = now
+    _log("cache_stats " + " ".join(f"{k}={v}" for k, v in cache_stats().items()))
+    _flush_log()
 
 
 def get_market_for_token_cached(token_id: str) -> Optional[dict]:
-    cache = _load_cache()
-    if not cache:
-        return None
-    now = int(time.time())
-    if now - cache.get("ts", 0) >= MARKET_CACHE_TTL_SECONDS:
-        return None
-    token_map = cache.get("token_map", {})
-    return token_map.get(str(token_id))
+    return _index.get(str(token_id))
 
 
 def fetch_market_for_token(token_id: str) -> Optional[dict]:
@@ -113,7 +378,7 @@ def fetch_market_for_token(token_id: str) -> Optional[dict]:
         backoff=1.2,
     )
     if not data:
-        _log(f"token_lookup_failed token_id={token_id}")
+        _log(f"token_lookup_failed token_id={token_id}", logging.WARNING)
         return None
     market = data[0]
     outcomes = market.get("outcomes") or []
@@ -129,7 +394,7 @@ def fetch_market_for_token(token_id: str) -> Optional[dict]:
         except Exception:
             clob_ids = []
     if len(outcomes) != len(clob_ids):
-        _log(f"token_lookup_mismatch token_id={token_id} outcomes={len(outcomes)} clob_ids={len(clob_ids)}")
+        _log(f"token_lookup_mismatch token_id={token_id} outcomes={len(outcomes)} clob_ids={len(clob_ids)}", logging.WARNING)
         return None
     for outcome, tid in zip(outcomes, clob_ids):
         if str(tid) == str(token_id):
@@ -147,23 +412,127 @@ def fetch_market_for_token(token_id: str) -> Optional[dict]:
     }
 
 
+def _recently_missed(token_id: str) -> bool:
+    with _missed_lock:
+        missed = _missed_at.get(token_id)
+        if missed is None:
+            return False
+        if time.monotonic() - missed < MARKET_CACHE_MISS_TTL_SECONDS:
+            return True
+        del _missed_at[token_id]
+        return False
+
+
+def _remember_missed(token_ids: Iterable[str]) -> None:
+    now = time.monotonic()
+    with _missed_lock:
+        for token_id in token_ids:
+            _missed_at[token_id] = now
+        if len(_missed_at) > MARKET_CACHE_MAX_ENTRIES:
+            cutoff = now - MARKET_CACHE_MISS_TTL_SECONDS
+            for token_id in [t for t, at in _missed_at.items() if at < cutoff]:
+                del _missed_at[token_id]
+
+
+def _forget_missed(token_ids: Iterable[str]) -> None:
+    with _missed_lock:
+        for token_id in token_ids:
+            _missed_at.pop(token_id, None)
+
+
 def get_market_for_token_fast(token_id: str) -> Optional[dict]:
+    """Index lookup, falling back to a single Gamma request.
+
+    Tokens that failed to resolve within MARKET_CACHE_MISS_TTL_SECONDS, in a
+    prefetch batch or here, return None without a request.
+    """
+    token_id = str(token_id)
+    started = time.perf_counter()
     cached = get_market_for_token_cached(token_id)
     if cached:
-        _log(f"cache_hit token_id={token_id}")
+        metrics.observe("market_lookup_hit", time.perf_counter() - started)
+        hits = _count("hits")
+        if MARKET_CACHE_HIT_LOG_SAMPLE > 0 and hits % MARKET_CACHE_HIT_LOG_SAMPLE == 0:
+            _log(f"cache_hit token_id={token_id} hits={hits} sample=1/{MARKET_CACHE_HIT_LOG_SAMPLE}")
         return cached
-    _log(f"cache_miss token_id={token_id}")
+    _count("misses")
+    if _recently_missed(token_id):
+        _count("miss_skipped")
+        return None
+    _log(f"cache_miss token_id={token_id}", logging.DEBUG)
     market = fetch_market_for_token(token_id)
+    metrics.observe("market_lookup_miss", time.perf_counter() - started)
     if not market:
+        _count("unresolved")
+        _remember_missed([token_id])
         return None
-    cache = _load_cache() or {}
-    token_map = cache.get("token_map", {})
-    token_map[str(token_id)] = market
-    _save_cache({"ts": int(time.time()), "token_map": token_map})
-    _log(f"cache_write token_id={token_id}")
+    _forget_missed([token_id])
+    _index.put(token_id, market)
+    _log(f"cache_write token_id={token_id}", logging.DEBUG)
     return market
 
 
+def fetch_markets_for_tokens(token_ids: list[str]) -> Dict[str, dict]:
+    """Resolve many token ids with one Gamma request per chunk.
+
+    clob_token_ids is sent as a repeated query parameter; chunks are fetched
+    on a small thread pool. Every outcome token of a returned market is
+    included, not only the requested ones.
+    """
+    chunk_size = max(1, MARKET_CACHE_LOOKUP_BATCH)
+    chunks = [token_ids[i : i + chunk_size] for i in range(0, len(token_ids), chunk_size)]
+
+    def _fetch(chunk: list[str]) -> list[dict]:
+        data = _request_gamma(
+            params={"clob_token_ids": chunk, "limit": len(chunk)},
+            timeout=6,
+            retries=3,
+            backoff=1.2,
+        )
+        if data is None:
+            _log(f"token_batch_lookup_failed tokens={len(chunk)}", logging.WARNING)
+        return data or []
+
+    resolved: Dict[str, dict] = {}
+    if not chunks:
+        return resolved
+    workers = max(1, min(MARKET_CACHE_LOOKUP_WORKERS, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for markets in pool.map(_fetch, chunks):
+            for m in markets:
+                for token_id, question, outcome, slug in _market_token_rows(m):
+                    resolved[token_id] = {"question": question, "outcome": outcome, "slug": slug}
+    return resolved
+
+
+def prefetch_markets(token_ids: Iterable[str]) -> int:
+    """Resolve all unknown token ids up front; returns how many were missing.
+
+    Tokens left unresolved are remembered so get_market_for_token_fast skips
+    them instead of retrying each one serially; recently missed tokens are
+    not re-requested here either.
+    """
+    missing = sorted(
+        {
+            str(t)
+            for t in token_ids
+            if str(t) != "0" and _index.get(str(t)) is None and not _recently_missed(str(t))
+        }
+    )
+    if not missing:
+        return 0
+    with metrics.timer("market_prefetch"):
+        resolved = fetch_markets_for_tokens(missing)
+    if resolved:
+        _index.put_many(resolved)
+        _forget_missed(resolved)
+    unresolved = [t for t in missing if t not in resolved]
+    _remember_missed(unresolved)
+    _count("prefetched", len(missing))
+    _log(f"prefetch tokens={len(missing)} resolved={len(missing) - len(unresolved)} unresolved={len(unresolved)}")
+    return len(missing)
+
+
 def _request_gamma(params: dict, timeout: int, retries: int = 2, backoff: float = 1.5) -> Optional[list[dict]]:
     url = f"{GAMMA_API_BASE}/markets"
     for attempt in range(1, retries + 1):
@@ -171,10 +540,12 @@ def _request_gamma(params: dict, timeout: int, retries: int = 2, backoff: float
             resp = requests.get(url, params=params, timeout=timeout)
             resp.raise_for_status()
             data = resp.json()
-            _log(f"gamma_ok attempt={attempt} params={params} items={len(data)}")
+            _count("gamma_ok")
+            _log(f"gamma_ok attempt={attempt} params={params} items={len(data)}", logging.DEBUG)
             return data
         except Exception as exc:
-            _log(f"gamma_error attempt={attempt} params={params} error={exc}")
+            _count("gamma_error")
+            _log(f"gamma_error attempt={attempt} params={params} error={exc}", logging.WARNING)
             if attempt < retries:
                 time.sleep(backoff * attempt)
     return None
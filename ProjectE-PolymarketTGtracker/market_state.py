@@ -0,0 +1,373 @@
+"""Per-slug market state (quotes, closed/resolved) for alert messages.
+
+Alert builders call describe() and only read memory. The tracker calls
+prefetch_states() once per window for slugs it has never seen; that only
+queues them and wakes the background thread, which fetches them in one
+bulk Gamma request, so alerts for a cold slug go out without state rather
+than waiting on Gamma. A slug Gamma did not resolve (or a failed request)
+is not queued again for MARKET_STATE_REFRESH_SECONDS; the periodic refresh
+retries it. The same thread refreshes every slug used within
+MARKET_STATE_TTL_SECONDS in bulk every MARKET_STATE_REFRESH_SECONDS. With PROJECTE_MARKET_STATE_WS_URL set, the
+outcome tokens of actively tracked positions also stream best bid/ask
+from the CLOB market channel between refreshes.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Iterable, Optional
+
+import requests
+
+from config import (
+    GAMMA_API_BASE,
+    MARKET_STATE_BATCH,
+    MARKET_STATE_REFRESH_SECONDS,
+    MARKET_STATE_TTL_SECONDS,
+    MARKET_STATE_WS_URL,
+)
+from db import list_active_tracked_slugs
+
+WS_PING_SECONDS = 10
+
+
+def _floats(value) -> list[Optional[float]]:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    out = []
+    for item in value or []:
+        try:
+            out.append(float(item))
+        except (TypeError, ValueError):
+            out.append(None)
+    return out
+
+
+def _strings(value) -> list[str]:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return [str(item) for item in value or []]
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_market(m: dict) -> Optional[dict]:
+    """Gamma market -> {closed, winner, outcomes: {name: {price, bid, ask, token}}}."""
+    names = _strings(m.get("outcomes"))
+    if not names:
+        return None
+    prices = _floats(m.get("outcomePrices"))
+    tokens = _strings(m.get("clobTokenIds"))
+    best_bid = _float(m.get("bestBid"))
+    best_ask = _float(m.get("bestAsk"))
+    outcomes = {}
+    for i, name in enumerate(names):
+        quote = {"price": prices[i] if i < len(prices) else None, "bid": None, "ask": None}
+        if i < len(tokens):
+            quote["token"] = tokens[i]
+        # Gamma quotes the book of the first outcome; a binary market's
+        # other side is its complement.
+        if i == 0:
+            quote["bid"], quote["ask"] = best_bid, best_ask
+        elif len(names) == 2:
+            quote["bid"] = 1 - best_ask if best_ask is not None else None
+            quote["ask"] = 1 - best_bid if best_bid is not None else None
+        outcomes[name] = quote
+    closed = bool(m.get("closed"))
+    winner = None
+    if closed:
+        winners = [name for name, q in outcomes.items() if q["price"] is not None and q["price"] >= 0.99]
+        winner = winners[0] if len(winners) == 1 else None
+    return {"closed": closed, "winner": winner, "outcomes": outcomes, "updated_at": time.time()}
+
+
+class MarketState:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._states: dict[str, dict] = {}
+        self._used_at: dict[str, float] = {}
+        # slug -> when prefetch last asked Gamma for it without a result
+        self._missed_at: dict[str, float] = {}
+        # Slugs queued by prefetch for the background thread.
+        self._cold: set[str] = set()
+        self._wake = threading.Event()
+        # token id -> (slug, outcome) for WebSocket updates
+        self._tokens: dict[str, tuple[str, str]] = {}
+        self._session = requests.Session()
+        self._ws_tokens: frozenset[str] = frozenset()
+        self._ws = None
+        self._started = False
+        self.refreshes = 0
+        self.errors = 0
+
+    def get(self, slug: str) -> Optional[dict]:
+        with self._lock:
+            self._used_at[slug] = time.time()
+            return self._states.get(slug)
+
+    def _fetch(self, slugs: list[str]) -> int:
+        updated = 0
+        for i in range(0, len(slugs), MARKET_STATE_BATCH):
+            chunk = slugs[i : i + MARKET_STATE_BATCH]
+            try:
+                resp = self._session.get(
+                    f"{GAMMA_API_BASE}/markets",
+                    params={"slug": chunk, "limit": len(chunk)},
+                    timeout=10,
+                )
+                resp.raise_for_status()
+                markets = resp.json()
+            except Exception as exc:
+                self.errors += 1
+                logging.warning("market_state_fetch_failed slugs=%s error=%s", len(chunk), exc)
+                continue
+            with self._lock:
+                for m in markets:
+                    slug = m.get("slug")
+                    state = _parse_market(m) if slug else None
+                    if state is None:
+                        continue
+                    self._states[slug] = state
+                    self._missed_at.pop(slug, None)
+                    for name, quote in state["outcomes"].items():
+                        if quote.get("token"):
+                            self._tokens[quote["token"]] = (slug, name)
+                    updated += 1
+        return updated
+
+    def prefetch(self, slugs: Iterable[str]) -> int:
+        """Queue slugs never seen before for a fetch; returns how many were missing.
+
+        Once start() has run this does not wait for Gamma.
+        """
+        now = time.time()
+        retry_before = now - MARKET_STATE_REFRESH_SECONDS
+        with self._lock:
+            missing = sorted(
+                {
+                    s
+                    for s in slugs
+                    if s and s not in self._states and self._missed_at.get(s, 0.0) < retry_before
+                }
+            )
+            for slug in missing:
+                self._used_at[slug] = now
+                # Cleared by _fetch on success; otherwise keeps the slug from
+                # being queued again until the refresher has had a go.
+                self._missed_at[slug] = now
+            if self._started:
+                self._cold.update(missing)
+        if missing:
+            if self._started:
+                self._wake.set()
+            else:
+                self._fetch(missing)
+        return len(missing)
+
+    def _fetch_cold(self) -> int:
+        with self._lock:
+            slugs = sorted(self._cold)
+            self._cold.clear()
+        return self._fetch(slugs) if slugs else 0
+
+    def refresh(self) -> int:
+        cutoff = time.time() - MARKET_STATE_TTL_SECONDS
+        tracked = set(list_active_tracked_slugs())
+        with self._lock:
+            for slug in [s for s, at in self._used_at.items() if at < cutoff and s not in tracked]:
+                self._used_at.pop(slug, None)
+                self._missed_at.pop(slug, None)
+                state = self._states.pop(slug, None)
+                for quote in (state or {}).get("outcomes", {}).values():
+                    self._tokens.pop(quote.get("token"), None)
+            slugs = sorted(set(self._used_at) | tracked)
+            self._cold.clear()
+        updated = self._fetch(slugs)
+        self.refreshes += 1
+        logging.info("market_state_refresh slugs=%s updated=%s", len(slugs), updated)
+        if MARKET_STATE_WS_URL:
+            self._update_ws_tokens(tracked)
+        return updated
+
+    def _run_refresh(self) -> None:
+        next_refresh = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_refresh:
+                    next_refresh = time.monotonic() + MARKET_STATE_REFRESH_SECONDS
+                    self.refresh()
+                else:
+                    self._fetch_cold()
+            except Exception:
+                logging.exception("market_state_refresh_error")
+            self._wake.wait(max(0.0, next_refresh - time.monotonic()))
+            self._wake.clear()
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        threading.Thread(target=self._run_refresh, name="market-state", daemon=True).start()
+        if MARKET_STATE_WS_URL:
+            threading.Thread(target=self._run_ws, name="market-state-ws", daemon=True).start()
+
+    # CLOB market channel
+
+    def _update_ws_tokens(self, tracked: set[str]) -> None:
+        with self._lock:
+            tokens = frozenset(
+                quote["token"]
+                for slug in tracked
+                for quote in self._states.get(slug, {}).get("outcomes", {}).values()
+                if quote.get("token")
+            )
+            changed = tokens != self._ws_tokens
+            self._ws_tokens = tokens
+            ws = self._ws
+        if changed and ws is not None:
+            # The reader loop reconnects and subscribes to the new set.
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _apply_quote(self, token: str, bid: Optional[float], ask: Optional[float], last: Optional[float] = None) -> None:
+        with self._lock:
+            target = self._tokens.get(token)
+            if target is None:
+                return
+            state = self._states.get(target[0])
+            if state is None:
+                return
+            quote = state["outcomes"].get(target[1])
+            if quote is None:
+                return
+            if bid is not None:
+                quote["bid"] = bid
+            if ask is not None:
+                quote["ask"] = ask
+            if last is not None:
+                quote["price"] = last
+            state["updated_at"] = time.time()
+
+    def _on_ws_event(self, event: dict) -> None:
+        kind = event.get("event_type")
+        if kind == "book":
+            bids = [_float(level.get("price")) for level in event.get("bids") or []]
+            asks = [_float(level.get("price")) for level in event.get("asks") or []]
+            bids = [p for p in bids if p is not None]
+            asks = [p for p in asks if p is not None]
+            self._apply_quote(str(event.get("asset_id")), max(bids, default=None), min(asks, default=None))
+        elif kind == "price_change":
+            for change in event.get("price_changes") or []:
+                self._apply_quote(
+                    str(change.get("asset_id")),
+                    _float(change.get("best_bid")),
+                    _float(change.get("best_ask")),
+                )
+        elif kind == "last_trade_price":
+            self._apply_quote(str(event.get("asset_id")), None, None, _float(event.get("price")))
+
+    def _run_ws(self) -> None:
+        import websocket
+
+        backoff = 1.0
+        while True:
+            tokens = self._ws_tokens
+            if not tokens:
+                time.sleep(MARKET_STATE_REFRESH_SECONDS)
+                continue
+            ws = None
+            try:
+                ws = websocket.create_connection(MARKET_STATE_WS_URL, timeout=WS_PING_SECONDS)
+                with self._lock:
+                    self._ws = ws
+                ws.send(json.dumps({"assets_ids": sorted(tokens), "type": "market"}))
+                logging.info("market_state_ws_connected tokens=%s", len(tokens))
+                backoff = 1.0
+                while tokens == self._ws_tokens:
+                    try:
+                        raw = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        ws.send("PING")
+                        continue
+                    if not raw or raw == "PONG":
+                        continue
+                    msg = json.loads(raw)
+                    for event in msg if isinstance(msg, list) else [msg]:
+                        self._on_ws_event(event)
+            except Exception as exc:
+                if tokens == self._ws_tokens:
+                    logging.warning("market_state_ws_disconnected error=%s retry_in=%.0fs", exc, backoff)
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, 60.0)
+            finally:
+                with self._lock:
+                    self._ws = None
+                if ws is not None:
+                    try:
+                        ws.close()
+                    except Exception:
+                        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "market_states": len(self._states),
+                "market_state_queued": len(self._cold),
+                "market_state_refreshes": self.refreshes,
+                "market_state_errors": self.errors,
+                "market_state_ws_tokens": len(self._ws_tokens),
+            }
+
+
+def _format_quote(value: Optional[float]) -> str:
+    return f"{value:.3f}".rstrip("0").rstrip(".") if value is not None else "-"
+
+
+_state = MarketState()
+
+
+def start_refresher() -> None:
+    _state.start()
+
+
+def prefetch_states(slugs: Iterable[str]) -> int:
+    return _state.prefetch(slugs)
+
+
+def state_stats() -> dict:
+    return _state.stats()
+
+
+def describe(slug: str, outcome: str) -> Optional[str]:
+    """One alert line with the market's current state, or None if unknown/stale."""
+    if not slug:
+        return None
+    state = _state.get(slug)
+    if state is None:
+        return None
+    if state["closed"]:
+        if state["winner"]:
+            return f"⛔ 마감된 종목입니다 (결과: {state['winner']})"
+        return "⛔ 마감된 종목입니다"
+    if time.time() - state["updated_at"] > 3 * MARKET_STATE_REFRESH_SECONDS:
+        return None
+    quote = state["outcomes"].get(outcome)
+    if not quote or (quote["price"] is None and quote["bid"] is None and quote["ask"] is None):
+        return None
+    return (
+        f"📈 현재 시세: {outcome} {_format_quote(quote['price'])} "
+        f"(매수호가 {_format_quote(quote['bid'])} / 매도호가 {_format_quote(quote['ask'])})"
+    )
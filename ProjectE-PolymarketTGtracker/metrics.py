@@ -0,0 +1,184 @@
+"""Process-local latency histograms and counters for the tracker.
+
+Stages are timed with `timer("get_logs")` or `observe("get_logs", seconds)`
+and land in one histogram per stage. End-to-end alert latency (block
+timestamp to Telegram 200) pairs the outbox thread's delivery time with
+the block timestamp the tracker attaches after commit, in either order. Everything is exported as Prometheus
+text on 127.0.0.1:PROJECTE_METRICS_PORT when set, and `summary()` gives a
+compact dict the tracker stores in the state table.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional
+
+PREFIX = "projecte"
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ALERT_BUCKETS = (1.0, 2.0, 5.0, 10.0, 15.0, 20.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+# Outbox rows whose delivery latency is still pending; bounded in case rows are dropped.
+MAX_PENDING_ORIGINS = 10000
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+_lock = threading.Lock()
+_stages: dict[str, Histogram] = {}
+_alert_latency = Histogram(ALERT_BUCKETS)
+_counters: dict[str, int] = {}
+_origins: dict[int, float] = {}
+# Rows the outbox delivered before their origin was known; the tracker
+# resolves block timestamps after commit and may lose that race.
+_delivered_at: dict[int, float] = {}
+
+
+def observe(stage: str, seconds: float) -> None:
+    with _lock:
+        hist = _stages.get(stage)
+        if hist is None:
+            hist = _stages[stage] = Histogram(STAGE_BUCKETS)
+        hist.observe(seconds)
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def inc(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def track_delivery(outbox_id: int, origin_ts: float) -> None:
+    """Remember when the event behind an outbox row happened on-chain."""
+    with _lock:
+        delivered_at = _delivered_at.pop(outbox_id, None)
+        if delivered_at is not None:
+            _alert_latency.observe(max(delivered_at - origin_ts, 0.0))
+            return
+        if len(_origins) >= MAX_PENDING_ORIGINS:
+            _origins.pop(next(iter(_origins)))
+        _origins[outbox_id] = origin_ts
+
+
+def forget_delivery(outbox_id: int) -> None:
+    with _lock:
+        _origins.pop(outbox_id, None)
+        _delivered_at.pop(outbox_id, None)
+
+
+def delivered(outbox_id: int) -> None:
+    with _lock:
+        origin = _origins.pop(outbox_id, None)
+        if origin is not None:
+            _alert_latency.observe(max(time.time() - origin, 0.0))
+            return
+        if len(_delivered_at) >= MAX_PENDING_ORIGINS:
+            _delivered_at.pop(next(iter(_delivered_at)))
+        _delivered_at[outbox_id] = time.time()
+
+
+def summary() -> dict:
+    def row(hist: Histogram) -> dict:
+        return {
+            "n": hist.count,
+            "avg_ms": int(hist.sum / hist.count * 1000) if hist.count else 0,
+            "p50_ms": _ms(hist.quantile(0.5)),
+            "p95_ms": _ms(hist.quantile(0.95)),
+        }
+
+    with _lock:
+        out = {name: row(hist) for name, hist in sorted(_stages.items())}
+        out["alert_latency"] = row(_alert_latency)
+        out["counters"] = dict(sorted(_counters.items()))
+    return out
+
+
+def _ms(value: Optional[float]) -> Optional[int]:
+    if value is None or value == float("inf"):
+        return None
+    return int(value * 1000)
+
+
+def render() -> str:
+    lines: list[str] = []
+
+    def histogram(name: str, hist: Histogram, labels: str = "") -> None:
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, n in zip(hist.buckets, hist.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {hist.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {hist.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {hist.count}")
+
+    with _lock:
+        lines.append(f"# HELP {PREFIX}_stage_seconds Time spent per tracker stage.")
+        lines.append(f"# TYPE {PREFIX}_stage_seconds histogram")
+        for stage, hist in sorted(_stages.items()):
+            histogram(f"{PREFIX}_stage_seconds", hist, f'stage="{stage}"')
+        lines.append(f"# HELP {PREFIX}_alert_latency_seconds Block timestamp to Telegram delivery.")
+        lines.append(f"# TYPE {PREFIX}_alert_latency_seconds histogram")
+        histogram(f"{PREFIX}_alert_latency_seconds", _alert_latency)
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start_server(port: int) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics on localhost; port 0 disables the endpoint."""
+    if port <= 0:
+        return None
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info("metrics_server port=%s", port)
+    return server
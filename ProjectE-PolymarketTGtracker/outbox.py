@@ -0,0 +1,149 @@
+"""Background Telegram delivery from the SQLite outbox.
+
+The tracker enqueues sendMessage payloads in the same transaction as the
+alert state, so a crash never loses or duplicates an alert decision. This
+thread drains the outbox over one keep-alive session, in order per chat,
+and paces itself to Telegram's limits: a minimum interval per chat, a
+global messages-per-second cap, and the retry_after of any 429 reply.
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+import requests
+
+import metrics
+from db import count_outbox, defer_outbox, delete_outbox, list_outbox_due, next_outbox_attempt_at
+
+DRAIN_BATCH = 200
+BACKOFF_MAX_SECONDS = 300
+
+
+class OutboxSender:
+    def __init__(
+        self,
+        api_base: str,
+        chat_interval: float,
+        global_per_second: float,
+        max_attempts: int,
+    ) -> None:
+        self._api_base = api_base
+        self._chat_interval = chat_interval
+        self._global_interval = 1.0 / global_per_second if global_per_second > 0 else 0.0
+        self._max_attempts = max_attempts
+        self._session = requests.Session()
+        self._wake = threading.Event()
+        self._chat_ready_at: dict[str, float] = {}
+        self._global_ready_at = 0.0
+        self.sent = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+
+    def start(self) -> "OutboxSender":
+        self._thread.start()
+        return self
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        logging.info("outbox_start pending=%s", count_outbox())
+        while True:
+            try:
+                timeout = self._drain()
+            except Exception:
+                logging.exception("outbox_error")
+                timeout = 5.0
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def _drain(self) -> float:
+        """Send every due message whose chat is not paused; return the wait until the next one."""
+        rows = list_outbox_due(time.time(), DRAIN_BATCH)
+        for outbox_id, chat_id, payload, attempts in rows:
+            # Once a chat is paused its later rows wait too, keeping per-chat order.
+            if self._chat_ready_at.get(chat_id, 0.0) > time.monotonic():
+                continue
+            self._pace(chat_id)
+            self._send(outbox_id, chat_id, payload, attempts)
+        if len(rows) == DRAIN_BATCH:
+            return 0.0
+        next_at = next_outbox_attempt_at()
+        if next_at is None:
+            return 60.0
+        delay = next_at - time.time()
+        if delay <= 0:
+            # Due rows are waiting on a paused chat.
+            now = time.monotonic()
+            delay = min((at - now for at in self._chat_ready_at.values() if at > now), default=0.05)
+        return max(delay, 0.05)
+
+    def _pace(self, chat_id: str) -> None:
+        now = time.monotonic()
+        wait_until = max(self._global_ready_at, self._chat_ready_at.get(chat_id, 0.0))
+        if wait_until > now:
+            time.sleep(wait_until - now)
+            now = wait_until
+        self._global_ready_at = now + self._global_interval
+        self._chat_ready_at[chat_id] = now + self._chat_interval
+
+    def _send(self, outbox_id: int, chat_id: str, payload: dict, attempts: int) -> None:
+        try:
+            with metrics.timer("telegram_send"):
+                resp = self._session.post(f"{self._api_base}/sendMessage", json=payload, timeout=15)
+        except requests.RequestException as exc:
+            self._retry(outbox_id, chat_id, attempts, f"network: {exc}")
+            return
+
+        if resp.status_code == 200:
+            delete_outbox(outbox_id)
+            self.sent += 1
+            metrics.delivered(outbox_id)
+            return
+
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {}
+        description = str(body.get("description") or resp.text[:200])
+        if resp.status_code == 429:
+            retry_after = float((body.get("parameters") or {}).get("retry_after") or 5)
+            self._chat_ready_at[chat_id] = time.monotonic() + retry_after
+            defer_outbox(outbox_id, time.time() + retry_after, description, count_attempt=False)
+            logging.warning("outbox_rate_limited chat=%s retry_after=%s", chat_id, retry_after)
+        elif resp.status_code >= 500:
+            self._retry(outbox_id, chat_id, attempts, f"http {resp.status_code}: {description}")
+        else:
+            # 4xx other than 429 will not succeed on retry (bad markup, chat gone).
+            delete_outbox(outbox_id)
+            self.dropped += 1
+            metrics.forget_delivery(outbox_id)
+            logging.error("outbox_dropped id=%s chat=%s status=%s error=%s", outbox_id, chat_id, resp.status_code, description)
+
+    def _retry(self, outbox_id: int, chat_id: str, attempts: int, error: str) -> None:
+        if attempts + 1 >= self._max_attempts:
+            delete_outbox(outbox_id)
+            self.dropped += 1
+            metrics.forget_delivery(outbox_id)
+            logging.error("outbox_dropped id=%s chat=%s attempts=%s error=%s", outbox_id, chat_id, attempts + 1, error)
+            return
+        backoff = min(2 ** attempts, BACKOFF_MAX_SECONDS)
+        self._chat_ready_at[chat_id] = time.monotonic() + backoff
+        defer_outbox(outbox_id, time.time() + backoff, error)
+        logging.warning("outbox_retry id=%s chat=%s in=%ss error=%s", outbox_id, chat_id, backoff, error)
+
+
+_sender: Optional[OutboxSender] = None
+
+
+def start_sender(api_base: str, chat_interval: float, global_per_second: float, max_attempts: int) -> OutboxSender:
+    global _sender
+    if _sender is None:
+        _sender = OutboxSender(api_base, chat_interval, global_per_second, max_attempts).start()
+    return _sender
+
+
+def wake() -> None:
+    if _sender is not None:
+        _sender.wake()
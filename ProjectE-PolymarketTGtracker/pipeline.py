@@ -0,0 +1,315 @@
+"""asyncio version of the tracker poll loop with overlapping stages.
+
+    fetch -> decode -> enrich -> decide -> (outbox thread sends)
+
+Each stage is a task connected to the next by a bounded queue, so fetching
+window N+1 overlaps with enriching and deciding window N. Blocking work
+(RPC, Gamma, SQLite) runs in threads; every DB write happens on one
+dedicated thread so the thread-local connection, the sent-key cache and
+the streak engine keep a single writer. Windows reach the decide stage in
+block order and each one commits its alerts together with last_block, so
+the cursor only moves past a window once its decisions are durable. Any
+stage error restarts the pipeline from the committed cursor. Streamed logs
+stay buffered in LogStream until the decide stage has committed their
+window, so windows that were in flight at the restart are read again.
+
+Backpressure: full queues stop the stages upstream, and the fetcher also
+waits while the outbox holds more than PROJECTE_OUTBOX_HIGH_WATER unsent
+messages.
+
+Enable with PROJECTE_PIPELINE=1; tracker.py then runs this instead of poll().
+"""
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional
+
+from web3 import Web3
+
+import maintenance
+import metrics
+from backfill import Backfill
+from block_range import RangeController
+from config import (
+    BACKFILL_WORKERS,
+    BLOCK_RANGE_MAX,
+    BLOCK_RANGE_MIN,
+    BLOCK_RANGE_SLOW_MS,
+    CONFIRMATIONS,
+    CTF_EXCHANGE,
+    FILL_SOURCE,
+    MAX_BLOCK_RANGE,
+    MAX_LAG_BLOCKS,
+    OUTBOX_HIGH_WATER,
+    PIPELINE_QUEUE_SIZE,
+    POLL_SECONDS,
+    RPC_URL,
+    WS_URL,
+)
+from db import (
+    add_gap,
+    count_outbox,
+    fail_gap,
+    get_state,
+    list_gaps,
+    set_state,
+    split_gap,
+    transaction,
+)
+from log_fetch import fetch_topic_logs, get_logs_calls
+from log_stream import LogStream
+from market_cache import flush_cache, prefetch_markets
+from orderfilled import EVENT_SIG, Fill, decode_batch
+from rpc_pool import PoolProvider, RpcPool, parse_urls
+import tracker
+
+
+class Window(NamedTuple):
+    from_block: int
+    to_block: int
+    wallets: dict
+    logs: list
+    fills: list[Fill]
+    # A lag jump: record from_block..to_block as a gap instead of processing it.
+    skip: bool = False
+
+
+class Pipeline:
+    def __init__(self) -> None:
+        self.rpc = RpcPool(parse_urls(RPC_URL), timeout=20)
+        self.w3 = Web3(PoolProvider(self.rpc))
+        self.topic0 = self.w3.keccak(text=EVENT_SIG).hex()
+        self.exchanges = [
+            Web3.to_checksum_address(addr.strip())
+            for addr in CTF_EXCHANGE.split(",")
+            if addr.strip()
+        ]
+        self.stream: Optional[LogStream] = None
+        if WS_URL:
+            self.stream = LogStream(WS_URL, self.exchanges, [self.topic0]).start()
+            logging.info("log_stream_enabled url=%s", WS_URL)
+        self.block_time = tracker.block_time_lookup(self.w3, self.stream)
+        self.ranges = RangeController(MAX_BLOCK_RANGE, BLOCK_RANGE_MIN, BLOCK_RANGE_MAX, slow_ms=BLOCK_RANGE_SLOW_MS)
+        # Single writer thread for everything that touches tracker.db state.
+        self.db = ThreadPoolExecutor(1, thread_name_prefix="tracker-db")
+        self.backfill = Backfill(
+            self._fetch_gap,
+            list_gaps,
+            split_gap,
+            fail_gap,
+            workers=BACKFILL_WORKERS,
+            ranges=RangeController(MAX_BLOCK_RANGE, BLOCK_RANGE_MIN, BLOCK_RANGE_MAX, slow_ms=BLOCK_RANGE_SLOW_MS),
+            idle_seconds=POLL_SECONDS,
+            fetch_calls=lambda: get_logs_calls(tracker.wallet_registry.refresh().topic_chunks),
+        ).start()
+        self.last_cleanup_at = 0
+        self.last_stats_at = 0
+
+    async def _on_db(self, fn: Callable, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.db, lambda: fn(*args, **kwargs))
+
+    def _fetch_gap(self, from_block: int, to_block: int) -> list:
+        registry = tracker.wallet_registry.refresh()
+        if not registry.by_address:
+            return []
+        return fetch_topic_logs(self.w3, self.exchanges, self.topic0, registry.topic_chunks, from_block, to_block)
+
+    def _handle_gap(self, gap_id: int, from_block: int, to_block: int, logs: list) -> None:
+        wallets = tracker.wallet_registry.refresh().by_address
+        logging.info("backfill blocks=%s->%s logs=%s gap=%s", from_block, to_block, len(logs), gap_id)
+        tracker.process_logs(logs, wallets, to_block, gap_id=gap_id, block_time=self.block_time)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self._run_once()
+            except Exception:
+                logging.exception("pipeline_error")
+                await asyncio.sleep(2)
+
+    async def _run_once(self) -> None:
+        last_block = int(await self._on_db(get_state, "last_block") or "0")
+        fetched: "asyncio.Queue[Window]" = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        decoded: "asyncio.Queue[Window]" = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        enriched: "asyncio.Queue[Window]" = asyncio.Queue(PIPELINE_QUEUE_SIZE)
+        # The first failing stage cancels the others; the caller restarts
+        # from whatever last_block was committed.
+        async with asyncio.TaskGroup() as group:
+            group.create_task(self._fetcher(last_block, fetched))
+            group.create_task(self._decoder(fetched, decoded))
+            group.create_task(self._enricher(decoded, enriched))
+            group.create_task(self._decider(enriched))
+
+    async def _idle(self) -> None:
+        # In stream mode wake up as soon as a new head arrives.
+        if self.stream:
+            await asyncio.to_thread(self.stream.wait_for_head, POLL_SECONDS)
+        else:
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def _latest_block(self) -> int:
+        latest = self.stream.head() if self.stream else None
+        if latest:
+            return latest
+        started = time.perf_counter()
+        latest = await asyncio.to_thread(lambda: self.w3.eth.block_number)
+        metrics.observe("block_number", time.perf_counter() - started)
+        return latest
+
+    async def _fetcher(self, last_block: int, out: "asyncio.Queue[Window]") -> None:
+        while True:
+            while await asyncio.to_thread(count_outbox) >= OUTBOX_HIGH_WATER:
+                metrics.inc("outbox_backpressure")
+                await asyncio.sleep(1)
+
+            target = max(await self._latest_block() - CONFIRMATIONS, 0)
+            if last_block == 0:
+                last_block = max(target - MAX_BLOCK_RANGE, 0)
+            if target <= last_block:
+                await self._idle()
+                continue
+
+            lag_blocks = target - last_block
+            if lag_blocks > MAX_LAG_BLOCKS:
+                logging.warning("lag too large; jump to latest and backfill target=%s lag_blocks=%s", target, lag_blocks)
+                await out.put(Window(last_block + 1, target, {}, [], [], skip=True))
+                last_block = target
+                await self._idle()
+                continue
+
+            registry = await asyncio.to_thread(tracker.wallet_registry.refresh)
+            wallets = registry.by_address
+            from_block = last_block + 1
+            to_block = min(target, last_block + self.ranges.range)
+            logs: Optional[list] = []
+            source = "none"
+            if wallets:
+                logs = self.stream.take(from_block, to_block) if self.stream else None
+                source = "stream"
+                if logs is None:
+                    source = "get_logs"
+                    started = time.monotonic()
+                    try:
+                        logs = await asyncio.to_thread(
+                            fetch_topic_logs,
+                            self.w3,
+                            self.exchanges,
+                            self.topic0,
+                            registry.topic_chunks,
+                            from_block,
+                            to_block,
+                        )
+                    except Exception as exc:
+                        if self.ranges.failed(exc):
+                            logging.warning(
+                                "get_logs limit; range=%s blocks=%s->%s retry_in=%.1fs error=%s",
+                                self.ranges.range,
+                                from_block,
+                                to_block,
+                                self.ranges.backoff,
+                                exc,
+                            )
+                            await asyncio.sleep(self.ranges.backoff)
+                            continue
+                        raise
+                    metrics.observe("get_logs", time.monotonic() - started)
+                    self.ranges.observe(
+                        to_block - from_block + 1,
+                        len(logs),
+                        int((time.monotonic() - started) * 1000),
+                        calls=get_logs_calls(registry.topic_chunks),
+                    )
+            logging.info(
+                "poll blocks=%s->%s target=%s source=%s range=%s queued=%s",
+                from_block,
+                to_block,
+                target,
+                source,
+                self.ranges.range,
+                out.qsize(),
+            )
+            await out.put(Window(from_block, to_block, wallets, logs, []))
+            last_block = to_block
+            if to_block >= target:
+                await self._idle()
+
+    async def _decoder(self, inbox: "asyncio.Queue[Window]", out: "asyncio.Queue[Window]") -> None:
+        while True:
+            window = await inbox.get()
+            if window.logs:
+                started = time.perf_counter()
+                batch = await asyncio.to_thread(decode_batch, window.logs)
+                metrics.observe("decode", time.perf_counter() - started)
+                if batch.skipped:
+                    logging.warning("log_parse_skipped count=%s", batch.skipped)
+                window = window._replace(fills=list(batch.rows()))
+            await out.put(window)
+
+    async def _enricher(self, inbox: "asyncio.Queue[Window]", out: "asyncio.Queue[Window]") -> None:
+        while True:
+            window = await inbox.get()
+            matched = [f for f in window.fills if f.maker in window.wallets or f.taker in window.wallets]
+            if matched:
+                # Resolve markets ahead of the decide stage; block timestamps
+                # are looked up by process_fills after it commits.
+                await asyncio.to_thread(
+                    prefetch_markets,
+                    (str(a) for f in matched for a in (f.maker_asset_id, f.taker_asset_id) if a != 0),
+                )
+            await out.put(window)
+
+    async def _decider(self, inbox: "asyncio.Queue[Window]") -> None:
+        while True:
+            window = await inbox.get()
+            if window.skip:
+                await self._on_db(self._skip, window.from_block, window.to_block)
+            else:
+                if window.logs:
+                    logging.info("logs count=%s blocks=%s->%s", len(window.logs), window.from_block, window.to_block)
+                await self._on_db(
+                    tracker.process_fills,
+                    window.fills,
+                    window.wallets,
+                    window.to_block,
+                    log_count=len(window.logs),
+                    block_time=self.block_time,
+                )
+            if self.stream:
+                # last_block now covers the window; its buffered logs are no
+                # longer needed for a restart.
+                self.stream.discard(window.to_block)
+            await self._on_db(self._housekeeping)
+
+    def _skip(self, from_block: int, to_block: int) -> None:
+        # Hand the skipped blocks to the backfill worker instead of dropping them.
+        with transaction():
+            add_gap(from_block, to_block)
+            set_state("last_block", str(to_block))
+        self.backfill.wake()
+
+    def _housekeeping(self) -> None:
+        """Between windows on the DB thread: backfilled ranges, cache flush, stats."""
+        self.last_cleanup_at = maintenance.maybe_run(self.last_cleanup_at)
+        self.backfill.drain(self._handle_gap, BACKFILL_WORKERS)
+        flush_cache()
+        now = int(time.time())
+        if now - self.last_stats_at >= tracker.RANGE_STATS_INTERVAL_SECONDS:
+            self.last_stats_at = now
+            stats = {**self.ranges.stats(), **tracker.streak_engine.stats(), **tracker.wallet_registry.stats()}
+            pool = self.rpc.stats()
+            set_state("get_logs_stats", json.dumps({**stats, **pool}, separators=(",", ":")))
+            logging.info("get_logs_stats %s", " ".join(f"{k}={v}" for k, v in stats.items()))
+            for endpoint in pool["rpc_endpoints"]:
+                logging.info("rpc_endpoint %s", " ".join(f"{k}={v}" for k, v in endpoint.items()))
+            tracker.write_metrics_summary()
+
+
+def run() -> None:
+    tracker.startup()
+    if FILL_SOURCE == "log":
+        # ingest.py already decouples fetching; nothing to overlap here.
+        tracker.poll_fill_log()
+        return
+    asyncio.run(Pipeline().run())
@@ -0,0 +1,59 @@
+"""In-memory index of active tracked positions for exit detection.
+
+The tracker used to query tracked_positions once per alert. The index
+holds every active position keyed by (address, market_slug) and reloads
+only when state.tracked_positions_version changes. Every write helper in
+db.py bumps that version, including the bot's add_tracked_position in its
+own process, so a reload costs one state read per window.
+"""
+from typing import Optional
+
+from db import (
+    TRACKED_POSITIONS_VERSION_KEY,
+    get_state,
+    list_active_tracked_positions,
+    on_rollback,
+)
+
+# (chat_id, outcome, side, market_title, started_at)
+Position = tuple[str, str, str, str, int]
+
+
+class TrackedPositionIndex:
+    def __init__(self) -> None:
+        # Positions per key, oldest first; the last one is what
+        # get_active_tracked_position's ORDER BY started_at DESC returned.
+        self._by_key: dict[tuple[str, str], list[Position]] = {}
+        self._version: Optional[str] = None
+
+    def refresh(self) -> bool:
+        """Reload if another writer changed tracked_positions; True when reloaded."""
+        version = get_state(TRACKED_POSITIONS_VERSION_KEY) or "0"
+        if version == self._version:
+            return False
+        by_key: dict[tuple[str, str], list[Position]] = {}
+        for address, slug, chat_id, outcome, side, title, started_at in list_active_tracked_positions():
+            by_key.setdefault((address, slug), []).append((chat_id, outcome, side, title, int(started_at)))
+        self._by_key = by_key
+        self._version = version
+        return True
+
+    def get(self, address: str, market_slug: str) -> Optional[Position]:
+        positions = self._by_key.get((address, market_slug))
+        return positions[-1] if positions else None
+
+    def exited(self, address: str, market_slug: str, position: Position) -> None:
+        """Drop a position marked exited in the current transaction."""
+        positions = self._by_key.get((address, market_slug))
+        if positions and position in positions:
+            positions.remove(position)
+            if not positions:
+                del self._by_key[(address, market_slug)]
+        # On rollback the row is still active; reload from SQLite.
+        on_rollback(self.invalidate)
+
+    def invalidate(self) -> None:
+        self._version = None
+
+    def __len__(self) -> int:
+        return sum(len(positions) for positions in self._by_key.values())
@@ -0,0 +1,217 @@
+"""Record OrderFilled fills to an archive and replay them through the tracker.
+
+    python3 replay.py record --from-block N --to-block M --out fills.pefa [--all]
+    python3 replay.py synth --fills 200000 --out synth.pefa
+    python3 replay.py run fills.pefa [--window 20] [--expect-digest HEX]
+
+record fetches a block range over PROJECTE_RPC_URL (watched wallets only
+unless --all) and stores the fills with the wallets and token -> market map
+they were matched against. run replays an archive through process_fills
+(detect_side, candidate aggregation, streaks, dedup) on a throwaway DB with
+Telegram and Gamma stubbed, and prints fills/sec, alert count and a digest
+of the alert texts that changes whenever alert decisions do.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from orderfilled import Fill, FillBatch
+import fill_archive
+
+
+def record(args: argparse.Namespace) -> None:
+    from web3 import Web3
+
+    from block_range import RangeController
+    from config import CTF_EXCHANGE, RPC_URL
+    from db import init_db, list_wallets
+    from log_fetch import fetch_wallet_logs
+    from market_cache import get_market_for_token_fast, prefetch_markets
+    from orderfilled import EVENT_SIG, decode_batch
+    from rpc_pool import PoolProvider, RpcPool, parse_urls
+
+    if not RPC_URL:
+        raise SystemExit("PROJECTE_RPC_URL is not set")
+    init_db()
+    rpc = RpcPool(parse_urls(RPC_URL), timeout=20)
+    w3 = Web3(PoolProvider(rpc))
+    topic0 = w3.keccak(text=EVENT_SIG).hex()
+    exchanges = [Web3.to_checksum_address(a.strip()) for a in CTF_EXCHANGE.split(",") if a.strip()]
+    wallets = {row[0].lower(): [row[1], row[2]] for row in list_wallets()}
+    if not wallets and not args.all:
+        raise SystemExit("no wallets registered; add some or pass --all")
+
+    batch = FillBatch()
+    ranges = RangeController(args.range, 10, 2000)
+    from_block = args.from_block
+    while from_block <= args.to_block:
+        to_block = min(args.to_block, from_block + ranges.range - 1)
+        started = time.monotonic()
+        try:
+            if args.all:
+                logs = w3.eth.get_logs(
+                    {"fromBlock": from_block, "toBlock": to_block, "address": exchanges, "topics": [topic0]}
+                )
+            else:
+                logs = fetch_wallet_logs(w3, exchanges, topic0, list(wallets), from_block, to_block)
+        except Exception as exc:
+            if ranges.failed(exc):
+                time.sleep(ranges.backoff)
+                continue
+            raise
+        ranges.observe(to_block - from_block + 1, len(logs), int((time.monotonic() - started) * 1000))
+        for fill in decode_batch(logs).rows():
+            batch.append(fill)
+        print(f"blocks={from_block}->{to_block} logs={len(logs)} total={len(batch)}", file=sys.stderr)
+        from_block = to_block + 1
+
+    tokens = sorted({str(t) for t in batch.maker_asset_id + batch.taker_asset_id if t != 0})
+    prefetch_markets(tokens)
+    markets = {token: get_market_for_token_fast(token) for token in tokens}
+    meta = {
+        "from_block": args.from_block,
+        "to_block": args.to_block,
+        "wallets": wallets,
+        "markets": {token: market for token, market in markets.items() if market},
+    }
+    size = fill_archive.save(args.out, batch, meta)
+    print(f"recorded fills={len(batch)} tokens={len(tokens)} bytes={size} out={args.out}")
+
+
+def synth(args: argparse.Namespace) -> None:
+    """Random but deterministic fills: watched wallets buying and selling on a few markets."""
+    rng = random.Random(args.seed)
+    wallets = {f"0x{rng.getrandbits(160):040x}": [f"w{i}", None] for i in range(args.wallets)}
+    watched = list(wallets)
+    markets = {}
+    market_tokens = []
+    for i in range(args.markets):
+        pair = []
+        for outcome in ("Yes", "No"):
+            token = rng.getrandbits(255)
+            markets[str(token)] = {"question": f"Market {i}?", "outcome": outcome, "slug": f"market-{i}"}
+            pair.append(token)
+        market_tokens.append(pair)
+
+    batch = FillBatch()
+    block = 60_000_000
+    for n in range(args.fills):
+        if n % args.per_block == 0:
+            block += 1
+        token = rng.choice(rng.choice(market_tokens))
+        shares = rng.randint(1, 5000) * 1_000_000
+        usdc = shares * rng.randint(1, 99) // 100
+        wallet = rng.choice(watched) if rng.random() < args.watched_share else f"0x{rng.getrandbits(160):040x}"
+        counterparty = f"0x{rng.getrandbits(160):040x}"
+        buy = rng.random() < 0.8
+        maker, taker = (wallet, counterparty) if rng.random() < 0.5 else (counterparty, wallet)
+        # The side paying USDC (asset 0) is the buyer.
+        maker_pays = buy == (maker == wallet)
+        batch.append(
+            Fill(
+                block,
+                n % args.per_block,
+                f"0x{rng.getrandbits(256):064x}",
+                maker,
+                taker,
+                0 if maker_pays else token,
+                token if maker_pays else 0,
+                usdc if maker_pays else shares,
+                shares if maker_pays else usdc,
+                0,
+            )
+        )
+    meta = {"from_block": 60_000_001, "to_block": block, "wallets": wallets, "markets": markets, "seed": args.seed}
+    size = fill_archive.save(args.out, batch, meta)
+    print(f"synthesized fills={len(batch)} wallets={len(wallets)} bytes={size} out={args.out}")
+
+
+def run(args: argparse.Namespace) -> None:
+    load_started = time.perf_counter()
+    batch, meta = fill_archive.load(args.archive)
+    load_s = time.perf_counter() - load_started
+
+    # Point the tracker at a throwaway DB before config is imported.
+    os.environ["PROJECTE_DB_PATH"] = args.db or os.path.join(tempfile.mkdtemp(), "replay.db")
+    import tracker
+    from db import init_db, upsert_wallet
+
+    logging.basicConfig(level=logging.WARNING)
+    init_db()
+    for address, (alias, note) in meta.get("wallets", {}).items():
+        upsert_wallet(address, alias, note)
+    wallets = {address: (address, alias, note) for address, (alias, note) in meta.get("wallets", {}).items()}
+
+    markets = meta.get("markets", {})
+    tracker.get_market_for_token_fast = markets.get
+    tracker.prefetch_markets = lambda token_ids: 0
+    tracker.prefetch_states = lambda slugs: 0
+    sent: list[str] = []
+    tracker.send_message = lambda text, **kwargs: sent.append(text)
+
+    fills = list(batch.rows())
+    windows = []
+    start = 0
+    while start < len(fills):
+        last_block = fills[start].block_number + args.window - 1
+        end = start
+        while end < len(fills) and fills[end].block_number <= last_block:
+            end += 1
+        windows.append((fills[start:end], last_block))
+        start = end
+
+    started = time.perf_counter()
+    for window_fills, to_block in windows:
+        tracker.process_fills(window_fills, wallets, to_block, log_count=len(window_fills))
+    elapsed = time.perf_counter() - started
+
+    digest = hashlib.sha256("\n\x00".join(sent).encode("utf-8")).hexdigest()
+    print(f"archive fills={len(fills)} windows={len(windows)} load={load_s:.2f}s")
+    print(f"replay  {len(fills) / elapsed:10.0f} fills/s  elapsed={elapsed:.2f}s")
+    print(f"alerts={len(sent)} digest={digest}")
+    print(f"streaks {tracker.streak_engine.stats()}")
+    print(f"stages  {tracker.metrics.summary()}")
+    if args.expect_digest and args.expect_digest != digest:
+        raise SystemExit(f"alert digest changed: expected {args.expect_digest}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record")
+    p.add_argument("--from-block", type=int, required=True)
+    p.add_argument("--to-block", type=int, required=True)
+    p.add_argument("--out", required=True)
+    p.add_argument("--range", type=int, default=500)
+    p.add_argument("--all", action="store_true", help="every fill, not only watched wallets")
+    p.set_defaults(func=record)
+
+    p = sub.add_parser("synth")
+    p.add_argument("--fills", type=int, default=200000)
+    p.add_argument("--wallets", type=int, default=50)
+    p.add_argument("--markets", type=int, default=40)
+    p.add_argument("--per-block", type=int, default=40)
+    p.add_argument("--watched-share", type=float, default=0.3)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", required=True)
+    p.set_defaults(func=synth)
+
+    p = sub.add_parser("run")
+    p.add_argument("archive")
+    p.add_argument("--window", type=int, default=20, help="blocks per process_fills call")
+    p.add_argument("--db", help="tracker DB path (default: a new temp file)")
+    p.add_argument("--expect-digest")
+    p.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
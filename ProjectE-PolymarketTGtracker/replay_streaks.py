@@ -0,0 +1,94 @@
+"""Replay random fills through db.update_directional_streak and StreakEngine.
+
+Runs the same sequence of (address, market, outcome, side) updates through
+the per-call SQLite path and the in-memory engine, in windows the way the
+tracker commits them (some windows roll back), and checks that both return
+the same (streak_count, is_milestone) and leave the same table behind.
+
+    python3 replay_streaks.py [--fills 20000] [--window 50] [--max-entries 64]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("PROJECTE_DB_PATH", os.path.join(tempfile.mkdtemp(), "replay_streaks.db"))
+
+import db  # noqa: E402
+from streaks import StreakEngine  # noqa: E402
+
+
+class Abort(Exception):
+    pass
+
+
+def make_fills(count: int, seed: int) -> list[tuple[str, str, str, str]]:
+    rng = random.Random(seed)
+    wallets = [f"0x{rng.getrandbits(160):040x}" for _ in range(20)]
+    markets = [f"market-{i}" for i in range(15)]
+    fills = []
+    for _ in range(count):
+        # Mostly repeat buys so streaks reach the 5/10/20 milestones.
+        side = "매수" if rng.random() < 0.85 else "매도"
+        fills.append((rng.choice(wallets), rng.choice(markets), rng.choice(["Yes", "No"]), side))
+    return fills
+
+
+def replay(fills, window: int, update, flush, rollback_every: int) -> tuple[list, float]:
+    results = []
+    started = time.perf_counter()
+    for n, start in enumerate(range(0, len(fills), window)):
+        chunk = fills[start : start + window]
+        try:
+            with db.transaction():
+                out = [update(*fill) for fill in chunk]
+                flush()
+                if rollback_every and n % rollback_every == rollback_every - 1:
+                    raise Abort()
+        except Abort:
+            continue
+        results.extend(out)
+    return results, time.perf_counter() - started
+
+
+def snapshot() -> list[tuple]:
+    return db.get_conn().execute(
+        "SELECT address, market_key, outcome, side, streak_count, last_milestone_alert "
+        "FROM directional_streaks ORDER BY address, market_key, outcome"
+    ).fetchall()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fills", type=int, default=20000)
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--max-entries", type=int, default=64)
+    parser.add_argument("--rollback-every", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    db.init_db()
+    fills = make_fills(args.fills, args.seed)
+
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM directional_streaks")
+    old, old_s = replay(fills, args.window, db.update_directional_streak, lambda: None, args.rollback_every)
+    old_rows = snapshot()
+
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM directional_streaks")
+    engine = StreakEngine(args.max_entries)
+    new, new_s = replay(fills, args.window, engine.update_directional_streak, engine.flush, args.rollback_every)
+    new_rows = snapshot()
+
+    assert old == new, "update results differ"
+    assert old_rows == new_rows, "directional_streaks rows differ"
+    milestones = sum(1 for _, is_milestone in new if is_milestone)
+    print(f"fills={len(new)} milestones={milestones} rows={len(new_rows)} identical=yes")
+    print(f"sqlite   {len(old) / old_s:10.0f} fills/s")
+    print(f"engine   {len(new) / new_s:10.0f} fills/s  {engine.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""Local Polygon JSON-RPC stand-in for exercising the tracker without a node.
+
+Serves eth_blockNumber / eth_getLogs / eth_getBlockByNumber over HTTP POST
+and eth_subscribe("newHeads" | "logs") over a WebSocket upgrade on the same
+port. Blocks are minted every --block-time seconds with synthetic
+OrderFilled logs; --wallet addresses show up as maker or taker in a share
+of them, and --reorg-every re-mints the newest block (sending removed=true
+notifications) to exercise the confirmation buffer. --max-range rejects
+wider get_logs calls the way public RPCs do.
+
+    python3 rpc_standin.py --port 8545 --wallet 0xabc... &
+    PROJECTE_RPC_URL=http://127.0.0.1:8545 \\
+    PROJECTE_WS_URL=ws://127.0.0.1:8545 python3 tracker.py
+"""
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from web3 import Web3
+
+from orderfilled import EVENT_SIG
+
+TOPIC0 = Web3.keccak(text=EVENT_SIG).hex()
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _word(value: int) -> str:
+    return f"{value:064x}"
+
+
+def _addr_topic(address: str) -> str:
+    return "0x" + address.lower().replace("0x", "").rjust(64, "0")
+
+
+def _matches(value: str, wanted) -> bool:
+    if wanted is None:
+        return True
+    if isinstance(wanted, list):
+        return any(value.lower() == w.lower() for w in wanted)
+    return value.lower() == str(wanted).lower()
+
+
+class Chain:
+    def __init__(
+        self,
+        start_block: int,
+        block_time: float,
+        exchange: str,
+        wallets: list[str],
+        fills_per_block: int,
+        wallet_share: float,
+        reorg_every: int,
+        seed: int,
+        max_range: int = 0,
+    ) -> None:
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.head = start_block
+        self.block_time = block_time
+        self.genesis_ts = int(time.time()) - int(start_block * block_time)
+        self.exchange = exchange
+        self.wallets = [w.lower() for w in wallets]
+        self.fills_per_block = fills_per_block
+        self.wallet_share = wallet_share
+        self.reorg_every = reorg_every
+        self.max_range = max_range
+        self.token_ids = [self.rng.getrandbits(252) for _ in range(32)]
+        self.logs: dict[int, list[dict]] = {}
+        self.listeners: list = []
+
+    def _random_address(self) -> str:
+        return "0x" + "".join(self.rng.choice("0123456789abcdef") for _ in range(40))
+
+    def _mint_logs(self, block: int) -> list[dict]:
+        logs = []
+        block_hash = "0x" + _word(self.rng.getrandbits(256))
+        for log_index in range(self.fills_per_block):
+            maker = self._random_address()
+            taker = self._random_address()
+            if self.wallets and self.rng.random() < self.wallet_share:
+                if self.rng.random() < 0.5:
+                    maker = self.rng.choice(self.wallets)
+                else:
+                    taker = self.rng.choice(self.wallets)
+            token_id = self.rng.choice(self.token_ids)
+            usdc = self.rng.randint(1, 5_000) * 1_000_000
+            shares = int(usdc / self.rng.uniform(0.05, 0.95))
+            if self.rng.random() < 0.5:
+                assets = (0, token_id, usdc, shares)
+            else:
+                assets = (token_id, 0, shares, usdc)
+            data = "0x" + "".join(_word(v) for v in (*assets, 0))
+            logs.append(
+                {
+                    "address": self.exchange,
+                    "topics": [TOPIC0, "0x" + _word(self.rng.getrandbits(256)), _addr_topic(maker), _addr_topic(taker)],
+                    "data": data,
+                    "blockNumber": hex(block),
+                    "blockHash": block_hash,
+                    "transactionHash": "0x" + _word(self.rng.getrandbits(256)),
+                    "transactionIndex": hex(log_index),
+                    "logIndex": hex(log_index),
+                    "removed": False,
+                }
+            )
+        return logs
+
+    def advance(self) -> None:
+        with self.lock:
+            events = []
+            if self.reorg_every and self.head % self.reorg_every == 0 and self.head in self.logs:
+                for log in self.logs[self.head]:
+                    events.append(("log", dict(log, removed=True)))
+                self.logs[self.head] = self._mint_logs(self.head)
+                events.extend(("log", log) for log in self.logs[self.head])
+            self.head += 1
+            self.logs[self.head] = self._mint_logs(self.head)
+            events.append(("head", self.block(self.head)))
+            events.extend(("log", log) for log in self.logs[self.head])
+            listeners = list(self.listeners)
+        for listener in listeners:
+            for kind, payload in events:
+                listener(kind, payload)
+
+    def block(self, number: int) -> dict:
+        return {
+            "number": hex(number),
+            "hash": "0x" + _word(number),
+            "timestamp": hex(self.genesis_ts + int(number * self.block_time)),
+        }
+
+    def get_logs(self, flt: dict) -> list[dict]:
+        from_block = int(flt.get("fromBlock", "0x0"), 16)
+        to_block = int(flt.get("toBlock", hex(self.head)), 16)
+        addresses = flt.get("address")
+        topics = flt.get("topics") or []
+        if self.max_range and to_block - from_block + 1 > self.max_range:
+            raise ValueError("Block range is too large")
+        out = []
+        with self.lock:
+            for block in range(from_block, min(to_block, self.head) + 1):
+                for log in self.logs.get(block, []):
+                    if not _matches(log["address"], addresses):
+                        continue
+                    if all(_matches(log["topics"][i], want) for i, want in enumerate(topics) if i < len(log["topics"])):
+                        out.append(log)
+        return out
+
+    def call(self, method: str, params: list):
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        if method == "eth_chainId":
+            return hex(137)
+        if method == "net_version":
+            return "137"
+        if method == "eth_getLogs":
+            return self.get_logs(params[0])
+        if method == "eth_getBlockByNumber":
+            tag = params[0]
+            number = self.head if tag == "latest" else int(tag, 16)
+            return self.block(number)
+        raise ValueError(f"method not supported: {method}")
+
+
+def _ws_send(sock: socket.socket, text: str) -> None:
+    payload = text.encode("utf-8")
+    header = bytearray([0x81])
+    if len(payload) < 126:
+        header.append(len(payload))
+    elif len(payload) < 65536:
+        header.append(126)
+        header += struct.pack(">H", len(payload))
+    else:
+        header.append(127)
+        header += struct.pack(">Q", len(payload))
+    sock.sendall(bytes(header) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = b""
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("socket closed")
+        buf += chunk
+    return buf
+
+
+def _ws_recv(sock: socket.socket) -> Optional[str]:
+    first, second = _recv_exact(sock, 2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", _recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", _recv_exact(sock, 8))[0]
+    mask = _recv_exact(sock, 4) if second & 0x80 else b"\0\0\0\0"
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(_recv_exact(sock, length)))
+    if opcode == 0x8:
+        return None
+    if opcode == 0x9:
+        sock.sendall(bytes([0x8A, len(payload)]) + payload)
+        return ""
+    return payload.decode("utf-8") if opcode == 0x1 else ""
+
+
+class Handler(BaseHTTPRequestHandler):
+    chain: Chain
+
+    def log_message(self, fmt: str, *args) -> None:
+        logging.debug(fmt, *args)
+
+    def _rpc(self, req: dict) -> dict:
+        try:
+            result = self.chain.call(req.get("method"), req.get("params") or [])
+            return {"jsonrpc": "2.0", "id": req.get("id"), "result": result}
+        except Exception as exc:
+            return {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": -32000, "message": str(exc)}}
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))))
+        resp = [self._rpc(r) for r in body] if isinstance(body, list) else self._rpc(body)
+        raw = json.dumps(resp).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self) -> None:
+        if self.headers.get("Upgrade", "").lower() != "websocket":
+            self.send_error(400)
+            return
+        accept = base64.b64encode(
+            hashlib.sha1((self.headers["Sec-WebSocket-Key"] + WS_GUID).encode()).digest()
+        ).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self._serve_ws(self.connection)
+
+    def _serve_ws(self, sock: socket.socket) -> None:
+        send_lock = threading.Lock()
+        subs: dict[str, tuple[str, dict]] = {}
+
+        def send(obj: dict) -> None:
+            with send_lock:
+                _ws_send(sock, json.dumps(obj))
+
+        def wanted(sub_kind: str, flt: dict, kind: str, payload: dict) -> bool:
+            if kind == "head":
+                return sub_kind == "newHeads"
+            if sub_kind != "logs" or not _matches(payload["address"], flt.get("address")):
+                return False
+            topics = flt.get("topics") or []
+            return all(_matches(payload["topics"][i], w) for i, w in enumerate(topics))
+
+        def listener(kind: str, payload: dict) -> None:
+            for sub_id, (sub_kind, flt) in list(subs.items()):
+                if not wanted(sub_kind, flt, kind, payload):
+                    continue
+                try:
+                    send({"jsonrpc": "2.0", "method": "eth_subscription", "params": {"subscription": sub_id, "result": payload}})
+                except OSError:
+                    return
+
+        with self.chain.lock:
+            self.chain.listeners.append(listener)
+        try:
+            while True:
+                text = _ws_recv(sock)
+                if text is None:
+                    break
+                if not text:
+                    continue
+                req = json.loads(text)
+                if req.get("method") == "eth_subscribe":
+                    params = req.get("params") or []
+                    sub_id = "0x" + _word(random.getrandbits(64))[-16:]
+                    subs[sub_id] = (params[0], params[1] if len(params) > 1 else {})
+                    send({"jsonrpc": "2.0", "id": req.get("id"), "result": sub_id})
+                elif req.get("method") == "eth_unsubscribe":
+                    subs.pop((req.get("params") or [""])[0], None)
+                    send({"jsonrpc": "2.0", "id": req.get("id"), "result": True})
+                else:
+                    send(self._rpc(req))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self.chain.lock:
+                self.chain.listeners.remove(listener)
+            self.close_connection = True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--start-block", type=int, default=60_000_000)
+    parser.add_argument("--block-time", type=float, default=2.0)
+    parser.add_argument("--fills-per-block", type=int, default=20)
+    parser.add_argument("--wallet", action="append", default=[])
+    parser.add_argument("--wallet-share", type=float, default=0.05)
+    parser.add_argument("--reorg-every", type=int, default=0)
+    parser.add_argument("--exchange", default="0x4bFb41d5B3570DeFd03C39a9A4D8dE6Bd8B8982E")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-range", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    chain = Chain(
+        start_block=args.start_block,
+        block_time=args.block_time,
+        exchange=args.exchange,
+        wallets=args.wallet,
+        fills_per_block=args.fills_per_block,
+        wallet_share=args.wallet_share,
+        reorg_every=args.reorg_every,
+        seed=args.seed,
+        max_range=args.max_range,
+    )
+    for block in range(args.start_block - 1000, args.start_block + 1):
+        chain.logs[block] = chain._mint_logs(block)
+    Handler.chain = chain
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info("rpc_standin listening on %s:%s head=%s", args.host, args.port, chain.head)
+    while True:
+        time.sleep(args.block_time)
+        chain.advance()
+        logging.info("rpc_standin head=%s", chain.head)
+
+
+if __name__ == "__main__":
+    main()
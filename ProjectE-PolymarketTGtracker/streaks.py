@@ -0,0 +1,103 @@
+"""In-memory directional streaks.
+
+update_directional_streak used to SELECT and UPSERT directional_streaks for
+every alert candidate. StreakEngine keeps the rows in an LRU map, loads a
+row from SQLite only on a miss, and writes changed rows back in one batch
+per flush(). The tracker flushes inside its window transaction, so streak
+state still commits together with the cursor; on rollback the in-memory
+rows are put back the way they were.
+"""
+from collections import OrderedDict
+from typing import Optional
+
+from db import get_directional_streak, on_rollback, upsert_directional_streaks
+
+MILESTONES = frozenset({5, 10, 20})
+
+StreakKey = tuple[str, str, str]
+
+
+class StreakEngine:
+    def __init__(self, max_entries: int = 50000) -> None:
+        self.max_entries = max(1, max_entries)
+        # (address, market_key, outcome) -> (side, streak_count, last_milestone_alert)
+        self._streaks: "OrderedDict[StreakKey, Optional[tuple[str, int, int]]]" = OrderedDict()
+        self._dirty_streaks: set[StreakKey] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def _streak(self, key: StreakKey) -> Optional[tuple[str, int, int]]:
+        if key in self._streaks:
+            self.hits += 1
+            self._streaks.move_to_end(key)
+            return self._streaks[key]
+        self.misses += 1
+        row = get_directional_streak(*key)
+        self._streaks[key] = row
+        return row
+
+    def update_directional_streak(
+        self,
+        address: str,
+        market_key: str,
+        outcome: str,
+        side: str,
+    ) -> tuple[int, bool]:
+        """Same result as db.update_directional_streak, without touching SQLite."""
+        key = (address, market_key, outcome)
+        cached = key in self._streaks
+        row = self._streak(key)
+        self._remember(key, row, cached)
+
+        if row and row[0] == side:
+            streak_count = row[1] + 1
+            last_milestone_alert = row[2]
+        else:
+            streak_count = 1
+            last_milestone_alert = 0
+
+        is_milestone = streak_count in MILESTONES and streak_count > last_milestone_alert
+        next_milestone_alert = streak_count if is_milestone else last_milestone_alert
+        self._streaks[key] = (side, streak_count, next_milestone_alert)
+        self._dirty_streaks.add(key)
+        return streak_count, is_milestone
+
+    def _remember(self, key: StreakKey, value: Optional[tuple[str, int, int]], cached: bool) -> None:
+        was_dirty = key in self._dirty_streaks
+
+        def restore() -> None:
+            if cached:
+                self._streaks[key] = value
+            else:
+                self._streaks.pop(key, None)
+            if was_dirty:
+                self._dirty_streaks.add(key)
+            else:
+                self._dirty_streaks.discard(key)
+
+        on_rollback(restore)
+
+    def flush(self) -> int:
+        """Write changed rows in one batch, then trim the LRU map."""
+        streak_keys = list(self._dirty_streaks)
+        if streak_keys:
+            upsert_directional_streaks([key + self._streaks[key] for key in streak_keys])
+        self._dirty_streaks.clear()
+
+        def restore() -> None:
+            # Keys evicted below were written in this transaction too, so the
+            # rollback drops them from SQLite and the next miss reloads them.
+            self._dirty_streaks.update(k for k in streak_keys if k in self._streaks)
+
+        on_rollback(restore)
+        # Rows are only evicted once written, so a miss can always reload them.
+        while len(self._streaks) > self.max_entries:
+            self._streaks.popitem(last=False)
+        return len(streak_keys)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "streak_entries": len(self._streaks),
+            "streak_hits": self.hits,
+            "streak_misses": self.misses,
+        }
@@ -1,55 +1,85 @@
 import logging
 import os
 import time
-from typing import Optional
+from typing import Callable, Optional
 import html
+import json
 import secrets
+import threading
+from collections import OrderedDict
 
-import requests
-from eth_abi import decode
 from web3 import Web3
 
 from config import (
     BOT_TOKEN,
     CHANNEL_ID,
     RPC_URL,
+    WS_URL,
     POLL_SECONDS,
     CONFIRMATIONS,
     MAX_BLOCK_RANGE,
+    BLOCK_RANGE_MIN,
+    BLOCK_RANGE_MAX,
+    BLOCK_RANGE_SLOW_MS,
     MAX_LAG_BLOCKS,
     CTF_EXCHANGE,
-    MAX_RETRIES,
+    TELEGRAM_CHAT_INTERVAL_SECONDS,
+    TELEGRAM_MAX_PER_SECOND,
+    OUTBOX_MAX_ATTEMPTS,
+    METRICS_PORT,
+    PIPELINE,
     MIN_USDC_ALERT,
     SENT_EVENTS_TTL_DAYS,
-    SENT_EVENTS_CLEANUP_INTERVAL_SECONDS,
     LOG_DIR,
     TRACKER_LOG_PATH,
+    FILL_SOURCE,
+    FILL_LOG_PATH,
+    BACKFILL_WORKERS,
+    STREAK_CACHE_MAX_ENTRIES,
 )
 from db import (
     init_db,
-    list_wallets,
+    transaction,
     get_state,
     set_state,
     is_sent_any,
     mark_sent_any,
-    prune_old_sent_events,
-    update_directional_streak,
-    get_active_tracked_position,
+    warm_sent_cache,
     mark_tracked_position_exited,
     add_track_button,
+    add_gap,
+    list_gaps,
+    split_gap,
+    fail_gap,
+    delete_gap,
+    enqueue_outbox,
 )
-from market_cache import get_market_for_token_fast
+import maintenance
+import metrics
+from backfill import Backfill
+from block_range import RangeController
+from fill_log import FillLog
+from log_fetch import fetch_topic_logs, get_logs_calls
+from log_stream import LogStream
+from market_cache import cache_stats, flush_cache, get_market_for_token_fast, prefetch_markets
+from market_state import describe as describe_market_state, prefetch_states, start_refresher, state_stats
+from orderfilled import EVENT_SIG, Fill, decode_batch
+from outbox import start_sender, wake as wake_outbox
+from rpc_pool import PoolProvider, RpcPool, parse_urls
+from positions import TrackedPositionIndex
+from streaks import StreakEngine
+from wallet_registry import WalletRegistry
 
 API_BASE = f"https://api.telegram.org/bot{BOT_TOKEN}"
+FILL_LOG_CONSUMER = "projecte"
+FILL_LOG_READ_LIMIT = 5000
+RANGE_STATS_INTERVAL_SECONDS = 60
+BLOCK_TIME_CACHE_SIZE = 1024
+
+streak_engine = StreakEngine(STREAK_CACHE_MAX_ENTRIES)
+tracked_positions = TrackedPositionIndex()
+wallet_registry = WalletRegistry()
 
-EVENT_TYPES = [
-    "uint256",
-    "uint256",
-    "uint256",
-    "uint256",
-    "uint256",
-]
-EVENT_SIG = "OrderFilled(bytes32,address,address,uint256,uint256,uint256,uint256,uint256)"
 
 
 def setup_logging() -> None:
@@ -61,22 +91,20 @@ def setup_logging() -> None:
     )
 
 
-def api_request(method: str, payload: dict) -> None:
-    url = f"{API_BASE}/{method}"
-    for _ in range(MAX_RETRIES):
-        try:
-            resp = requests.post(url, json=payload, timeout=15)
-            if resp.status_code == 200:
-                return
-        except Exception:
-            time.sleep(1)
+def send_message(text: str, reply_markup: Optional[dict] = None) -> int:
+    """Queue a channel message; the outbox thread delivers it after commit.
 
-
-def send_message(text: str, reply_markup: Optional[dict] = None) -> None:
+    Returns the outbox id, which process_fills pairs with the alert's block
+    for the block -> delivered latency histogram.
+    """
     payload = {"chat_id": CHANNEL_ID, "text": text, "parse_mode": "HTML"}
     if reply_markup:
         payload["reply_markup"] = reply_markup
-    api_request("sendMessage", payload)
+    return enqueue_outbox(CHANNEL_ID, payload)
+
+
+def start_outbox() -> None:
+    start_sender(API_BASE, TELEGRAM_CHAT_INTERVAL_SECONDS, TELEGRAM_MAX_PER_SECOND, OUTBOX_MAX_ATTEMPTS)
 
 
 def fmt_amount(value: int) -> str:
@@ -181,6 +209,9 @@ def build_message(
         lines.insert(9, "")
     if warn_multi:
         lines.insert(2, "⚠️ 이 트레이더는 이번 블록에 많은 거래를 진행했습니다. 실제 activity를 확인해주세요.")
+    state_line = describe_market_state(slug, outcome)
+    if state_line:
+        lines.insert(lines.index(f"💡 {subject_line}") + 1, state_line)
     return "\n".join(lines)
 
 
@@ -236,6 +267,9 @@ def build_add_message(
         f"🧑‍🎓 <a href=\"{html.escape(profile_link)}\">스마트 월렛 프로필 바로가기</a>",
         f"📲 <a href=\"https://polygonscan.com/tx/{html.escape(tx_hash)}\">트랜잭션 링크(폴리곤스캔)</a>",
     ]
+    state_line = describe_market_state(slug, outcome)
+    if state_line:
+        lines.insert(lines.index(f"💡 종목: {title}") + 1, state_line)
     return "\n".join(lines)
 
 
@@ -298,322 +332,575 @@ def detect_side(
     return side, outcome or "?", price, price_value, usdc_amount, shares_amount
 
 
-def poll() -> None:
+def process_logs(
+    logs: list,
+    wallets: dict,
+    to_block: int,
+    gap_id: Optional[int] = None,
+    block_time: Optional[Callable[[int], Optional[int]]] = None,
+) -> None:
+    """Turn one window of OrderFilled logs into alerts and advance the cursor.
+
+    With gap_id the window is a backfilled range: the gap row is deleted
+    instead of moving last_block.
+    """
+    with metrics.timer("decode"):
+        batch = decode_batch(logs)
+        fills = list(batch.rows())
+    if batch.skipped:
+        logging.warning("log_parse_skipped count=%s", batch.skipped)
+    process_fills(fills, wallets, to_block, log_count=len(logs), gap_id=gap_id, block_time=block_time)
+
+
+def process_fills(
+    all_fills: list[Fill],
+    wallets: dict,
+    to_block: int,
+    log_count: int,
+    gap_id: Optional[int] = None,
+    block_time: Optional[Callable[[int], Optional[int]]] = None,
+) -> None:
+    match_count = 0
+    alert_count = 0
+    fills = [fill for fill in all_fills if fill.maker in wallets or fill.taker in wallets]
+
+    # Resolve every unseen token of this window in a few batched
+    # Gamma requests before building candidates.
+    prefetch_markets(
+        str(asset_id)
+        for fill in fills
+        for asset_id in (fill.maker_asset_id, fill.taker_asset_id)
+        if asset_id != 0
+    )
+
+    candidates: dict[tuple[str, str], dict] = {}
+    for fill in fills:
+        try:
+            maker = fill.maker
+            taker = fill.taker
+            maker_asset_id = fill.maker_asset_id
+            taker_asset_id = fill.taker_asset_id
+            maker_amt = fill.maker_amount
+            taker_amt = fill.taker_amount
+            tx_hash = fill.tx_hash
+            log_index = fill.log_index
+            block_number = fill.block_number
+
+            for addr in (maker, taker):
+                if addr not in wallets:
+                    continue
+                match_count += 1
+
+                alias = wallets[addr][1]
+                note = wallets[addr][2]
+                maker_in_watch = addr == maker
+                taker_in_watch = addr == taker
+                side, outcome, price, price_value, usdc_amount, shares_amount = detect_side(
+                    maker_in_watch,
+                    taker_in_watch,
+                    maker_asset_id,
+                    taker_asset_id,
+                    maker_amt,
+                    taker_amt,
+                )
+
+                market = None
+                if maker_asset_id != 0:
+                    market = get_market_for_token_fast(str(maker_asset_id))
+                if not market and taker_asset_id != 0:
+                    market = get_market_for_token_fast(str(taker_asset_id))
+
+                key = (tx_hash, addr)
+                weight = usdc_amount or 0
+                if key not in candidates or weight > candidates[key]["weight"]:
+                    candidates[key] = {
+                        "addr": addr,
+                        "alias": alias,
+                        "note": note,
+                        "market": market,
+                        "side": side,
+                        "outcome": outcome,
+                        "price": price,
+                        "price_value": price_value,
+                        "usdc_amount": usdc_amount,
+                        "shares_amount": shares_amount,
+                        "tx_hash": tx_hash,
+                        "weight": weight,
+                        "log_index": log_index,
+                        "block_number": block_number,
+                        "maker_asset_id": maker_asset_id,
+                        "taker_asset_id": taker_asset_id,
+                    }
+        except Exception as exc:
+            logging.exception("log_parse_error: %s", exc)
+
+    block_counts: dict[tuple[str, int], int] = {}
+    for item in candidates.values():
+        key = (item["addr"], item["block_number"])
+        block_counts[key] = block_counts.get(key, 0) + 1
+
+    # Queue unseen slugs for the market-state thread; alerts for them go out
+    # without the state line rather than waiting on Gamma.
+    prefetch_states((item["market"] or {}).get("slug") for item in candidates.values())
+    if candidates:
+        tracked_positions.refresh()
+    # (outbox id, block number) of every queued message, for latency.
+    queued: list[tuple[int, int]] = []
+
+    # Every state mutation of this window, including queued messages,
+    # commits together with the cursor.
+    window_started = time.perf_counter()
+    with transaction():
+        for item in candidates.values():
+            if is_sent_any(item["tx_hash"], item["addr"]):
+                continue
+            usdc_amount = item["usdc_amount"]
+            market_key = None
+            if item["market"] and item["market"].get("slug"):
+                market_key = item["market"]["slug"]
+            else:
+                if item["market"] and item["market"].get("question"):
+                    market_key = item["market"]["question"]
+            if not market_key:
+                if item.get("maker_asset_id"):
+                    market_key = f"token:{item['maker_asset_id']}"
+                elif item.get("taker_asset_id"):
+                    market_key = f"token:{item['taker_asset_id']}"
+
+            if not market_key:
+                continue
+
+            streak_count, is_milestone = streak_engine.update_directional_streak(
+                item["addr"],
+                market_key,
+                item["outcome"],
+                item["side"],
+            )
+
+            if item["side"] == "매수":
+                if streak_count == 1:
+                    mark_sent_any(item["tx_hash"], item["addr"])
+                    continue
+                elif is_milestone:
+                    if usdc_amount is not None and (usdc_amount / 1_000_000) < MIN_USDC_ALERT:
+                        mark_sent_any(item["tx_hash"], item["addr"])
+                        logging.info(
+                            "suppressed_small_add_only address=%s tx=%s streak=%s usdc=%s min=%s",
+                            item["addr"],
+                            item["tx_hash"],
+                            streak_count,
+                            usdc_amount / 1_000_000,
+                            MIN_USDC_ALERT,
+                        )
+                        continue
+                    msg = build_add_message(
+                        item["addr"],
+                        item["alias"],
+                        item["note"],
+                        item["market"],
+                        item["outcome"],
+                        streak_count,
+                        item["usdc_amount"],
+                        item["price"],
+                        item["tx_hash"],
+                    )
+                    queued.append((send_message(msg), item["block_number"]))
+                    mark_sent_any(item["tx_hash"], item["addr"])
+                    alert_count += 1
+                    logging.info(
+                        "alerted_add_only address=%s tx=%s streak=%s",
+                        item["addr"],
+                        item["tx_hash"],
+                        streak_count,
+                    )
+                    continue
+                else:
+                    mark_sent_any(item["tx_hash"], item["addr"])
+                    continue
+
+            if usdc_amount is not None and (usdc_amount / 1_000_000) < MIN_USDC_ALERT:
+                mark_sent_any(item["tx_hash"], item["addr"])
+                logging.info(
+                    "suppressed_small_alert address=%s tx=%s side=%s usdc=%s min=%s",
+                    item["addr"],
+                    item["tx_hash"],
+                    item["side"],
+                    usdc_amount / 1_000_000,
+                    MIN_USDC_ALERT,
+                )
+                continue
+
+            warn_multi = block_counts.get((item["addr"], item["block_number"]), 0) > 1
+            msg = build_message(
+                item["addr"],
+                item["alias"],
+                item["note"],
+                item["market"],
+                item["side"],
+                item["outcome"],
+                item["price"],
+                item["usdc_amount"],
+                item["shares_amount"],
+                item["price_value"],
+                item["tx_hash"],
+                warn_multi,
+            )
+            reply_markup = None
+            slug = ""
+            if item["market"] and item["market"].get("slug"):
+                slug = item["market"]["slug"]
+            if slug:
+                token = secrets.token_urlsafe(6)
+                add_track_button(
+                    token,
+                    item["addr"],
+                    slug,
+                    item["market"].get("question") if item["market"] else slug,
+                    item["outcome"],
+                    item["side"],
+                )
+                reply_markup = {
+                    "inline_keyboard": [
+                        [{"text": "추적하기", "callback_data": f"track:{token}"}]
+                    ]
+                }
+            queued.append((send_message(msg, reply_markup=reply_markup), item["block_number"]))
+            mark_sent_any(item["tx_hash"], item["addr"])
+            alert_count += 1
+            logging.info("alerted address=%s tx=%s", item["addr"], item["tx_hash"])
+
+            slug = ""
+            if item["market"] and item["market"].get("slug"):
+                slug = item["market"]["slug"]
+            if slug:
+                tracked = tracked_positions.get(item["addr"], slug)
+                if tracked:
+                    chat_id, t_outcome, t_side, t_title, t_started = tracked
+                    if t_outcome == item["outcome"] and t_side != item["side"]:
+                        exit_msg = (
+                            "⚠️ 결과 전에 포지션 변경/청산 가능성\n"
+                            f"지갑: {item['addr']}\n"
+                            f"종목: {t_title}\n"
+                            f"이전: {t_outcome} {t_side}\n"
+                            f"현재: {item['outcome']} {item['side']}\n"
+                            f"tx: https://polygonscan.com/tx/{item['tx_hash']}"
+                        )
+                        queued.append((send_message(exit_msg), item["block_number"]))
+                        mark_tracked_position_exited(chat_id, item["addr"], slug, t_started, item["tx_hash"])
+                        tracked_positions.exited(item["addr"], slug, tracked)
+
+        if log_count:
+            logging.info("matches=%s alerts=%s", match_count, alert_count)
+
+        streak_engine.flush()
+        if gap_id is None:
+            set_state("last_block", str(to_block))
+        else:
+            delete_gap(gap_id)
+    metrics.observe("db_window", time.perf_counter() - window_started)
+    metrics.inc("fills", len(all_fills))
+    metrics.inc("matches", match_count)
+    metrics.inc("alerts", alert_count)
+    if alert_count:
+        wake_outbox()
+    if block_time is not None and queued:
+        # Block timestamps are only needed for the latency histogram, so
+        # they are looked up after commit, off the alert path. A message
+        # the outbox already delivered is matched up by metrics.
+        origins: dict[int, Optional[int]] = {}
+        for outbox_id, block_number in queued:
+            if block_number not in origins:
+                origins[block_number] = block_time(block_number)
+            if origins[block_number] is not None:
+                metrics.track_delivery(outbox_id, origins[block_number])
+
+
+def block_time_lookup(w3: Web3, stream: Optional[LogStream] = None) -> Callable[[int], Optional[int]]:
+    """Cached block number -> header timestamp; None when the header fetch fails.
+
+    With a stream, timestamps from its newHeads feed are used first.
+    """
+    block_times: "OrderedDict[int, int]" = OrderedDict()
+    lock = threading.Lock()
+
+    def block_time(block_number: int) -> Optional[int]:
+        with lock:
+            if block_number in block_times:
+                return block_times[block_number]
+        timestamp = stream.block_timestamp(block_number) if stream else None
+        if timestamp is not None:
+            return timestamp
+        try:
+            with metrics.timer("block_header"):
+                timestamp = int(w3.eth.get_block(block_number)["timestamp"])
+        except Exception as exc:
+            logging.warning("block_header_failed block=%s error=%s", block_number, exc)
+            return None
+        with lock:
+            block_times[block_number] = timestamp
+            if len(block_times) > BLOCK_TIME_CACHE_SIZE:
+                block_times.popitem(last=False)
+        return timestamp
+
+    return block_time
+
+
+def write_metrics_summary() -> None:
+    summary = metrics.summary()
+    logging.info(
+        "stage_latency %s",
+        " ".join(
+            f"{stage}={row['n']}/{row['avg_ms']}ms/p95<={row['p95_ms']}ms"
+            for stage, row in summary.items()
+            if stage != "counters" and row["n"]
+        ),
+    )
+    summary["market_cache"] = cache_stats()
+    summary["market_state"] = state_stats()
+    set_state("metrics_summary", json.dumps(summary, separators=(",", ":")))
+
+
+def poll_fill_log() -> None:
+    """Consume fills from the shared ingest.py log instead of polling the RPC."""
+    fill_log = FillLog(FILL_LOG_PATH)
+    logging.info("fill_log_enabled path=%s", FILL_LOG_PATH)
+    last_cleanup_at = 0
+    last_stats_at = 0
+    registered_version = None
+
+    while True:
+        try:
+            last_cleanup_at = maintenance.maybe_run(last_cleanup_at)
+
+            registry = wallet_registry.refresh()
+            wallets = registry.by_address
+            if registry.version != registered_version:
+                fill_log.register(FILL_LOG_CONSUMER, wallets)
+                registered_version = registry.version
+            fills, last_seq, through_block = fill_log.read(FILL_LOG_CONSUMER, FILL_LOG_READ_LIMIT)
+            last_block = int(get_state("last_block") or "0")
+            if fills or through_block > last_block:
+                if fills:
+                    logging.info("fill_log count=%s through=%s", len(fills), through_block)
+                # A crash before ack replays these fills; sent_events dedups them.
+                process_fills(fills, wallets, max(through_block, last_block), log_count=len(fills))
+                fill_log.ack(FILL_LOG_CONSUMER, last_seq)
+                flush_cache()
+            now = int(time.time())
+            if now - last_stats_at >= RANGE_STATS_INTERVAL_SECONDS:
+                last_stats_at = now
+                write_metrics_summary()
+            if len(fills) == FILL_LOG_READ_LIMIT:
+                continue
+        except Exception:
+            logging.exception("tracker_error")
+            time.sleep(2)
+
+        time.sleep(POLL_SECONDS)
+
+
+def startup() -> None:
+    """Logging, DB, caches, outbox sender and metrics shared by poll() and pipeline.py."""
     setup_logging()
     logging.info("tracker_start")
     init_db()
-    if not RPC_URL:
+    if FILL_SOURCE != "log" and not RPC_URL:
         raise SystemExit("PROJECTE_RPC_URL is not set")
     if not BOT_TOKEN or not CHANNEL_ID:
         raise SystemExit("PROJECTE_BOT_TOKEN or PROJECTE_CHANNEL_ID is not set")
 
-    w3 = Web3(Web3.HTTPProvider(RPC_URL, request_kwargs={"timeout": 20}))
+    warmed = warm_sent_cache(SENT_EVENTS_TTL_DAYS)
+    logging.info("sent_cache_warmed keys=%s ttl_days=%s", warmed, SENT_EVENTS_TTL_DAYS)
+
+    start_outbox()
+    start_refresher()
+    metrics.start_server(METRICS_PORT)
+
+
+def poll() -> None:
+    startup()
+    if FILL_SOURCE == "log":
+        poll_fill_log()
+        return
+
+    rpc = RpcPool(parse_urls(RPC_URL), timeout=20)
+    w3 = Web3(PoolProvider(rpc))
     topic0 = w3.keccak(text=EVENT_SIG).hex()
+    exchanges = [
+        Web3.to_checksum_address(addr.strip())
+        for addr in CTF_EXCHANGE.split(",")
+        if addr.strip()
+    ]
 
+    stream = None
+    if WS_URL:
+        stream = LogStream(WS_URL, exchanges, [topic0]).start()
+        logging.info("log_stream_enabled url=%s", WS_URL)
+
+    def idle() -> None:
+        # In stream mode wake up as soon as a new head arrives.
+        if stream:
+            stream.wait_for_head(POLL_SECONDS)
+        else:
+            time.sleep(POLL_SECONDS)
+
+    block_time = block_time_lookup(w3, stream)
+
+    def fetch_gap(from_block: int, to_block: int) -> list:
+        registry = wallet_registry.refresh()
+        if not registry.by_address:
+            return []
+        return fetch_topic_logs(w3, exchanges, topic0, registry.topic_chunks, from_block, to_block)
+
+    def handle_gap(gap_id: int, from_block: int, to_block: int, logs: list) -> None:
+        wallets = wallet_registry.refresh().by_address
+        logging.info("backfill blocks=%s->%s logs=%s gap=%s", from_block, to_block, len(logs), gap_id)
+        process_logs(logs, wallets, to_block, gap_id=gap_id, block_time=block_time)
+
+    def skip_to(new_last_block: int) -> None:
+        # Hand the skipped blocks to the backfill worker instead of dropping them.
+        with transaction():
+            add_gap(last_block + 1, new_last_block)
+            set_state("last_block", str(new_last_block))
+        backfill.wake()
+
+    backfill = Backfill(
+        fetch_gap,
+        list_gaps,
+        split_gap,
+        fail_gap,
+        workers=BACKFILL_WORKERS,
+        ranges=RangeController(MAX_BLOCK_RANGE, BLOCK_RANGE_MIN, BLOCK_RANGE_MAX, slow_ms=BLOCK_RANGE_SLOW_MS),
+        idle_seconds=POLL_SECONDS,
+        fetch_calls=lambda: get_logs_calls(wallet_registry.refresh().topic_chunks),
+    ).start()
+
+    ranges = RangeController(
+        MAX_BLOCK_RANGE,
+        BLOCK_RANGE_MIN,
+        BLOCK_RANGE_MAX,
+        slow_ms=BLOCK_RANGE_SLOW_MS,
+    )
     last_block = int(get_state("last_block") or "0")
     last_cleanup_at = 0
+    last_stats_at = 0
 
     while True:
-        target = None
         try:
-            now = int(time.time())
-            if now - last_cleanup_at >= SENT_EVENTS_CLEANUP_INTERVAL_SECONDS:
-                deleted = prune_old_sent_events(SENT_EVENTS_TTL_DAYS)
-                last_cleanup_at = now
-                if deleted > 0:
-                    logging.info(
-                        "sent_events_pruned deleted=%s ttl_days=%s",
-                        deleted,
-                        SENT_EVENTS_TTL_DAYS,
-                    )
-
-            latest = w3.eth.block_number
+            last_cleanup_at = maintenance.maybe_run(last_cleanup_at)
+            if backfill.drain(handle_gap, BACKFILL_WORKERS):
+                flush_cache()
+
+            latest = stream.head() if stream else None
+            if not latest:
+                with metrics.timer("block_number"):
+                    latest = w3.eth.block_number
             target = max(latest - CONFIRMATIONS, 0)
             if last_block == 0:
                 last_block = max(target - MAX_BLOCK_RANGE, 0)
 
             if target <= last_block:
-                time.sleep(POLL_SECONDS)
+                idle()
                 continue
 
             lag_blocks = target - last_block
             if lag_blocks > MAX_LAG_BLOCKS:
+                skip_to(target)
                 last_block = target
-                set_state("last_block", str(last_block))
+                if stream:
+                    # Backfill refetches these blocks with get_logs.
+                    stream.discard(target)
                 logging.warning(
-                    "lag too large; jump to latest target=%s lag_blocks=%s",
+                    "lag too large; jump to latest and backfill target=%s lag_blocks=%s",
                     target,
                     lag_blocks,
                 )
-                time.sleep(POLL_SECONDS)
+                idle()
                 continue
 
-            wallets = {row[0].lower(): row for row in list_wallets()}
+            registry = wallet_registry.refresh()
+            wallets = registry.by_address
             if not wallets:
                 last_block = target
                 set_state("last_block", str(last_block))
-                time.sleep(POLL_SECONDS)
+                if stream:
+                    stream.discard(last_block)
+                idle()
                 continue
 
-            exchanges = [
-                Web3.to_checksum_address(addr.strip())
-                for addr in CTF_EXCHANGE.split(",")
-                if addr.strip()
-            ]
-
             from_block = last_block + 1
-            to_block = min(target, last_block + MAX_BLOCK_RANGE)
-
-            logging.info("poll blocks=%s->%s target=%s", from_block, to_block, target)
-            logs = w3.eth.get_logs(
-                {
-                    "fromBlock": from_block,
-                    "toBlock": to_block,
-                    "address": exchanges,
-                    "topics": [topic0],
-                }
-            )
-            if logs:
-                logging.info("logs count=%s blocks=%s->%s", len(logs), from_block, to_block)
-
-            match_count = 0
-            alert_count = 0
-            candidates: dict[tuple[str, str], dict] = {}
-            for log in logs:
+            to_block = min(target, last_block + ranges.range)
+
+            logs = stream.take(from_block, to_block) if stream else None
+            source = "stream"
+            if logs is None:
+                # Polling mode, or catching up below what the stream covers.
+                source = "get_logs"
+                started = time.monotonic()
                 try:
-                    if len(log.get("topics", [])) < 4:
-                        continue
-
-                    data = decode(EVENT_TYPES, bytes(log["data"]))
-                    (
-                        maker_asset_id,
-                        taker_asset_id,
-                        maker_amt,
-                        taker_amt,
-                        fee,
-                    ) = data
-
-                    maker = Web3.to_checksum_address(
-                        "0x" + log["topics"][2].hex()[-40:]
-                    ).lower()
-                    taker = Web3.to_checksum_address(
-                        "0x" + log["topics"][3].hex()[-40:]
-                    ).lower()
-                    tx_hash = log["transactionHash"].hex()
-                    log_index = log["logIndex"]
-                    block_number = log["blockNumber"]
-
-                    for addr in (maker, taker):
-                        if addr not in wallets:
-                            continue
-                        match_count += 1
-
-                        alias = wallets[addr][1]
-                        note = wallets[addr][2]
-                        maker_in_watch = addr == maker
-                        taker_in_watch = addr == taker
-                        side, outcome, price, price_value, usdc_amount, shares_amount = detect_side(
-                            maker_in_watch,
-                            taker_in_watch,
-                            maker_asset_id,
-                            taker_asset_id,
-                            maker_amt,
-                            taker_amt,
-                        )
-
-                        market = None
-                        if maker_asset_id != 0:
-                            market = get_market_for_token_fast(str(maker_asset_id))
-                        if not market and taker_asset_id != 0:
-                            market = get_market_for_token_fast(str(taker_asset_id))
-
-                        key = (tx_hash, addr)
-                        weight = usdc_amount or 0
-                        if key not in candidates or weight > candidates[key]["weight"]:
-                            candidates[key] = {
-                                "addr": addr,
-                                "alias": alias,
-                                "note": note,
-                                "market": market,
-                                "side": side,
-                                "outcome": outcome,
-                                "price": price,
-                                "price_value": price_value,
-                                "usdc_amount": usdc_amount,
-                                "shares_amount": shares_amount,
-                                "tx_hash": tx_hash,
-                                "weight": weight,
-                                "log_index": log_index,
-                                "block_number": block_number,
-                                "maker_asset_id": maker_asset_id,
-                                "taker_asset_id": taker_asset_id,
-                            }
+                    logs = fetch_topic_logs(w3, exchanges, topic0, registry.topic_chunks, from_block, to_block)
                 except Exception as exc:
-                    logging.exception("log_parse_error: %s", exc)
-
-            block_counts: dict[tuple[str, int], int] = {}
-            for item in candidates.values():
-                key = (item["addr"], item["block_number"])
-                block_counts[key] = block_counts.get(key, 0) + 1
-
-            for item in candidates.values():
-                if is_sent_any(item["tx_hash"], item["addr"]):
-                    continue
-                usdc_amount = item["usdc_amount"]
-                market_key = None
-                if item["market"] and item["market"].get("slug"):
-                    market_key = item["market"]["slug"]
-                else:
-                    if item["market"] and item["market"].get("question"):
-                        market_key = item["market"]["question"]
-                if not market_key:
-                    if item.get("maker_asset_id"):
-                        market_key = f"token:{item['maker_asset_id']}"
-                    elif item.get("taker_asset_id"):
-                        market_key = f"token:{item['taker_asset_id']}"
-
-                if not market_key:
-                    continue
-
-                streak_count, is_milestone = update_directional_streak(
-                    item["addr"],
-                    market_key,
-                    item["outcome"],
-                    item["side"],
-                )
-
-                if item["side"] == "매수":
-                    if streak_count == 1:
-                        mark_sent_any(item["tx_hash"], item["addr"])
-                        continue
-                    elif is_milestone:
-                        if usdc_amount is not None and (usdc_amount / 1_000_000) < MIN_USDC_ALERT:
-                            mark_sent_any(item["tx_hash"], item["addr"])
-                            logging.info(
-                                "suppressed_small_add_only address=%s tx=%s streak=%s usdc=%s min=%s",
-                                item["addr"],
-                                item["tx_hash"],
-                                streak_count,
-                                usdc_amount / 1_000_000,
-                                MIN_USDC_ALERT,
-                            )
-                            continue
-                        msg = build_add_message(
-                            item["addr"],
-                            item["alias"],
-                            item["note"],
-                            item["market"],
-                            item["outcome"],
-                            streak_count,
-                            item["usdc_amount"],
-                            item["price"],
-                            item["tx_hash"],
+                    if ranges.failed(exc):
+                        logging.warning(
+                            "get_logs limit; range=%s blocks=%s->%s retry_in=%.1fs error=%s",
+                            ranges.range,
+                            from_block,
+                            to_block,
+                            ranges.backoff,
+                            exc,
                         )
-                        send_message(msg)
-                        mark_sent_any(item["tx_hash"], item["addr"])
-                        alert_count += 1
-                        logging.info(
-                            "alerted_add_only address=%s tx=%s streak=%s",
-                            item["addr"],
-                            item["tx_hash"],
-                            streak_count,
-                        )
-                        continue
-                    else:
-                        mark_sent_any(item["tx_hash"], item["addr"])
+                        time.sleep(ranges.backoff)
                         continue
-
-                if usdc_amount is not None and (usdc_amount / 1_000_000) < MIN_USDC_ALERT:
-                    mark_sent_any(item["tx_hash"], item["addr"])
-                    logging.info(
-                        "suppressed_small_alert address=%s tx=%s side=%s usdc=%s min=%s",
-                        item["addr"],
-                        item["tx_hash"],
-                        item["side"],
-                        usdc_amount / 1_000_000,
-                        MIN_USDC_ALERT,
-                    )
-                    continue
-
-                warn_multi = block_counts.get((item["addr"], item["block_number"]), 0) > 1
-                msg = build_message(
-                    item["addr"],
-                    item["alias"],
-                    item["note"],
-                    item["market"],
-                    item["side"],
-                    item["outcome"],
-                    item["price"],
-                    item["usdc_amount"],
-                    item["shares_amount"],
-                    item["price_value"],
-                    item["tx_hash"],
-                    warn_multi,
+                    raise
+                metrics.observe("get_logs", time.monotonic() - started)
+                latency_ms = int((time.monotonic() - started) * 1000)
+                ranges.observe(
+                    to_block - from_block + 1,
+                    len(logs),
+                    latency_ms,
+                    calls=get_logs_calls(registry.topic_chunks),
                 )
-                reply_markup = None
-                slug = ""
-                if item["market"] and item["market"].get("slug"):
-                    slug = item["market"]["slug"]
-                if slug:
-                    token = secrets.token_urlsafe(6)
-                    add_track_button(
-                        token,
-                        item["addr"],
-                        slug,
-                        item["market"].get("question") if item["market"] else slug,
-                        item["outcome"],
-                        item["side"],
-                    )
-                    reply_markup = {
-                        "inline_keyboard": [
-                            [{"text": "추적하기", "callback_data": f"track:{token}"}]
-                        ]
-                    }
-                send_message(msg, reply_markup=reply_markup)
-                mark_sent_any(item["tx_hash"], item["addr"])
-                alert_count += 1
-                logging.info("alerted address=%s tx=%s", item["addr"], item["tx_hash"])
-
-                slug = ""
-                if item["market"] and item["market"].get("slug"):
-                    slug = item["market"]["slug"]
-                if slug:
-                    tracked = get_active_tracked_position(item["addr"], slug)
-                    if tracked:
-                        chat_id, t_outcome, t_side, t_title, t_started = tracked
-                        if t_outcome == item["outcome"] and t_side != item["side"]:
-                            exit_msg = (
-                                "⚠️ 결과 전에 포지션 변경/청산 가능성\n"
-                                f"지갑: {item['addr']}\n"
-                                f"종목: {t_title}\n"
-                                f"이전: {t_outcome} {t_side}\n"
-                                f"현재: {item['outcome']} {item['side']}\n"
-                                f"tx: https://polygonscan.com/tx/{item['tx_hash']}"
-                            )
-                            send_message(exit_msg)
-                            mark_tracked_position_exited(chat_id, item["addr"], slug, t_started, item["tx_hash"])
-
+            logging.info(
+                "poll blocks=%s->%s target=%s source=%s range=%s",
+                from_block,
+                to_block,
+                target,
+                source,
+                ranges.range,
+            )
             if logs:
-                logging.info("matches=%s alerts=%s", match_count, alert_count)
+                logging.info("logs count=%s blocks=%s->%s", len(logs), from_block, to_block)
 
+            process_logs(logs, wallets, to_block, block_time=block_time)
             last_block = to_block
-            set_state("last_block", str(last_block))
-        except Exception as exc:
-            if "Block range is too large" in str(exc) and target is not None:
-                last_block = max(target - MAX_BLOCK_RANGE, 0)
-                set_state("last_block", str(last_block))
-                logging.warning(
-                    "block range too large; reset last_block=%s target=%s",
-                    last_block,
-                    target,
-                )
-                time.sleep(1)
+            if stream:
+                # Only now: a failed window is retried from the same buffered logs.
+                stream.discard(to_block)
+            flush_cache()
+
+            now = int(time.time())
+            if now - last_stats_at >= RANGE_STATS_INTERVAL_SECONDS:
+                last_stats_at = now
+                stats = {**ranges.stats(), **streak_engine.stats(), **wallet_registry.stats()}
+                pool = rpc.stats()
+                set_state("get_logs_stats", json.dumps({**stats, **pool}, separators=(",", ":")))
+                logging.info("get_logs_stats %s", " ".join(f"{k}={v}" for k, v in stats.items()))
+                for endpoint in pool["rpc_endpoints"]:
+                    logging.info("rpc_endpoint %s", " ".join(f"{k}={v}" for k, v in endpoint.items()))
+                write_metrics_summary()
+            if to_block < target:
                 continue
+        except Exception:
             logging.exception("tracker_error")
             time.sleep(2)
 
-        time.sleep(POLL_SECONDS)
+        idle()
 
 
 if __name__ == "__main__":
-    poll()
+    if PIPELINE:
+        import pipeline
+
+        pipeline.run()
+    else:
+        poll()
@@ -0,0 +1,56 @@
+"""Watched wallets kept in memory and reloaded only when the list changes.
+
+Every wallets write in db.py (the bot's /add, /remove, alias and note
+edits) bumps state.wallets_version in the same transaction. refresh()
+compares that one row with the loaded version, so an unchanged watch list
+costs a single state read per tick instead of a full wallets scan. Each
+snapshot also carries the get_logs topic OR-lists built from its
+addresses, so they are not rebuilt for every window.
+"""
+import threading
+from typing import NamedTuple, Optional
+
+from db import WALLETS_VERSION_KEY, get_state, list_wallets
+from log_fetch import topic_chunks
+
+
+class WalletSet(NamedTuple):
+    version: Optional[str]
+    # lowercased address -> (address, alias, note)
+    by_address: dict
+    topic_chunks: list[list[str]]
+
+
+_EMPTY = WalletSet(None, {}, [])
+
+
+class WalletRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._current = _EMPTY
+        self.reloads = 0
+
+    def refresh(self) -> WalletSet:
+        """Current wallet set, reloaded first if another writer bumped the version.
+
+        Callers get an immutable snapshot, so backfill threads and the poll
+        loop can hold different versions safely.
+        """
+        version = get_state(WALLETS_VERSION_KEY) or "0"
+        current = self._current
+        if version == current.version:
+            return current
+        with self._lock:
+            if self._current.version != version:
+                by_address = {row[0].lower(): row for row in list_wallets()}
+                self._current = WalletSet(version, by_address, topic_chunks(by_address))
+                self.reloads += 1
+            return self._current
+
+    def stats(self) -> dict:
+        current = self._current
+        return {
+            "wallets": len(current.by_address),
+            "wallets_version": current.version,
+            "wallet_reloads": self.reloads,
+        }
@@ -1,13 +1,16 @@
+import sys
 import time
 
-from market_cache import build_token_map
+from db import init_db
+from market_cache import refresh_token_store
 
 
 def main() -> None:
+    init_db()
     start = time.time()
-    token_map = build_token_map()
+    token_count = refresh_token_store(full="--full" in sys.argv[1:])
     elapsed = time.time() - start
-    print(f"cache_tokens={len(token_map)} elapsed={elapsed:.2f}s")
+    print(f"cache_tokens={token_count} elapsed={elapsed:.2f}s")
 
 
 if __name__ == "__main__":
@@ -26,6 +26,7 @@ POLYMARKET_HOST = os.environ.get("PROJECTK_POLYMARKET_HOST", "https://clob.polym
 POLYMARKET_CHAIN_ID = int(os.environ.get("PROJECTK_POLYMARKET_CHAIN_ID", "137"))
 POLYMARKET_SIGNATURE_TYPE = int(os.environ.get("PROJECTK_POLYMARKET_SIGNATURE_TYPE", "0"))
 
+# One URL or a comma-separated list; several URLs are pooled with hedging.
 RPC_URL = os.environ.get("PROJECTK_RPC_URL", "").strip()
 USDC_TOKEN_ADDRESS = os.environ.get(
     "PROJECTK_USDC_TOKEN_ADDRESS",
@@ -34,12 +35,16 @@ USDC_TOKEN_ADDRESS = os.environ.get(
 WATCHER_POLL_SECONDS = int(os.environ.get("PROJECTK_WATCHER_POLL_SECONDS", "10"))
 WATCHER_CONFIRMATIONS = int(os.environ.get("PROJECTK_WATCHER_CONFIRMATIONS", "2"))
 WATCHER_MAX_BLOCK_RANGE = int(os.environ.get("PROJECTK_WATCHER_MAX_BLOCK_RANGE", "200"))
+# get_logs range adapts between these bounds, starting at WATCHER_MAX_BLOCK_RANGE.
+WATCHER_BLOCK_RANGE_MIN = int(os.environ.get("PROJECTK_WATCHER_BLOCK_RANGE_MIN", "10"))
+WATCHER_BLOCK_RANGE_MAX = int(os.environ.get("PROJECTK_WATCHER_BLOCK_RANGE_MAX", "2000"))
 WATCHER_MAX_LAG_BLOCKS = int(os.environ.get("PROJECTK_WATCHER_MAX_LAG_BLOCKS", "600"))
 WATCHER_POLL_MIN_SECONDS = int(os.environ.get("PROJECTK_WATCHER_POLL_MIN_SECONDS", "5"))
 WATCHER_POLL_MAX_SECONDS = int(os.environ.get("PROJECTK_WATCHER_POLL_MAX_SECONDS", "10"))
 WATCHER_BACKOFF_ERROR_STREAK = int(os.environ.get("PROJECTK_WATCHER_BACKOFF_ERROR_STREAK", "2"))
 WATCHER_BACKOFF_SLOW_TICK_MS = int(os.environ.get("PROJECTK_WATCHER_BACKOFF_SLOW_TICK_MS", "4000"))
 WATCHER_RECOVERY_HEALTHY_TICKS = int(os.environ.get("PROJECTK_WATCHER_RECOVERY_HEALTHY_TICKS", "6"))
+WATCHER_BACKFILL_WORKERS = int(os.environ.get("PROJECTK_WATCHER_BACKFILL_WORKERS", "4"))
 WATCHER_EXCHANGES = os.environ.get(
     "PROJECTK_WATCHER_EXCHANGES",
     ",".join(
@@ -49,3 +54,6 @@ WATCHER_EXCHANGES = os.environ.get(
         ]
     ),
 ).strip()
+# Shared fill log written by ProjectE ingest.py; when set the watcher reads
+# fills from it instead of polling the RPC itself.
+WATCHER_FILL_LOG_PATH = os.environ.get("PROJECTK_WATCHER_FILL_LOG_PATH", "").strip()
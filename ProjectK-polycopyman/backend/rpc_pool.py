@@ -0,0 +1,228 @@
+"""Pool of Polygon JSON-RPC endpoints with health scoring and hedging.
+
+Each call goes to a healthy endpoint picked at random, weighted by the
+inverse of its recent latency, with a small uniform share so slow
+endpoints keep being measured. eth_blockNumber and eth_getLogs are hedged:
+if the first endpoint has not answered within the p95 latency of the
+fastest healthy endpoint, the same request goes to a second endpoint and
+the first response wins. Transport
+errors, HTTP errors and rate limits mark an endpoint down for a backoff
+that doubles on repeated failures. JSON-RPC errors such as range limits
+are returned to the caller as-is.
+
+PoolProvider plugs the pool into web3; RpcPool.call serves plain callers.
+
+The same module is kept in ProjectE-PolymarketTGtracker/rpc_pool.py.
+"""
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+import requests
+from web3.providers.base import JSONBaseProvider
+
+HEDGE_METHODS = frozenset({"eth_blockNumber", "eth_getLogs"})
+HEDGE_MIN_MS = 150
+HEDGE_MAX_MS = 5000
+DOWN_SECONDS = 15
+DOWN_MAX_SECONDS = 300
+LATENCY_WINDOW = 64
+# Share of picks made uniformly so slow or recovered endpoints get re-measured.
+EXPLORE_SHARE = 0.05
+
+
+def parse_urls(value: str) -> list[str]:
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+class RpcError(ValueError):
+    pass
+
+
+class Endpoint:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        parsed = urlparse(url)
+        # host[:port] only; paths often carry API keys.
+        self.label = (parsed.hostname or "?") + (f":{parsed.port}" if parsed.port else "")
+        self.session = requests.Session()
+        self.latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.down_until = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    def is_up(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def avg_ms(self) -> float:
+        if not self.latencies:
+            return 500.0
+        return sum(self.latencies) / len(self.latencies)
+
+    def p95_ms(self) -> float:
+        if len(self.latencies) < 5:
+            return 1000.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class RpcPool:
+    def __init__(self, urls: list[str], timeout: float = 20.0) -> None:
+        if not urls:
+            raise ValueError("no RPC URLs configured")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.timeout = timeout
+        self.hedged = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if len(self.endpoints) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=4 * len(self.endpoints), thread_name_prefix="rpc-hedge")
+
+    def _pick(self, exclude: Optional[Endpoint] = None) -> Optional[Endpoint]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e is not exclude and e.is_up(now)]
+            if not candidates:
+                if exclude is not None:
+                    return None
+                # Everything is down: try whichever comes back first.
+                return min(self.endpoints, key=lambda e: e.down_until)
+            if random.random() < EXPLORE_SHARE:
+                return random.choice(candidates)
+            weights = [1.0 / max(e.avg_ms(), 10.0) for e in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+    def _hedge_after_ms(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            return min((e.p95_ms() for e in self.endpoints if e.is_up(now)), default=HEDGE_MAX_MS)
+
+    def _mark_ok(self, endpoint: Endpoint, elapsed_ms: float) -> None:
+        with self._lock:
+            endpoint.calls += 1
+            endpoint.latencies.append(elapsed_ms)
+            endpoint.failures = 0
+            endpoint.down_until = 0.0
+
+    def _mark_down(self, endpoint: Endpoint, error: Exception) -> None:
+        with self._lock:
+            endpoint.calls += 1
+            endpoint.errors += 1
+            endpoint.failures += 1
+            backoff = min(DOWN_SECONDS * 2 ** (endpoint.failures - 1), DOWN_MAX_SECONDS)
+            endpoint.down_until = time.monotonic() + backoff
+        logging.warning("rpc_endpoint_down host=%s backoff=%ss error=%s", endpoint.label, backoff, error)
+
+    def _post(self, endpoint: Endpoint, body: bytes) -> dict:
+        started = time.monotonic()
+        try:
+            resp = endpoint.session.post(
+                endpoint.url,
+                data=body,
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+            resp.raise_for_status()
+            response = resp.json()
+            error = response.get("error") if isinstance(response, dict) else None
+            if error and "rate limit" in str(error).lower():
+                raise RpcError(str(error))
+        except Exception as exc:
+            self._mark_down(endpoint, exc)
+            raise
+        self._mark_ok(endpoint, (time.monotonic() - started) * 1000)
+        return response
+
+    def send(self, method: str, body: bytes) -> dict:
+        """POST an encoded request and return the decoded JSON-RPC response."""
+        primary = self._pick()
+        if self._executor is None or method not in HEDGE_METHODS:
+            try:
+                return self._post(primary, body)
+            except Exception:
+                fallback = self._pick(exclude=primary)
+                if fallback is None:
+                    raise
+                return self._post(fallback, body)
+
+        delay = min(max(self._hedge_after_ms(), HEDGE_MIN_MS), HEDGE_MAX_MS) / 1000
+        pending = {self._executor.submit(self._post, primary, body)}
+        done, pending = wait(pending, timeout=delay)
+        error: Optional[BaseException] = None
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+
+        secondary = self._pick(exclude=primary)
+        if secondary is not None:
+            if done:
+                logging.info("rpc_failover method=%s from=%s to=%s", method, primary.label, secondary.label)
+            else:
+                with self._lock:
+                    self.hedged += 1
+            pending.add(self._executor.submit(self._post, secondary, body))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error if error else RpcError(f"{method}: no endpoint answered")
+
+    def call(self, method: str, params: list[Any]) -> Any:
+        """Plain JSON-RPC call returning the result or raising RpcError."""
+        body = json.dumps({"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}).encode("utf-8")
+        response = self.send(method, body)
+        if response.get("error"):
+            raise RpcError(str(response["error"]))
+        return response.get("result")
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "rpc_up": sum(1 for e in self.endpoints if e.is_up(now)),
+                "rpc_total": len(self.endpoints),
+                "rpc_hedged": self.hedged,
+                "rpc_endpoints": [
+                    {
+                        "host": e.label,
+                        "up": e.is_up(now),
+                        "avg_ms": int(e.avg_ms()),
+                        "p95_ms": int(e.p95_ms()),
+                        "calls": e.calls,
+                        "errors": e.errors,
+                    }
+                    for e in self.endpoints
+                ],
+            }
+
+
+class PoolProvider(JSONBaseProvider):
+    """web3 provider that sends every request through an RpcPool."""
+
+    def __init__(self, pool: RpcPool) -> None:
+        super().__init__()
+        self.pool = pool
+
+    def make_request(self, method, params):
+        return self.pool.send(method, self.encode_rpc_request(method, params))
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        try:
+            self.pool.call("eth_chainId", [])
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+        return True
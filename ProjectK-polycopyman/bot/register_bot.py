@@ -14,6 +14,7 @@ import fcntl
 from backend.config import DASHBOARD_URL, RPC_URL, TELEGRAM_BOT_TOKEN, TELEGRAM_OWNER_CHAT_ID, USDC_TOKEN_ADDRESS
 from backend.repositories.pairs import create_pair, delete_pair, list_pairs
 from backend.repositories.runtime import heartbeat
+from backend.rpc_pool import RpcPool, parse_urls
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
@@ -435,28 +436,27 @@ def _handle_site(chat_id: str) -> None:
     _send_message(chat_id, f"ProjectK 대시보드 주소:\n{DASHBOARD_URL}\ninstance: {BOT_INSTANCE}", use_keyboard=True)
 
 
-def _rpc_call(method: str, params: list[Any]) -> Any:
+_RPC_POOL: RpcPool | None = None
+
+
+def _rpc_pool() -> RpcPool:
+    global _RPC_POOL
     if not RPC_URL:
         raise ValueError("PROJECTK_RPC_URL is not set")
-    payload = json.dumps(
-        {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": method,
-            "params": params,
-        }
-    ).encode("utf-8")
-    req = request.Request(
-        RPC_URL,
-        data=payload,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
-    with request.urlopen(req, timeout=10) as resp:
-        body = json.loads(resp.read().decode("utf-8"))
-    if body.get("error"):
-        raise ValueError(str(body["error"]))
-    return body.get("result")
+    if _RPC_POOL is None:
+        _RPC_POOL = RpcPool(parse_urls(RPC_URL), timeout=10)
+    return _RPC_POOL
+
+
+def _rpc_call(method: str, params: list[Any]) -> Any:
+    return _rpc_pool().call(method, params)
+
+
+def _rpc_summary() -> str:
+    if not RPC_URL:
+        return "not_set"
+    endpoints = _rpc_pool().stats()["rpc_endpoints"]
+    return ", ".join(f"{e['host']}({'up' if e['up'] else 'down'})" for e in endpoints)
 
 
 def _erc20_balance_call_data(address: str) -> str:
@@ -504,7 +504,7 @@ def _handle_status(chat_id: str) -> None:
     lines = [
         "ProjectK /status",
         f"instance: {BOT_INSTANCE}",
-        f"rpc: {RPC_URL or 'not_set'}",
+        f"rpc: {_rpc_summary()}",
         "",
     ]
 
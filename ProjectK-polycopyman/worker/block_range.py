@@ -0,0 +1,139 @@
+"""AIMD sizing of get_logs block ranges.
+
+The range grows by a fixed step while responses come back small and fast,
+and halves on slow or oversized responses and on the RPC's range/result
+limit errors. Callers ask for `range`, time the call and report back with
+`observe()` or `failed()`; after a retryable failure they sleep `backoff`
+seconds before the next call. Rate limiting (HTTP 429) backs off without
+shrinking the range.
+
+The same module is kept in ProjectE-PolymarketTGtracker/block_range.py.
+"""
+from typing import Any
+
+# Substrings of the errors public Polygon RPCs return when a get_logs
+# call spans too many blocks or results.
+RANGE_ERROR_MARKERS = (
+    "block range",
+    "too large",
+    "too many",
+    "more than",
+    "limit exceeded",
+    "exceed",
+    "response size",
+    "timeout",
+    "timed out",
+)
+# Checked first: "429 Too Many Requests" and "rate limit exceeded" would
+# otherwise match the range markers above.
+RATE_LIMIT_MARKERS = (
+    "429",
+    "too many requests",
+    "rate limit",
+    "rate-limit",
+    "ratelimit",
+)
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    text = str(exc).lower()
+    return any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+def is_range_error(exc: Exception) -> bool:
+    if is_rate_limited(exc):
+        return False
+    if "Timeout" in type(exc).__name__:
+        return True
+    text = str(exc).lower()
+    return any(marker in text for marker in RANGE_ERROR_MARKERS)
+
+
+class RangeController:
+    def __init__(
+        self,
+        initial: int,
+        min_range: int,
+        max_range: int,
+        slow_ms: int = 3000,
+        max_logs: int = 5000,
+    ) -> None:
+        self.min_range = max(1, min_range)
+        self.max_range = max(self.min_range, max_range)
+        self.range = min(max(initial, self.min_range), self.max_range)
+        self.step = max(1, self.max_range // 20)
+        self.slow_ms = slow_ms
+        self.max_logs = max_logs
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        # Seconds to wait before retrying after failed(); doubles per
+        # consecutive failure and resets on the next success.
+        self.backoff = 0.0
+        self._failures = 0
+        self.last_logs = 0
+        self.last_latency_ms = 0
+        self._avg_logs = 0.0
+        self._avg_latency_ms = 0.0
+
+    def observe(self, blocks: int, logs: int, latency_ms: int, calls: int = 1) -> None:
+        """Record a successful fetch that covered `blocks` blocks.
+
+        A fetch split into `calls` get_logs requests over the same range
+        (one per topic filter) is judged by its per-request latency and
+        log count, so adding filters does not shrink the range.
+        """
+        calls = max(1, calls)
+        logs = logs // calls
+        latency_ms = latency_ms // calls
+        first = self.calls == 0
+        self.calls += calls
+        self._failures = 0
+        self.backoff = 0.0
+        self.last_logs = logs
+        self.last_latency_ms = latency_ms
+        self._avg_logs = logs if first else 0.8 * self._avg_logs + 0.2 * logs
+        self._avg_latency_ms = latency_ms if first else 0.8 * self._avg_latency_ms + 0.2 * latency_ms
+
+        if latency_ms >= self.slow_ms or logs >= self.max_logs:
+            self._decrease()
+        elif blocks >= self.range and latency_ms < self.slow_ms // 2 and logs < self.max_logs // 2:
+            # Only grow when the call actually used the full range; short
+            # windows at the head say nothing about larger ones.
+            self.range = min(self.max_range, self.range + self.step)
+
+    def failed(self, exc: Exception) -> bool:
+        """Shrink on range/size/time limit errors, back off on rate limiting.
+
+        Returns True when retrying the same call (with the possibly smaller
+        range) is worthwhile after sleeping `backoff` seconds.
+        """
+        self.errors += 1
+        self._failures += 1
+        self.backoff = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (self._failures - 1))
+        if is_rate_limited(exc):
+            self.rate_limited += 1
+            return True
+        if not is_range_error(exc):
+            return False
+        before = self.range
+        self._decrease()
+        return self.range < before
+
+    def _decrease(self) -> None:
+        self.range = max(self.min_range, self.range // 2)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "block_range": self.range,
+            "logs_per_call": round(self._avg_logs, 1),
+            "latency_ms": int(self._avg_latency_ms),
+            "get_logs_calls": self.calls,
+            "get_logs_errors": self.errors,
+            "get_logs_rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,130 @@
+"""Raw-bytes decoder for CTF exchange OrderFilled logs.
+
+OrderFilled(bytes32 indexed orderHash, address indexed maker, address indexed
+taker, uint256 makerAssetId, uint256 takerAssetId, uint256 makerAmountFilled,
+uint256 takerAmountFilled, uint256 fee): the data field is five 32-byte
+big-endian words and maker/taker sit in the low 20 bytes of topics 2 and 3,
+so neither eth_abi nor checksum addresses are needed on the hot path.
+
+The same module is kept in ProjectE-PolymarketTGtracker/orderfilled.py.
+"""
+from array import array
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+EVENT_SIG = "OrderFilled(bytes32,address,address,uint256,uint256,uint256,uint256,uint256)"
+DATA_SIZE = 160
+
+
+class Fill(NamedTuple):
+    block_number: int
+    log_index: int
+    tx_hash: str
+    maker: str
+    taker: str
+    maker_asset_id: int
+    taker_asset_id: int
+    maker_amount: int
+    taker_amount: int
+    fee: int
+
+
+def _raw(value) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+def _tx_hash(value) -> str:
+    # Keep whatever string form the caller's web3/hexbytes version produces,
+    # since tx hashes are stored and used as dedup keys.
+    return value if isinstance(value, str) else value.hex()
+
+
+def decode_fill(log) -> Optional[Fill]:
+    topics = log.get("topics", [])
+    if len(topics) < 4:
+        return None
+    data = _raw(log["data"])
+    if len(data) < DATA_SIZE:
+        return None
+    from_bytes = int.from_bytes
+    return Fill(
+        int(log["blockNumber"]),
+        int(log["logIndex"]),
+        _tx_hash(log["transactionHash"]),
+        "0x" + _raw(topics[2])[-20:].hex(),
+        "0x" + _raw(topics[3])[-20:].hex(),
+        from_bytes(data[0:32], "big"),
+        from_bytes(data[32:64], "big"),
+        from_bytes(data[64:96], "big"),
+        from_bytes(data[96:128], "big"),
+        from_bytes(data[128:160], "big"),
+    )
+
+
+class FillBatch:
+    """Column-oriented fills of one get_logs batch.
+
+    Block numbers and log indexes are packed uint64 arrays; uint256 asset
+    ids and amounts stay Python ints since they do not fit a fixed-width
+    column.
+    """
+
+    def __init__(self) -> None:
+        self.block_number = array("Q")
+        self.log_index = array("Q")
+        self.tx_hash: list[str] = []
+        self.maker: list[str] = []
+        self.taker: list[str] = []
+        self.maker_asset_id: list[int] = []
+        self.taker_asset_id: list[int] = []
+        self.maker_amount: list[int] = []
+        self.taker_amount: list[int] = []
+        self.fee: list[int] = []
+        self.skipped = 0
+
+    def __len__(self) -> int:
+        return len(self.tx_hash)
+
+    def append(self, fill: Fill) -> None:
+        self.block_number.append(fill.block_number)
+        self.log_index.append(fill.log_index)
+        self.tx_hash.append(fill.tx_hash)
+        self.maker.append(fill.maker)
+        self.taker.append(fill.taker)
+        self.maker_asset_id.append(fill.maker_asset_id)
+        self.taker_asset_id.append(fill.taker_asset_id)
+        self.maker_amount.append(fill.maker_amount)
+        self.taker_amount.append(fill.taker_amount)
+        self.fee.append(fill.fee)
+
+    def rows(self) -> Iterator[Fill]:
+        return map(
+            Fill._make,
+            zip(
+                self.block_number,
+                self.log_index,
+                self.tx_hash,
+                self.maker,
+                self.taker,
+                self.maker_asset_id,
+                self.taker_asset_id,
+                self.maker_amount,
+                self.taker_amount,
+                self.fee,
+            ),
+        )
+
+
+def decode_batch(logs: Iterable) -> FillBatch:
+    batch = FillBatch()
+    for log in logs:
+        try:
+            fill = decode_fill(log)
+        except (KeyError, TypeError, ValueError):
+            fill = None
+        if fill is None:
+            batch.skipped += 1
+            continue
+        batch.append(fill)
+    return batch
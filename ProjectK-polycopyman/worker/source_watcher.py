@@ -1,15 +1,19 @@
 import logging
 import time
+from typing import Iterable
 
-from eth_abi import decode
 from web3 import Web3
 
 from backend.config import (
     RPC_URL,
     WATCHER_BACKOFF_ERROR_STREAK,
     WATCHER_BACKOFF_SLOW_TICK_MS,
+    WATCHER_BLOCK_RANGE_MAX,
+    WATCHER_BLOCK_RANGE_MIN,
     WATCHER_CONFIRMATIONS,
+    WATCHER_BACKFILL_WORKERS,
     WATCHER_EXCHANGES,
+    WATCHER_FILL_LOG_PATH,
     WATCHER_MAX_BLOCK_RANGE,
     WATCHER_MAX_LAG_BLOCKS,
     WATCHER_POLL_MAX_SECONDS,
@@ -20,11 +24,16 @@ from backend.config import (
 from backend.db import get_conn
 from backend.repositories.runtime import heartbeat
 from backend.repositories.signals import create_chain_signal, list_active_source_wallet_addresses
+from backend.rpc_pool import PoolProvider, RpcPool, parse_urls
+from worker.backfill import Backfill
+from worker.block_range import RangeController
+from worker.fill_log import FillLog
+from worker.orderfilled import EVENT_SIG, Fill, decode_batch
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
-EVENT_SIG = "OrderFilled(bytes32,address,address,uint256,uint256,uint256,uint256,uint256)"
-EVENT_TYPES = ["uint256", "uint256", "uint256", "uint256", "uint256"]
+FILL_LOG_CONSUMER = "projectk"
+FILL_LOG_READ_LIMIT = 5000
 
 
 def _ensure_state_table() -> None:
@@ -38,6 +47,18 @@ def _ensure_state_table() -> None:
             )
             """
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS watcher_gaps (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_block INTEGER NOT NULL,
+                to_block INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at INTEGER NOT NULL
+            )
+            """
+        )
 
 
 def _get_state(key: str) -> str | None:
@@ -60,6 +81,61 @@ def _set_state(key: str, value: str) -> None:
         )
 
 
+def _skip_to(from_block: int, new_last_block: int) -> None:
+    """Advance watcher_last_block, recording the skipped blocks for backfill."""
+    now = int(time.time())
+    with get_conn() as conn:
+        if new_last_block >= from_block:
+            conn.execute(
+                "INSERT INTO watcher_gaps(from_block, to_block, created_at) VALUES (?, ?, ?)",
+                (from_block, new_last_block, now),
+            )
+        conn.execute(
+            """
+            INSERT INTO watcher_state(key, value, updated_at) VALUES ('watcher_last_block', ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at
+            """,
+            (str(new_last_block), now),
+        )
+
+
+def _list_gaps(limit: int) -> list[tuple[int, int, int]]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT id, from_block, to_block FROM watcher_gaps ORDER BY from_block LIMIT ?",
+            (limit,),
+        ).fetchall()
+    return [(int(r["id"]), int(r["from_block"]), int(r["to_block"])) for r in rows]
+
+
+def _split_gap(gap_id: int, size: int) -> None:
+    """Split the first size blocks off a gap; the rest stays one gap."""
+    now = int(time.time())
+    with get_conn() as conn:
+        row = conn.execute("SELECT from_block, to_block FROM watcher_gaps WHERE id=?", (gap_id,)).fetchone()
+        if not row or int(row["to_block"]) - int(row["from_block"]) + 1 <= size:
+            return
+        conn.execute("DELETE FROM watcher_gaps WHERE id=?", (gap_id,))
+        head_end = int(row["from_block"]) + size - 1
+        conn.executemany(
+            "INSERT INTO watcher_gaps(from_block, to_block, created_at) VALUES (?, ?, ?)",
+            [(int(row["from_block"]), head_end, now), (head_end + 1, int(row["to_block"]), now)],
+        )
+
+
+def _fail_gap(gap_id: int, error: str) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE watcher_gaps SET attempts=attempts+1, last_error=? WHERE id=?",
+            (error[:500], gap_id),
+        )
+
+
+def _delete_gap(gap_id: int) -> None:
+    with get_conn() as conn:
+        conn.execute("DELETE FROM watcher_gaps WHERE id=?", (gap_id,))
+
+
 def _detect_trade_for_address(
     address: str,
     maker: str,
@@ -99,11 +175,98 @@ def _detect_trade_for_address(
     return side, token_id, usdc, price
 
 
+def _handle_fills(fills: Iterable[Fill], watch: set[str]) -> int:
+    """Create chain signals for fills touching watched wallets; returns the count."""
+    inserted = 0
+    for fill in fills:
+        try:
+            maker = fill.maker
+            taker = fill.taker
+            if maker not in watch and taker not in watch:
+                continue
+            maker_asset_id = fill.maker_asset_id
+            taker_asset_id = fill.taker_asset_id
+            maker_amt = fill.maker_amount
+            taker_amt = fill.taker_amount
+            tx_hash = fill.tx_hash
+            log_index = fill.log_index
+            block_number = fill.block_number
+
+            for addr in (maker, taker):
+                if addr not in watch:
+                    continue
+                detected = _detect_trade_for_address(
+                    address=addr,
+                    maker=maker,
+                    taker=taker,
+                    maker_asset_id=int(maker_asset_id),
+                    taker_asset_id=int(taker_asset_id),
+                    maker_amt=int(maker_amt),
+                    taker_amt=int(taker_amt),
+                )
+                if not detected:
+                    continue
+                side, token_id, usdc_notional, price = detected
+                signal_id = create_chain_signal(
+                    source_address=addr,
+                    tx_hash=tx_hash,
+                    log_index=log_index,
+                    block_number=block_number,
+                    side=side,
+                    source_notional_usdc=usdc_notional,
+                    source_price=price,
+                    token_id=token_id,
+                    outcome=None,
+                    market_slug=None,
+                    chain_id=137,
+                )
+                if signal_id:
+                    inserted += 1
+        except Exception:
+            logging.exception("watcher_parse_error")
+    return inserted
+
+
+def _run_fill_log() -> None:
+    """Read fills from the shared fill log instead of polling the RPC."""
+    fill_log = FillLog(WATCHER_FILL_LOG_PATH)
+    logging.info("watcher_fill_log path=%s", WATCHER_FILL_LOG_PATH)
+    while True:
+        try:
+            heartbeat("watcher", extra={"source": "fill_log"})
+            watch = set(list_active_source_wallet_addresses())
+            fill_log.register(FILL_LOG_CONSUMER, watch)
+            fills, last_seq, through_block = fill_log.read(FILL_LOG_CONSUMER, FILL_LOG_READ_LIMIT)
+            # The ingester runs on web3 6 whose tx hashes carry "0x"; keep the
+            # bare form this watcher has always used in idempotency keys.
+            fills = [f._replace(tx_hash=f.tx_hash.removeprefix("0x")) for f in fills]
+            inserted = _handle_fills(fills, watch)
+            fill_log.ack(FILL_LOG_CONSUMER, last_seq)
+            _set_state("watcher_last_block", str(through_block))
+            if fills:
+                logging.info(
+                    "watcher_tick fills=%s through=%s inserted_signals=%s watched_wallets=%s",
+                    len(fills),
+                    through_block,
+                    inserted,
+                    len(watch),
+                )
+            if len(fills) == FILL_LOG_READ_LIMIT:
+                continue
+        except Exception:
+            logging.exception("watcher_error")
+        time.sleep(WATCHER_POLL_MIN_SECONDS)
+
+
 def run() -> None:
+    if WATCHER_FILL_LOG_PATH:
+        _run_fill_log()
+        return
     if not RPC_URL:
         raise SystemExit("PROJECTK_RPC_URL is not set")
 
-    w3 = Web3(Web3.HTTPProvider(RPC_URL, request_kwargs={"timeout": 20}))
+    rpc = RpcPool(parse_urls(RPC_URL), timeout=20)
+    w3 = Web3(PoolProvider(rpc))
     topic0 = w3.keccak(text=EVENT_SIG).hex()
     if not topic0.startswith("0x"):
         topic0 = f"0x{topic0}"
@@ -111,6 +274,53 @@ def run() -> None:
     if not exchanges:
         raise SystemExit("PROJECTK_WATCHER_EXCHANGES is empty")
 
+    def fetch_logs(from_block: int, to_block: int) -> list:
+        return w3.eth.get_logs(
+            {
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "address": exchanges,
+                "topics": [topic0],
+            }
+        )
+
+    def handle_gap(gap_id: int, from_block: int, to_block: int, logs: list) -> None:
+        # create_chain_signal is idempotent, so a crash before the delete
+        # only means the range is processed again.
+        watch = set(list_active_source_wallet_addresses())
+        inserted = _handle_fills(decode_batch(logs).rows(), watch)
+        _delete_gap(gap_id)
+        logging.info(
+            "watcher_backfill blocks=%s->%s logs=%s inserted_signals=%s gap=%s",
+            from_block,
+            to_block,
+            len(logs),
+            inserted,
+            gap_id,
+        )
+
+    _ensure_state_table()
+    backfill = Backfill(
+        fetch_logs,
+        _list_gaps,
+        _split_gap,
+        _fail_gap,
+        workers=WATCHER_BACKFILL_WORKERS,
+        ranges=RangeController(
+            WATCHER_MAX_BLOCK_RANGE,
+            WATCHER_BLOCK_RANGE_MIN,
+            WATCHER_BLOCK_RANGE_MAX,
+            slow_ms=WATCHER_BACKOFF_SLOW_TICK_MS,
+        ),
+        idle_seconds=WATCHER_POLL_SECONDS,
+    ).start()
+
+    ranges = RangeController(
+        WATCHER_MAX_BLOCK_RANGE,
+        WATCHER_BLOCK_RANGE_MIN,
+        WATCHER_BLOCK_RANGE_MAX,
+        slow_ms=WATCHER_BACKOFF_SLOW_TICK_MS,
+    )
     last_block = int(_get_state("watcher_last_block") or "0")
     min_poll = max(1, WATCHER_POLL_MIN_SECONDS)
     max_poll = max(min_poll, WATCHER_POLL_MAX_SECONDS)
@@ -123,8 +333,10 @@ def run() -> None:
     while True:
         tick_started = time.monotonic()
         had_error = False
+        behind = False
         try:
-            heartbeat("watcher", extra={"poll_seconds": poll_seconds})
+            heartbeat("watcher", extra={"poll_seconds": poll_seconds, **ranges.stats(), **rpc.stats()})
+            backfill.drain(handle_gap, WATCHER_BACKFILL_WORKERS)
             latest = int(w3.eth.block_number)
             target = max(latest - WATCHER_CONFIRMATIONS, 0)
 
@@ -138,9 +350,10 @@ def run() -> None:
 
             lag = target - last_block
             if lag > WATCHER_MAX_LAG_BLOCKS:
+                _skip_to(last_block + 1, target)
                 last_block = target
-                _set_state("watcher_last_block", str(last_block))
-                logging.warning("watcher_lag_jump target=%s lag_blocks=%s", target, lag)
+                backfill.wake()
+                logging.warning("watcher_lag_jump target=%s lag_blocks=%s backfill=queued", target, lag)
                 time.sleep(poll_seconds)
                 continue
 
@@ -152,74 +365,44 @@ def run() -> None:
                 continue
 
             from_block = last_block + 1
-            to_block = min(target, last_block + WATCHER_MAX_BLOCK_RANGE)
-            logs = w3.eth.get_logs(
-                {
-                    "fromBlock": from_block,
-                    "toBlock": to_block,
-                    "address": exchanges,
-                    "topics": [topic0],
-                }
-            )
-
-            inserted = 0
-            for log in logs:
-                try:
-                    topics = log.get("topics", [])
-                    if len(topics) < 4:
-                        continue
-                    maker_asset_id, taker_asset_id, maker_amt, taker_amt, _fee = decode(
-                        EVENT_TYPES, bytes(log["data"])
+            to_block = min(target, last_block + ranges.range)
+            fetch_started = time.monotonic()
+            try:
+                logs = fetch_logs(from_block, to_block)
+            except Exception as exc:
+                if ranges.failed(exc):
+                    logging.warning(
+                        "watcher_range_retry range=%s blocks=%s->%s retry_in=%.1fs error=%s",
+                        ranges.range,
+                        from_block,
+                        to_block,
+                        ranges.backoff,
+                        exc,
                     )
-                    maker = Web3.to_checksum_address("0x" + topics[2].hex()[-40:]).lower()
-                    taker = Web3.to_checksum_address("0x" + topics[3].hex()[-40:]).lower()
-                    tx_hash = log["transactionHash"].hex()
-                    log_index = int(log["logIndex"])
-                    block_number = int(log["blockNumber"])
-
-                    for addr in (maker, taker):
-                        if addr not in watch:
-                            continue
-                        detected = _detect_trade_for_address(
-                            address=addr,
-                            maker=maker,
-                            taker=taker,
-                            maker_asset_id=int(maker_asset_id),
-                            taker_asset_id=int(taker_asset_id),
-                            maker_amt=int(maker_amt),
-                            taker_amt=int(taker_amt),
-                        )
-                        if not detected:
-                            continue
-                        side, token_id, usdc_notional, price = detected
-                        signal_id = create_chain_signal(
-                            source_address=addr,
-                            tx_hash=tx_hash,
-                            log_index=log_index,
-                            block_number=block_number,
-                            side=side,
-                            source_notional_usdc=usdc_notional,
-                            source_price=price,
-                            token_id=token_id,
-                            outcome=None,
-                            market_slug=None,
-                            chain_id=137,
-                        )
-                        if signal_id:
-                            inserted += 1
-                except Exception:
-                    logging.exception("watcher_parse_error")
+                    time.sleep(ranges.backoff)
+                    continue
+                raise
+            latency_ms = int((time.monotonic() - fetch_started) * 1000)
+            ranges.observe(to_block - from_block + 1, len(logs), latency_ms)
+
+            batch = decode_batch(logs)
+            if batch.skipped:
+                logging.warning("watcher_parse_skipped count=%s", batch.skipped)
+            inserted = _handle_fills(batch.rows(), watch)
 
             last_block = to_block
             _set_state("watcher_last_block", str(last_block))
+            behind = to_block < target
             logging.info(
-                "watcher_tick blocks=%s->%s logs=%s inserted_signals=%s watched_wallets=%s poll=%s",
+                "watcher_tick blocks=%s->%s logs=%s inserted_signals=%s watched_wallets=%s poll=%s range=%s latency_ms=%s",
                 from_block,
                 to_block,
                 len(logs),
                 inserted,
                 len(watch),
                 poll_seconds,
+                ranges.range,
+                latency_ms,
             )
         except Exception:
             had_error = True
@@ -247,7 +430,8 @@ def run() -> None:
             error_streak,
             healthy_streak,
         )
-        time.sleep(poll_seconds)
+        if not behind:
+            time.sleep(poll_seconds)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Fail when the modules ProjectE and ProjectK share have drifted apart.
+
+ProjectE runs as flat scripts and ProjectK imports them as `worker.` /
+`backend.` packages, so each project keeps its own copy. The copies may
+only differ in the "The same module is kept in ..." docstring note and in
+those package prefixes on imports; anything else is reported as a diff.
+
+    python3 scripts/check-shared-modules.py
+"""
+import difflib
+import re
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PAIRS = [
+    ("ProjectE-PolymarketTGtracker/orderfilled.py", "ProjectK-polycopyman/worker/orderfilled.py"),
+    ("ProjectE-PolymarketTGtracker/fill_log.py", "ProjectK-polycopyman/worker/fill_log.py"),
+    ("ProjectE-PolymarketTGtracker/backfill.py", "ProjectK-polycopyman/worker/backfill.py"),
+    ("ProjectE-PolymarketTGtracker/block_range.py", "ProjectK-polycopyman/worker/block_range.py"),
+    ("ProjectE-PolymarketTGtracker/rpc_pool.py", "ProjectK-polycopyman/backend/rpc_pool.py"),
+]
+
+_PACKAGE_IMPORT = re.compile(r"^(\s*)from (?:worker|backend)\.")
+
+
+def normalize(path: Path) -> list[str]:
+    out: list[str] = []
+    in_note = False
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.startswith("The same module is kept in"):
+            in_note = True
+        if in_note:
+            # The note can wrap; it ends with the first full stop at end of line.
+            in_note = not line.rstrip().endswith(".")
+            continue
+        out.append(_PACKAGE_IMPORT.sub(r"\1from ", line))
+    return out
+
+
+def main() -> int:
+    drifted = 0
+    for left, right in PAIRS:
+        a, b = normalize(ROOT / left), normalize(ROOT / right)
+        if a == b:
+            print(f"ok      {left} == {right}")
+            continue
+        drifted += 1
+        print(f"DRIFT   {left} != {right}")
+        sys.stdout.writelines(line + "\n" for line in difflib.unified_diff(a, b, left, right, lineterm=""))
+    if drifted:
+        print(f"{drifted} shared module pair(s) differ; apply the change to both copies.")
+    return 1 if drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())